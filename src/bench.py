@@ -0,0 +1,194 @@
+"""Benchmarks for the core operations against local fake Syncthing servers.
+
+Run it from the src directory like main.py:
+    python bench.py
+    python bench.py --folders 100 1000 --devices 50 --users 20 --latency 0.005
+    python bench.py --output ../bench_output.txt --baseline last_run.json
+
+Each scenario starts one mock server with N folders and M devices and one mock per
+user device, then times:
+    refresh_fetch      get_overview() without the config cache
+    refresh_classify   ConfigIndex plus every user's folder view, no network
+    batch_sync         sync_folders() with K folders for one user
+    fan_out            push_folder_to_users() to all U users, as Add Folder's "Also share with"
+    unsync             unsync_many() for one folder from one user
+    unsync_many        unsync_many() for K folders from all U users
+    reconcile_plan     plan_reconcile() over all users
+
+Results are printed as JSON (or written to --output). With --baseline the run is compared
+to an earlier result file and the exit code is 1 if a median got slower than --tolerance
+allows or an operation started sending more requests.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+# Never touch the real data directory, the components load their config on import
+os.environ["P2PSHARE_DATA_DIR"] = tempfile.mkdtemp(prefix="p2pshare-bench-")
+
+from components.config import CONFIG
+from components.config_index import ConfigIndex
+from bench_support.mock_syncthing import MockSyncthing, generate_config
+from components import operations
+from components import reconcile
+from components import unsync
+
+SERVER_ID = "BENCH-SERVER"
+
+def user_device_id(i):
+    return f"BENCH-USER-{i:04d}"
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def measure(name, params, fn, repeat, mocks, setup=None):
+    # setup runs before every repetition and isn't timed, requests are counted per run
+    samples = []
+    requests = 0
+    for _ in range(repeat):
+        if setup:
+            setup()
+        before = sum(m.request_count() for m in mocks)
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+        requests = sum(m.request_count() for m in mocks) - before
+    return {
+        "name": name,
+        "params": params,
+        "runs": repeat,
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.mean(samples),
+        "p95": percentile(samples, 0.95),
+        "max": max(samples),
+        "requests": requests
+    }
+
+def run_scenario(folders, devices, users, batch, latency, repeat):
+    user_ids = [user_device_id(i) for i in range(users)]
+    server = MockSyncthing(SERVER_ID, generate_config(SERVER_ID, folders, devices, user_ids), latency=latency).start()
+    user_mocks = [MockSyncthing(d, generate_config(d), latency=latency).start() for d in user_ids]
+    mocks = [server] + user_mocks
+
+    CONFIG.update({
+        "api_url": server.url,
+        "api_key": server.api_key,
+        "this_device_id": SERVER_ID,
+        "users": {f"user{i}": {"device_id": m.device_id, "api_url": m.url, "api_key": m.api_key} for i, m in enumerate(user_mocks)}
+    })
+    usernames = list(CONFIG["users"])
+    params = {"folders": folders, "devices": devices, "users": users, "batch": batch, "latency": latency}
+
+    def reset():
+        for mock in mocks:
+            mock.reset()
+        operations.api.invalidate_config()
+
+    try:
+        results = [measure("refresh_fetch", params, lambda: operations.api.get_overview(use_cache=False), repeat, mocks)]
+
+        config = operations.api.get_config(use_cache=False)
+        def classify():
+            index = ConfigIndex(config, SERVER_ID, CONFIG["users"])
+            for username in usernames:
+                index.view_for_user(username)
+        results.append(measure("refresh_classify", params, classify, repeat, mocks))
+
+        if usernames:
+            # user0 syncs folders it can discover but doesn't have yet
+            first = usernames[0]
+            _, discoverable = ConfigIndex(config, SERVER_ID, CONFIG["users"]).view_for_user(first)
+            selected = [(folder_id, folder_id) for folder_id in discoverable[:batch]]
+            owned = [f["id"] for f in config["folders"] if any(d["deviceID"] == CONFIG["users"][first]["device_id"] for d in f["devices"])]
+
+            results.append(measure("batch_sync", dict(params, batch=len(selected)),
+                lambda: operations.sync_folders(selected, first), repeat, mocks, setup=reset))
+            if owned:
+                results.append(measure("fan_out", params,
+                    lambda: operations.push_folder_to_users(next(f for f in config["folders"] if f["id"] == owned[0]), usernames), repeat, mocks, setup=reset))
+                results.append(measure("unsync", params,
+                    lambda: unsync.unsync_many(owned[:1], [first]), repeat, mocks, setup=reset))
+                results.append(measure("unsync_many", dict(params, batch=len(owned[:batch])),
+                    lambda: unsync.unsync_many(owned[:batch], usernames), repeat, mocks, setup=reset))
+            results.append(measure("reconcile_plan", params, reconcile.plan_reconcile, repeat, mocks, setup=reset))
+        return results
+    finally:
+        for mock in mocks:
+            mock.stop()
+
+def compare(results, baseline, tolerance):
+    """Return one line per regression against baseline results.
+
+    A benchmark regresses when its median is more than tolerance slower, or when it
+    sends more requests than before.
+    """
+    def key(result):
+        return (result["name"], json.dumps(result["params"], sort_keys=True))
+    previous = {key(r): r for r in baseline.get("results", [])}
+
+    regressions = []
+    for result in results:
+        old = previous.get(key(result))
+        if old is None:
+            continue
+        label = f"{result['name']} {result['params']}"
+        if result["median"] > old["median"] * (1 + tolerance):
+            regressions.append(f"{label}: median {old['median'] * 1000:.1f}ms -> {result['median'] * 1000:.1f}ms")
+        if result["requests"] > old["requests"]:
+            regressions.append(f"{label}: requests {old['requests']} -> {result['requests']}")
+    return regressions
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="bench.py", description="Time the core operations against fake Syncthing servers.")
+    parser.add_argument("--folders", type=int, nargs="+", default=[100, 1000], help="folder counts, one scenario each")
+    parser.add_argument("--devices", type=int, default=50, help="devices in the server config")
+    parser.add_argument("--users", type=int, default=10, help="users, each with its own fake device")
+    parser.add_argument("--batch", type=int, default=20, help="folders per batch sync")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per benchmark")
+    parser.add_argument("--output", help="write the JSON here instead of printing it")
+    parser.add_argument("--baseline", help="earlier result file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed median slowdown, 0.25 = 25%%")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    results = []
+    for folders in args.folders:
+        results.extend(run_scenario(folders, args.devices, args.users, args.batch, args.latency, args.repeat))
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform()
+        },
+        "results": results
+    }
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = compare(results, json.load(f), args.tolerance)
+        for line in report["regressions"]:
+            print(f"Regression: {line}", file=sys.stderr)
+        exit_code = 1 if report["regressions"] else 0
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return exit_code
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1 @@
+"""Helpers for bench.py, the app never imports this package."""
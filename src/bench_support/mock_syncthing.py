@@ -0,0 +1,226 @@
+"""A small in-process fake of the Syncthing REST API, used by bench.py.
+
+It serves the endpoints this app calls (/rest/system/*, /rest/config/folders|devices and
+/rest/events) from an in-memory config, with an optional delay per request to stand in
+for network latency. Every request is counted so benchmarks can report round trips.
+"""
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, unquote
+from collections import Counter
+import copy
+import gzip
+import json
+import threading
+import time
+
+CONFIG_VERSION = 37
+
+def generate_config(this_id, folders=0, devices=0, owner_ids=(), private_every=5):
+	"""Build a config with the server, owner_ids and filler devices up to devices in total.
+
+	Folder i is shared between the server and owner_ids[i % len(owner_ids)] (or only the
+	server when there are no owners), and every private_every-th folder is private.
+	"""
+	device_ids = [this_id] + [d for d in owner_ids if d != this_id]
+	while len(device_ids) < devices:
+		device_ids.append(f"FILLER-{len(device_ids):04d}")
+	config = {
+		"version": CONFIG_VERSION,
+		"devices": [{"deviceID": d, "name": d, "addresses": ["dynamic"]} for d in device_ids],
+		"folders": []
+	}
+	for i in range(folders):
+		folder_devices = [{"deviceID": this_id}]
+		if owner_ids:
+			folder_devices.append({"deviceID": owner_ids[i % len(owner_ids)]})
+		config["folders"].append({
+			"id": f"folder-{i:05d}",
+			"label": f"Folder {i}",
+			"path": f"/srv/sync/folder-{i:05d}",
+			"type": "sendreceive",
+			"devices": folder_devices,
+			"private": bool(private_every) and i % private_every == private_every - 1
+		})
+	return config
+
+class MockSyncthing():
+	def __init__(self, device_id, config=None, api_key="bench-key", latency=0.0):
+		self.device_id = device_id
+		self.api_key = api_key
+		self.latency = latency
+		self.initial_config = config or generate_config(device_id)
+		self.hits = Counter()
+		self._lock = threading.Lock()
+		self._server = None
+		self._thread = None
+		self.reset()
+
+	@property
+	def url(self):
+		# Same form as api_url in the config, the REST base including /rest
+		host, port = self._server.server_address[:2]
+		return f"http://{host}:{port}/rest"
+
+	def reset(self):
+		# Back to the initial config, with the event log and request counts cleared
+		with self._lock:
+			self.config = copy.deepcopy(self.initial_config)
+			self.events = []
+			self.hits.clear()
+
+	def request_count(self):
+		with self._lock:
+			return sum(self.hits.values())
+
+	def start(self):
+		mock = self
+
+		class Handler(BaseHTTPRequestHandler):
+			protocol_version = "HTTP/1.1"
+			# Headers and body go out as separate writes, don't let Nagle delay the body
+			disable_nagle_algorithm = True
+
+			def log_message(self, *args):
+				pass
+
+			def do_GET(self):
+				mock._handle(self, "GET")
+
+			def do_POST(self):
+				mock._handle(self, "POST")
+
+			def do_PUT(self):
+				mock._handle(self, "PUT")
+
+			def do_PATCH(self):
+				mock._handle(self, "PATCH")
+
+			def do_DELETE(self):
+				mock._handle(self, "DELETE")
+
+		self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+		self._server.daemon_threads = True
+		self._thread = threading.Thread(target=self._server.serve_forever, name="mock-syncthing", daemon=True)
+		self._thread.start()
+		return self
+
+	def stop(self):
+		if self._server is not None:
+			self._server.shutdown()
+			self._server.server_close()
+			self._server = None
+
+	def _send(self, handler, status, body=None):
+		data = json.dumps(body if body is not None else {}).encode()
+		handler.send_response(status)
+		handler.send_header("Content-Type", "application/json")
+		# Like Syncthing, larger responses are compressed for clients that accept gzip
+		if len(data) >= 1024 and "gzip" in handler.headers.get("Accept-Encoding", ""):
+			data = gzip.compress(data, compresslevel=5)
+			handler.send_header("Content-Encoding", "gzip")
+		handler.send_header("Content-Length", str(len(data)))
+		handler.end_headers()
+		handler.wfile.write(data)
+
+	def _config_saved(self):
+		self.events.append({"id": len(self.events) + 1, "type": "ConfigSaved", "time": time.time(), "data": copy.deepcopy(self.config)})
+
+	def _handle(self, handler, method):
+		if self.latency:
+			time.sleep(self.latency)
+		url = urlparse(handler.path)
+		length = int(handler.headers.get("Content-Length") or 0)
+		raw = handler.rfile.read(length) if length else b""
+		if handler.headers.get("Content-Encoding") == "gzip":
+			raw = gzip.decompress(raw)
+		body = json.loads(raw) if raw else None
+
+		if handler.headers.get("X-API-Key") != self.api_key:
+			return self._send(handler, 403, {"error": "forbidden"})
+
+		parts = [unquote(p) for p in url.path.strip("/").split("/")]
+		with self._lock:
+			self.hits[(method, "/".join(parts[:3]))] += 1
+			try:
+				status, result = self._route(method, parts, parse_qs(url.query), body)
+			except (KeyError, TypeError, ValueError) as e:
+				status, result = 400, {"error": str(e)}
+		self._send(handler, status, result)
+
+	def _route(self, method, parts, query, body):
+		if parts[:2] == ["rest", "system"] and len(parts) == 3:
+			if parts[2] == "ping":
+				return 200, {"ping": "pong"}
+			if parts[2] == "status" and method == "GET":
+				return 200, {"myID": self.device_id, "uptime": 3600}
+			if parts[2] == "connections" and method == "GET":
+				connections = {d["deviceID"]: {"connected": True, "paused": False} for d in self.config["devices"] if d["deviceID"] != self.device_id}
+				return 200, {"connections": connections}
+			if parts[2] == "config":
+				if method == "GET":
+					return 200, self.config
+				if method in ("POST", "PUT"):
+					self.config = body
+					self._config_saved()
+					return 200, {}
+
+		if parts[:2] == ["rest", "db"] and len(parts) == 3 and method == "GET":
+			folder_id = query.get("folder", [""])[0]
+			if folder_id and not any(f["id"] == folder_id for f in self.config["folders"]):
+				return 404, {"error": "no such folder"}
+			if parts[2] == "status":
+				return 200, {"state": "idle", "globalBytes": 1000, "inSyncBytes": 1000, "needBytes": 0, "needFiles": 0}
+			if parts[2] == "completion":
+				return 200, {"completion": 100, "globalBytes": 1000, "needBytes": 0, "needItems": 0, "needDeletes": 0}
+
+		if parts == ["rest", "events"] and method == "GET":
+			since = int(query.get("since", ["0"])[0])
+			limit = int(query.get("limit", ["0"])[0])
+			wanted = set(",".join(query.get("events", [])).split(",")) - {""}
+			events = [e for e in self.events if e["id"] > since and (not wanted or e["type"] in wanted)]
+			return 200, events[-limit:] if limit else events
+
+		if parts[:2] == ["rest", "config"] and len(parts) in (3, 4) and parts[2] in ("folders", "devices"):
+			return self._route_objects(method, parts[2], parts[3] if len(parts) == 4 else None, body)
+
+		return 404, {"error": "not found"}
+
+	def _route_objects(self, method, kind, object_id, body):
+		key = "id" if kind == "folders" else "deviceID"
+		objects = self.config.setdefault(kind, [])
+
+		if object_id is None:
+			if method == "GET":
+				return 200, objects
+			if method in ("POST", "PUT"):
+				# Both upsert, PUT with a list and POST with a single object
+				items = body if isinstance(body, list) else [body]
+				by_id = {o[key]: i for i, o in enumerate(objects)}
+				for item in items:
+					if item[key] in by_id:
+						objects[by_id[item[key]]] = item
+					else:
+						by_id[item[key]] = len(objects)
+						objects.append(item)
+				self._config_saved()
+				return 200, {}
+			return 405, {"error": "method not allowed"}
+
+		index = next((i for i, o in enumerate(objects) if o[key] == object_id), None)
+		if index is None and method != "PUT":
+			return 404, {"error": f"no such {kind[:-1]}"}
+		if method == "GET":
+			return 200, objects[index]
+		if method == "PATCH":
+			objects[index].update(body)
+		elif method == "PUT":
+			if index is None:
+				objects.append(body)
+			else:
+				objects[index] = body
+		elif method == "DELETE":
+			del objects[index]
+		else:
+			return 405, {"error": "method not allowed"}
+		self._config_saved()
+		return 200, {}
@@ -0,0 +1,350 @@
+"""Command line interface for P2P Sync Manager, works without a display (SSH, cron).
+
+Run it from the src directory like main.py:
+    python cli.py status
+    python cli.py list --user Bob
+    python cli.py add-folder Photos /srv/photos --user Bob --share-with Alice
+    python cli.py sync 1a2b3c4d5e --user Bob
+    python cli.py unsync 1a2b3c4d5e 6f7a8b9c0d --user Bob --user Alice
+    python cli.py unsync --all --user Bob
+    python cli.py journal --retry
+    python cli.py reconcile --dry-run
+    python cli.py servers
+    python cli.py pending --drain
+    python cli.py import devices.csv --users --dry-run
+    python cli.py --server us list
+
+Add --json before the command for machine-readable output. The exit code is 0 on
+success, 1 on failure and 2 when only part of an operation went through.
+--metrics FILE writes request timings for the run to FILE, as JSON when it ends in
+.json and in the Prometheus text format otherwise.
+"""
+import argparse
+import json
+import os
+import sys
+
+from components.config import CONFIG, CONFIG_FILE, flush_saves
+from components.config_index import ConfigIndex
+from components.syncthing_api import SyncthingAPIError
+from components.metrics import metrics
+from components import operations
+from components import reconcile
+from components import hubs
+from components import bulk_import
+from components import unsync
+from components.pending import queue as pending_queue
+from components.paths import FolderSizeScanner
+from components.operations import OperationError
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_PARTIAL = 2
+
+def output(args, data, text_lines):
+    if args.json:
+        print(json.dumps(data, indent=2))
+    else:
+        print("\n".join(text_lines))
+
+def report(args, result):
+    # Operations return (level, title, message), warnings mean partial success
+    level, title, message = result
+    output(args, {"status": level, "title": title, "message": message}, [f"{title}: {message}"])
+    return EXIT_PARTIAL if level == "warning" else EXIT_OK
+
+def load_index():
+    this_id = operations.ensure_this_device_id()
+    return ConfigIndex(operations.api.get_config(), this_id, CONFIG["users"])
+
+def cmd_status(args):
+    this_id = operations.ensure_this_device_id()
+    config, status, connections = operations.api.get_overview()
+    index = ConfigIndex(config, this_id, CONFIG["users"])
+
+    devices = []
+    for dev_id, dev in index.devices.items():
+        if dev_id == this_id:
+            continue
+        connection = connections.get('connections', {}).get(dev_id, {})
+        devices.append({
+            "device_id": dev_id,
+            "name": dev.get('name', 'Unknown Name'),
+            "user": index.user_for_device(dev_id),
+            "connected": connection.get('connected', False),
+            "paused": connection.get('paused', False)
+        })
+
+    lines = [f"Server: {this_id} (uptime {status.get('uptime', 0)}s)"]
+    for dev in devices:
+        state = "Paused" if dev["paused"] else ("Connected" if dev["connected"] else "Disconnected")
+        user_tag = f" ({dev['user']}'s Device)" if dev["user"] else ""
+        lines.append(f"  {dev['name']}{user_tag} ({dev['device_id']}) - {state}")
+    output(args, {"server": this_id, "uptime": status.get('uptime'), "devices": devices}, lines)
+    return EXIT_OK
+
+def cmd_list(args):
+    index = load_index()
+    usernames = [args.user] if args.user else list(CONFIG["users"])
+    for username in usernames:
+        operations.get_user(username)
+
+    def describe(folder_id):
+        folder = index.folders[folder_id]
+        return {"id": folder_id, "label": folder.get('label', folder_id), "path": folder.get('path', ''), "private": folder.get('private', False)}
+
+    data = {}
+    lines = []
+    for username in usernames:
+        my_folders, discoverable = index.view_for_user(username)
+        data[username] = {"folders": [describe(f) for f in my_folders], "discoverable": [describe(f) for f in discoverable]}
+        lines.append(f"{username}:")
+        for title, folders in (("My Folders", data[username]["folders"]), ("Discoverable", data[username]["discoverable"])):
+            lines.append(f"  {title}:")
+            if not folders:
+                lines.append("    (none)")
+            for f in folders:
+                privacy_tag = " [PRIVATE]" if f["private"] else ""
+                lines.append(f"    {f['label']}{privacy_tag} ({f['id']}) → {f['path']}")
+    output(args, data, lines)
+    return EXIT_OK
+
+def cmd_add_folder(args):
+    operations.get_user(args.user)
+    for username in args.share_with:
+        operations.get_user(username)
+    operations.ensure_this_device_id()
+
+    if not os.path.exists(args.path):
+        if not args.create:
+            raise OperationError("Path Not Found", f"The path '{args.path}' doesn't exist, pass --create to create it.")
+        os.makedirs(args.path, exist_ok=True)
+
+    if not args.no_scan:
+        scanner = FolderSizeScanner.from_config(CONFIG)
+        size = scanner.scan(args.path)
+        if scanner.is_large(size):
+            print(f"Warning: '{args.path}' is a large folder ({size.describe()})", file=sys.stderr)
+
+    # Private folders stay with their owner
+    extra_users = [] if args.private else [u for u in args.share_with if u != args.user]
+    result = operations.add_folder_for_user(
+        operations.generate_folder_id(), args.label, args.path, args.private, args.user, extra_users, args.allow_overlap
+    )
+    return report(args, result)
+
+def cmd_sync(args):
+    operations.get_user(args.user)
+    index = load_index()
+    selected = [(folder_id, index.folders[folder_id].get('label', folder_id) if folder_id in index.folders else folder_id) for folder_id in args.folder_ids]
+    succeeded, failed = operations.sync_folders(selected, args.user)
+    lines = [f"Synced: {label}" for label in succeeded] + [f"Failed: {line}" for line in failed]
+    output(args, {"synced": succeeded, "failed": failed}, lines)
+    if failed:
+        return EXIT_PARTIAL if succeeded else EXIT_FAILED
+    return EXIT_OK
+
+def unsync_result(args, result):
+    lines = result.describe() or ["None of these users had these folders."]
+    data = {"removed": result.removed, "queued": result.queued, "manual": result.manual, "rolled_back": result.rolled_back, "failed": result.failed}
+    output(args, data, lines)
+    if result.failed or result.rolled_back:
+        return EXIT_PARTIAL if result.removed or result.queued else EXIT_FAILED
+    return EXIT_OK
+
+def cmd_unsync(args):
+    for username in args.user:
+        operations.get_user(username)
+    folder_ids = args.folder_ids
+    if args.all:
+        # Every folder shared with any of the users, for someone who is leaving
+        index = load_index()
+        folder_ids = list(dict.fromkeys(f for username in args.user for f in index.view_for_user(username)[0]))
+    if not folder_ids:
+        raise OperationError("Error", "Name the folders to unsync or pass --all.")
+    return unsync_result(args, unsync.unsync_many(folder_ids, args.user, rollback=not args.keep_failed))
+
+def cmd_journal(args):
+    if args.rollback:
+        for job_id in unsync.journal.jobs():
+            unsync.rollback_job(job_id)
+    elif args.retry:
+        results = unsync.retry_jobs(rollback=False)
+        lines = [f"{job_id}: {line}" for job_id, result in results.items() for line in result.describe()]
+        output(args, {job_id: result.failed for job_id, result in results.items()}, lines or ["Nothing to retry."])
+        return EXIT_PARTIAL if any(r.failed for r in results.values()) else EXIT_OK
+
+    jobs = {job_id: unsync.journal.job(job_id) for job_id in unsync.journal.jobs()}
+    lines = []
+    for job_id, job in jobs.items():
+        lines.append(f"{job_id}: {len(job['folders'])} folder(s)" + ("" if job["server_done"] else ", server not updated yet"))
+        lines.extend(f"  {username}: {len(entry['folders'])} left, {entry['error'] or 'not sent yet'}" for username, entry in job["users"].items())
+    output(args, jobs, lines or ["No unfinished unsyncs."])
+    return EXIT_OK
+
+def cmd_reconcile(args):
+    for username in args.user:
+        operations.get_user(username)
+    plan, result = reconcile.reconcile(args.user or None, dry_run=args.dry_run)
+
+    data = {
+        "server_changes": [c.describe() for c in plan.server_changes],
+        "changes": {username: [c.describe() for c in changes] for username, changes in plan.changes.items() if changes},
+        "skipped": plan.skipped,
+        "server_applied": result.server_applied,
+        "server_error": result.server_error,
+        "applied": result.applied,
+        "failed": result.failed,
+        "dry_run": args.dry_run
+    }
+    lines = plan.describe() or ["Everything is in sync."]
+    if not args.dry_run and not plan.empty:
+        lines += result.describe_applied() + result.describe_failed()
+    output(args, data, lines)
+    if result.any_failed:
+        return EXIT_PARTIAL if result.any_applied else EXIT_FAILED
+    return EXIT_OK
+
+def cmd_servers(args):
+    results = hubs.fetch_hub_overviews()
+    hubs.remember_device_ids(results)
+    summaries = [hubs.hub_summary(result) for result in results]
+    lines = []
+    for summary in summaries:
+        active_tag = " (active)" if summary["hub"] == hubs.active_hub() else ""
+        if summary["ok"]:
+            lines.append(f"{summary['hub']}{active_tag}: {summary['connected']}/{summary['devices']} devices connected, {summary['folders']} folders")
+        else:
+            lines.append(f"{summary['hub']}{active_tag}: unreachable, {summary['error']}")
+    output(args, summaries, lines)
+    return EXIT_OK if all(s["ok"] for s in summaries) else EXIT_PARTIAL
+
+def cmd_pending(args):
+    sent = {}
+    if args.drain:
+        operations.ensure_this_device_id()
+        sent = operations.drain_all_pending()
+
+    queued = pending_queue.pending()
+    data = {"sent": sent, "pending": {u: [{"folder_id": f, "action": e["action"]} for f, e in entries] for u, entries in queued.items()}}
+    lines = [f"{username}: sent {count} queued change{'s' if count != 1 else ''}" for username, count in sent.items()]
+    for username, entries in queued.items():
+        lines.append(f"{username}:")
+        lines.extend(f"  {entry['action']} folder {folder_id}" for folder_id, entry in entries)
+    output(args, data, lines or ["Nothing queued."])
+    return EXIT_PARTIAL if args.drain and queued else EXIT_OK
+
+def cmd_import(args):
+    plan = bulk_import.import_devices(args.file, register_users=args.users, dry_run=args.dry_run)
+    # The users are saved here rather than at exit, where a failed write would go unnoticed
+    error = flush_saves()
+    if error is not None:
+        print(f"Error: failed to save the imported users: {error}", file=sys.stderr)
+        return EXIT_FAILED
+    data = {
+        "devices": [d["deviceID"] for d in plan.devices],
+        "users": list(plan.users),
+        "skipped": [{"line": line, "reason": reason} for line, reason in plan.skipped],
+        "invalid": [{"line": line, "reason": reason} for line, reason in plan.invalid],
+        "dry_run": args.dry_run
+    }
+    output(args, data, plan.describe() or ["Nothing to import."])
+    if plan.invalid:
+        return EXIT_PARTIAL if not plan.empty else EXIT_FAILED
+    return EXIT_OK
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="Manage Syncthing folder sharing without the GUI.")
+    parser.add_argument("--json", action="store_true", help="print machine-readable JSON")
+    parser.add_argument("--metrics", metavar="FILE", help="write request timings to FILE (.json or Prometheus text)")
+    parser.add_argument("--server", help="run against this server from \"servers\" instead of the active one")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    status = commands.add_parser("status", help="show the server and its devices")
+    status.set_defaults(func=cmd_status)
+
+    list_cmd = commands.add_parser("list", help="list synced and discoverable folders per user")
+    list_cmd.add_argument("--user", help="only this user")
+    list_cmd.set_defaults(func=cmd_list)
+
+    add_folder = commands.add_parser("add-folder", help="add a new folder and sync it to a user")
+    add_folder.add_argument("label")
+    add_folder.add_argument("path")
+    add_folder.add_argument("--user", required=True)
+    add_folder.add_argument("--share-with", nargs="*", default=[], metavar="USER", help="other users to share it with")
+    add_folder.add_argument("--private", action="store_true", help="only visible to this user and the server")
+    add_folder.add_argument("--create", action="store_true", help="create the path if it doesn't exist")
+    add_folder.add_argument("--allow-overlap", action="store_true", help="add it even if it is inside or contains another folder")
+    add_folder.add_argument("--no-scan", action="store_true", help="don't count the files first to warn about a large folder")
+    add_folder.set_defaults(func=cmd_add_folder)
+
+    sync = commands.add_parser("sync", help="sync existing folders to a user")
+    sync.add_argument("folder_ids", nargs="+", metavar="FOLDER_ID")
+    sync.add_argument("--user", required=True)
+    sync.set_defaults(func=cmd_sync)
+
+    unsync_cmd = commands.add_parser("unsync", help="stop syncing folders with users")
+    unsync_cmd.add_argument("folder_ids", nargs="*", metavar="FOLDER_ID")
+    unsync_cmd.add_argument("--user", action="append", required=True, help="can be repeated")
+    unsync_cmd.add_argument("--all", action="store_true", help="every folder shared with these users")
+    unsync_cmd.add_argument("--keep-failed", action="store_true", help="leave failed devices in the journal instead of rolling back")
+    unsync_cmd.set_defaults(func=cmd_unsync)
+
+    journal = commands.add_parser("journal", help="show unsyncs that didn't finish on every device")
+    journal.add_argument("--retry", action="store_true", help="send the device updates again")
+    journal.add_argument("--rollback", action="store_true", help="share the folders with those devices on the server again")
+    journal.set_defaults(func=cmd_journal)
+
+    reconcile_cmd = commands.add_parser("reconcile", help="make every device match the server config")
+    reconcile_cmd.add_argument("--user", action="append", default=[], help="only this user, can be repeated")
+    reconcile_cmd.add_argument("--dry-run", action="store_true", help="only show what would change")
+    reconcile_cmd.set_defaults(func=cmd_reconcile)
+
+    servers = commands.add_parser("servers", help="show every configured server side by side")
+    servers.set_defaults(func=cmd_servers)
+
+    pending = commands.add_parser("pending", help="show changes queued for offline devices")
+    pending.add_argument("--drain", action="store_true", help="try to send them now")
+    pending.set_defaults(func=cmd_pending)
+
+    import_cmd = commands.add_parser("import", help="add devices (and users) from a CSV or JSON file")
+    import_cmd.add_argument("file")
+    import_cmd.add_argument("--users", action="store_true", help="also add each device as a user")
+    import_cmd.add_argument("--dry-run", action="store_true", help="only show what would be added")
+    import_cmd.set_defaults(func=cmd_import)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if args.server:
+        try:
+            hubs.switch_hub(args.server, persist=False)
+        except hubs.HubError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return EXIT_FAILED
+
+    if not CONFIG["api_url"] or not CONFIG["api_key"] or CONFIG["api_key"] == 'YOUR_SYNCTHING_API_KEY':
+        print(f"Error: set api_url and api_key in {CONFIG_FILE} first.", file=sys.stderr)
+        return EXIT_FAILED
+
+    try:
+        return args.func(args)
+    except OperationError as e:
+        print(f"{e.title}: {e.message}", file=sys.stderr)
+    except SyncthingAPIError as e:
+        print(f"API Error: {e}", file=sys.stderr)
+    finally:
+        if args.metrics:
+            write_metrics(args.metrics)
+    return EXIT_FAILED
+
+def write_metrics(path):
+    try:
+        with open(path, "w") as f:
+            f.write(metrics.to_json() if path.endswith(".json") else metrics.to_prometheus())
+    except OSError as e:
+        print(f"Failed to write metrics: {e}", file=sys.stderr)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,276 @@
+"""asyncio counterpart of SyncthingAPI, for querying many devices from one thread.
+
+Needs aiohttp (pip install aiohttp), the rest of the app works without it. All clients
+share one AsyncSessionPool, which caps open connections in total and per device, so
+thousands of device queries can be started at once and simply wait for a free slot.
+
+The Tk thread must never block on a coroutine. AsyncLoopThread runs an event loop on
+a daemon thread, and its run() can be handed to BackgroundWorker like any other call:
+
+	worker.submit("Checking devices", async_loop.run, check_devices(users), on_success=...)
+
+Pressing Cancel cancels the coroutine, and with it every request it still has open.
+"""
+from concurrent.futures import TimeoutError as FutureTimeout
+import asyncio
+import atexit
+import copy
+import threading
+import time
+from urllib.parse import quote
+
+try:
+	import aiohttp
+except ImportError:
+	aiohttp = None
+
+from components.syncthing_api import SyncthingAPI, SyncthingAPIError, DEFAULT_TIMEOUT, DEFAULT_WRITE_TIMEOUT, encode_body
+from components.fanout import DeviceResult
+from components.metrics import metrics
+from components.health import health
+from components.worker import Cancelled, current_task
+
+DEFAULT_CONNECTION_LIMIT = 100
+DEFAULT_PER_HOST_LIMIT = 4
+
+def require_aiohttp():
+	if aiohttp is None:
+		raise SyncthingAPIError("The async client needs aiohttp, install it with: pip install aiohttp")
+
+class AsyncSessionPool():
+	"""One aiohttp session shared by every AsyncSyncthingAPI on an event loop.
+
+	limit caps open connections in total and limit_per_host per device. The session
+	is created on first use, so the pool can be built outside the loop.
+	"""
+
+	def __init__(self, limit=DEFAULT_CONNECTION_LIMIT, limit_per_host=DEFAULT_PER_HOST_LIMIT):
+		require_aiohttp()
+		self.limit = limit
+		self.limit_per_host = limit_per_host
+		self._session = None
+
+	@classmethod
+	def from_config(cls, config):
+		return cls(config.get("async_connection_limit", DEFAULT_CONNECTION_LIMIT), config.get("async_per_host_limit", DEFAULT_PER_HOST_LIMIT))
+
+	def session(self):
+		if self._session is None or self._session.closed:
+			connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host)
+			self._session = aiohttp.ClientSession(connector=connector, headers={"Accept": "application/json"})
+		return self._session
+
+	async def close(self):
+		if self._session is not None:
+			await self._session.close()
+			self._session = None
+
+class AsyncSyncthingAPI():
+	# Same arguments as SyncthingAPI, the config cache is shared with the blocking client
+	def __init__(self, config, api_url=None, api_key=None, timeout=None, pool=None):
+		self.config = config
+		self.timeout = timeout
+		self.pool = pool or AsyncSessionPool.from_config(config)
+		self._sync = SyncthingAPI(config, api_url, api_key, timeout)
+
+	@property
+	def api_url(self):
+		return self._sync.api_url
+
+	@property
+	def api_key(self):
+		return self._sync.api_key
+
+	def invalidate_config(self):
+		self._sync.invalidate_config()
+
+	async def _request(self, method, path, action, timeout=None, **kwargs):
+		"""Send one request and return the decoded JSON body (None when it is empty).
+
+		The timeout bounds connecting and each read, not the time spent waiting for a free
+		connection, so a long queue of requests doesn't time out before it is sent.
+		"""
+		if timeout is None:
+			timeout = self.timeout or (DEFAULT_TIMEOUT if method == "GET" else DEFAULT_WRITE_TIMEOUT)
+		if health.is_open(self.api_url):
+			raise SyncthingAPIError(f"Skipped trying to {action}: {health.open_error_message(self.api_url)}", unreachable=True)
+		headers = {"X-API-Key": self.api_key}
+		if "json" in kwargs:
+			# Same compact (and optionally gzipped) bodies as the blocking client
+			kwargs["data"], body_headers = encode_body(kwargs.pop("json"), self.config)
+			headers.update(body_headers)
+		client_timeout = aiohttp.ClientTimeout(total=None, sock_connect=timeout, sock_read=timeout)
+		started = time.perf_counter()
+		try:
+			async with self.pool.session().request(method, f'{self.api_url}{path}', headers=headers, timeout=client_timeout, **kwargs) as r:
+				body = await r.read()
+				health.record_success(self.api_url, self.api_key)
+				metrics.record_request(method, path, time.perf_counter() - started, int(r.request_info.headers.get("Content-Length", 0)), len(body), error=r.status >= 400)
+				if r.status >= 400:
+					raise SyncthingAPIError(f"Failed to {action}. API Error: {body.decode(errors='replace').strip()} (Status: {r.status})", r.status)
+				return await r.json(content_type=None) if body else None
+		except asyncio.TimeoutError as e:
+			metrics.record_request(method, path, time.perf_counter() - started, error=True, timeout=True)
+			health.record_failure(self.api_url, self.api_key, str(e) or "timed out")
+			raise SyncthingAPIError(f"Connection timed out while trying to {action}.", unreachable=True)
+		except aiohttp.ClientConnectionError as e:
+			metrics.record_request(method, path, time.perf_counter() - started, error=True)
+			health.record_failure(self.api_url, self.api_key, e)
+			raise SyncthingAPIError(f"An unexpected error occurred trying to {action}: {e}", unreachable=True)
+		except aiohttp.ClientError as e:
+			metrics.record_request(method, path, time.perf_counter() - started, error=True)
+			raise SyncthingAPIError(f"An unexpected error occurred trying to {action}: {e}")
+		finally:
+			if method != "GET":
+				self.invalidate_config()
+
+	async def _get_json_or_none(self, path, action):
+		try:
+			return await self._request("GET", path, action)
+		except SyncthingAPIError as e:
+			if e.status_code == 404:
+				return None
+			raise
+
+	async def get_config(self, use_cache=True):
+		# A fresh entry from the shared cache is returned as is, otherwise the config is fetched and cached
+		if use_cache and self._sync.config_cache_ttl > 0:
+			cached = self._sync._cached_config()
+			if cached is not None:
+				return cached
+		return self._sync._store_config(await self._request("GET", '/system/config', "fetch config"), None)
+
+	async def post_config(self, config_data):
+		await self._request("POST", '/system/config', "update config", json=config_data)
+		return True
+
+	async def get_status(self):
+		return await self._request("GET", '/system/status', "fetch status")
+
+	async def get_connections(self):
+		return await self._request("GET", '/system/connections', "fetch connections")
+
+	async def get_overview(self, use_cache=True):
+		# Config, status and connections side by side, like SyncthingAPI.get_overview
+		return tuple(await asyncio.gather(self.get_config(use_cache), self.get_status(), self.get_connections()))
+
+	async def get_folders(self):
+		cached = self._sync._cached_config()
+		if cached is not None:
+			return copy.deepcopy(cached.get('folders', []))
+		return await self._request("GET", '/config/folders', "fetch folders")
+
+	async def get_folder(self, folder_id):
+		return await self._get_json_or_none(f'/config/folders/{quote(folder_id, safe="")}', f"fetch folder {folder_id}")
+
+	async def put_folders(self, folders):
+		await self._request("PUT", '/config/folders', "update folders", json=folders)
+		return True
+
+	async def patch_folder(self, folder_id, changes):
+		await self._request("PATCH", f'/config/folders/{quote(folder_id, safe="")}', f"update folder {folder_id}", json=changes)
+		return True
+
+	async def delete_folder(self, folder_id):
+		try:
+			await self._request("DELETE", f'/config/folders/{quote(folder_id, safe="")}', f"remove folder {folder_id}")
+		except SyncthingAPIError as e:
+			if e.status_code != 404:
+				raise
+		return True
+
+	async def get_devices(self):
+		cached = self._sync._cached_config()
+		if cached is not None:
+			return copy.deepcopy(cached.get('devices', []))
+		return await self._request("GET", '/config/devices', "fetch devices")
+
+	async def get_device(self, device_id):
+		return await self._get_json_or_none(f'/config/devices/{quote(device_id, safe="")}', f"fetch device {device_id}")
+
+	async def put_devices(self, devices):
+		await self._request("PUT", '/config/devices', "update devices", json=devices)
+		return True
+
+	async def add_device(self, device):
+		await self._request("POST", '/config/devices', f"add device {device['deviceID']}", json=device)
+		return True
+
+async def fan_out_async(config, users, operation, pool=None, timeout=None):
+	"""Run await operation(client, username, user_info) for every user's own device at once.
+
+	client is an AsyncSyncthingAPI for that user's api_url/api_key. How many requests are
+	really in flight is decided by the pool's connection limits. Returns one DeviceResult
+	per user in the order of users, like fan_out().
+	"""
+	pool = pool or AsyncSessionPool.from_config(config)
+	timeout = timeout or config.get("device_timeout")
+
+	async def run(username, user_info):
+		device_id = user_info.get("device_id", "")
+		if not (user_info.get("api_url") and user_info.get("api_key")):
+			return DeviceResult(username, device_id, False, f"{username}'s API details are not configured.")
+		client = AsyncSyncthingAPI(config, user_info["api_url"], user_info["api_key"], timeout, pool)
+		started = time.monotonic()
+		try:
+			value = await operation(client, username, user_info)
+			return DeviceResult(username, device_id, True, elapsed=time.monotonic() - started, value=value)
+		except Exception as e:
+			return DeviceResult(username, device_id, False, str(e), time.monotonic() - started)
+
+	return list(await asyncio.gather(*(run(username, info) for username, info in users.items())))
+
+async def read_user_configs(config, users, pool=None, timeout=None):
+	# Folders and devices of every user's device, DeviceResult.value is {"folders": ..., "devices": ...}
+	async def read(client, username, user_info):
+		folders, devices = await asyncio.gather(client.get_folders(), client.get_devices())
+		return {"folders": folders, "devices": devices}
+	return await fan_out_async(config, users, read, pool, timeout)
+
+class AsyncLoopThread():
+	"""An asyncio event loop on a daemon thread, with one AsyncSessionPool for it.
+
+	submit() schedules a coroutine from any thread and returns a concurrent.futures.Future.
+	run() waits for the result and is meant for BackgroundWorker tasks: when the task is
+	cancelled the coroutine is cancelled too and Cancelled is raised.
+	"""
+
+	def __init__(self, config, poll_interval=0.1):
+		require_aiohttp()
+		self.config = config
+		self.poll_interval = poll_interval
+		self.pool = AsyncSessionPool.from_config(config)
+		self._loop = None
+		self._thread = None
+		self._lock = threading.Lock()
+
+	def _ensure_started(self):
+		with self._lock:
+			if self._thread is None or not self._thread.is_alive():
+				self._loop = asyncio.new_event_loop()
+				self._thread = threading.Thread(target=self._loop.run_forever, name="asyncio-loop", daemon=True)
+				self._thread.start()
+				atexit.register(self.stop)
+		return self._loop
+
+	def submit(self, coro):
+		return asyncio.run_coroutine_threadsafe(coro, self._ensure_started())
+
+	def run(self, coro):
+		future = self.submit(coro)
+		task = current_task()
+		while True:
+			try:
+				return future.result(timeout=self.poll_interval)
+			except FutureTimeout:
+				if task is not None and task.cancelled:
+					future.cancel()
+					raise Cancelled()
+
+	def stop(self):
+		if self._loop is None or not self._thread.is_alive():
+			return
+		asyncio.run_coroutine_threadsafe(self.pool.close(), self._loop).result(timeout=5)
+		self._loop.call_soon_threadsafe(self._loop.stop)
+		self._thread.join(timeout=5)
+		self._loop = None
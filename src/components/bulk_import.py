@@ -0,0 +1,164 @@
+"""Add many devices, and optionally their users, from a CSV or JSON file.
+
+Every row is checked locally first: the device ID's check characters, duplicates within
+the file and devices the server already knows (one set built from one config read).
+The new devices are then sent in a single PUT /config/devices, and the users are added
+to CONFIG with one save, instead of a config round trip per device.
+
+CSV files need a header row, JSON files hold a list of objects (or {"devices": [...]}).
+Recognised columns:
+
+	device_id   required
+	name        required, the device name on the server
+	user        username to register, defaults to name when users are registered
+	api_url     the user's own Syncthing API, optional
+	api_key     optional
+	introducer  true/false, optional
+"""
+import csv
+import json
+from components.config import CONFIG, schedule_save
+from components.device_id import normalize_device_id, InvalidDeviceID
+from components.operations import api, OperationError
+
+TRUE_VALUES = ("1", "true", "yes", "y")
+
+class ImportRow():
+	def __init__(self, line, device_id, name, username="", api_url="", api_key="", introducer=False):
+		# line is the row's position in the file, for error messages
+		self.line = line
+		self.device_id = device_id
+		self.name = name
+		self.username = username
+		self.api_url = api_url
+		self.api_key = api_key
+		self.introducer = introducer
+
+	def device_entry(self):
+		return {
+			"deviceID": self.device_id,
+			"name": self.name,
+			"addresses": ["dynamic"],
+			"compression": "metadata",
+			"introducer": self.introducer
+		}
+
+class ImportPlan():
+	def __init__(self):
+		self.devices = []
+		# username -> settings to add to CONFIG["users"]
+		self.users = {}
+		# (line, reason) for rows that are left out
+		self.skipped = []
+		self.invalid = []
+
+	@property
+	def empty(self):
+		return not self.devices and not self.users
+
+	def describe(self):
+		lines = [f"add device {d['name']} ({d['deviceID']})" for d in self.devices]
+		lines += [f"add user {username}" for username in self.users]
+		lines += [f"line {line}: skipped, {reason}" for line, reason in self.skipped]
+		lines += [f"line {line}: invalid, {reason}" for line, reason in self.invalid]
+		return lines
+
+def _text(value):
+	return "" if value is None else str(value).strip()
+
+def _row(line, data):
+	introducer = data.get("introducer", False)
+	if not isinstance(introducer, bool):
+		introducer = _text(introducer).lower() in TRUE_VALUES
+	return ImportRow(
+		line,
+		_text(data.get("device_id") or data.get("deviceID")),
+		_text(data.get("name")),
+		_text(data.get("user")),
+		_text(data.get("api_url")),
+		_text(data.get("api_key")),
+		introducer
+	)
+
+def read_rows(path):
+	"""Read ImportRows from a .csv or .json file, raises OperationError if it can't be parsed."""
+	try:
+		with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+			if path.lower().endswith(".json"):
+				data = json.load(f)
+				items = data.get("devices", []) if isinstance(data, dict) else data
+				if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+					raise OperationError("Import Failed", f"'{path}' should hold a list of device objects.")
+				return [_row(i + 1, item) for i, item in enumerate(items)]
+			reader = csv.DictReader(f)
+			if not reader.fieldnames or "device_id" not in [n.strip() for n in reader.fieldnames]:
+				raise OperationError("Import Failed", f"'{path}' needs a header row with at least device_id and name.")
+			# Line 1 is the header
+			return [_row(i + 2, {k.strip(): v for k, v in item.items() if k}) for i, item in enumerate(reader)]
+	except (OSError, ValueError, csv.Error) as e:
+		raise OperationError("Import Failed", f"Could not read '{path}': {e}")
+
+def plan_import(rows, existing_devices, users, register_users=False):
+	"""Work out which rows become devices and users, without changing anything.
+
+	existing_devices are the server's device entries, users the configured usernames.
+	"""
+	plan = ImportPlan()
+	known = {d['deviceID'] for d in existing_devices}
+	seen = set()
+	known_users = set(users)
+
+	for row in rows:
+		if not row.device_id or not row.name:
+			plan.invalid.append((row.line, "device_id and name are required"))
+			continue
+		try:
+			row.device_id = normalize_device_id(row.device_id)
+		except InvalidDeviceID as e:
+			plan.invalid.append((row.line, f"device ID {row.device_id}: {e}"))
+			continue
+
+		if row.device_id in seen:
+			plan.skipped.append((row.line, f"device {row.device_id} is listed twice"))
+			continue
+		seen.add(row.device_id)
+		if row.device_id in known:
+			plan.skipped.append((row.line, f"device {row.name} already exists"))
+		else:
+			plan.devices.append(row.device_entry())
+
+		if register_users:
+			username = row.username or row.name
+			if username in plan.users:
+				plan.skipped.append((row.line, f"user {username} is listed twice"))
+				continue
+			if username in known_users:
+				plan.skipped.append((row.line, f"user {username} already exists"))
+				continue
+			plan.users[username] = {"device_id": row.device_id, "api_url": row.api_url, "api_key": row.api_key}
+	return plan
+
+def send_devices(plan):
+	# One config change for all devices
+	if plan.devices:
+		api.put_devices(plan.devices)
+	return plan
+
+def add_users(plan):
+	# Changes CONFIG["users"], so the GUI calls this on the Tk thread, which iterates it while drawing
+	for username, settings in plan.users.items():
+		CONFIG["users"][username] = settings
+		schedule_save(username)
+	return plan
+
+def apply_import(plan):
+	# Devices first, the users are only added once the server has their devices
+	send_devices(plan)
+	return add_users(plan)
+
+def import_devices(path, register_users=False, dry_run=False):
+	rows = read_rows(path)
+	plan = plan_import(rows, api.get_devices(shared=True), CONFIG["users"], register_users)
+	if not dry_run:
+		apply_import(plan)
+	return plan
@@ -1,43 +1,235 @@
+import atexit
 import os
 import json
-import tkinter.messagebox as messagebox
+import sqlite3
+import threading
 
-CONFIG_DIR = os.path.join("data")
+# Scripts run from cron can point at the GUI's data directory with P2PSHARE_DATA_DIR
+CONFIG_DIR = os.environ.get("P2PSHARE_DATA_DIR", os.path.join("data"))
 CONFIG_FILE = os.path.join(CONFIG_DIR, "sync_config.json")
+# Used instead of CONFIG_FILE when it exists, or when P2PSHARE_STORAGE=sqlite (the JSON file is imported once)
+CONFIG_DB = os.path.join(CONFIG_DIR, "sync_config.db")
+
+# Seconds schedule_save waits to collect more changes into one write
+SAVE_DELAY = 1.0
+
+# Set when load_config had to create an empty config, the GUI then points the user at the Settings tab
+config_created = False
+
+def empty_config():
+	return {
+		"api_url": "",
+		"api_key": "",
+		"this_device_id": "",
+		"users": {
+			"Bob": {"device_id": "", "api_url": "", "api_key": ""}
+		}
+	}
+
+def write_json(path, data):
+	"""Write data to path as indented JSON without ever leaving half a file behind.
+
+	It goes to a temp file that is synced to disk and then replaces path, so a crash
+	mid-write leaves the previous file intact.
+	"""
+	os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+	tmp_path = f"{path}.tmp"
+	with open(tmp_path, 'w') as f:
+		json.dump(data, f, indent=4)
+		f.flush()
+		os.fsync(f.fileno())
+	os.replace(tmp_path, path)
+
+class JSONStore():
+	"""The whole config in sync_config.json, rewritten on every save with write_json().
+
+	The file stays indented because people edit it by hand.
+	"""
+
+	path = CONFIG_FILE
+
+	def exists(self):
+		return os.path.exists(self.path)
+
+	def load(self):
+		with open(self.path, 'r') as f:
+			return json.load(f)
+
+	def save(self, config):
+		write_json(self.path, config)
+
+	def save_settings(self, config):
+		self.save(config)
+
+	def save_users(self, config, usernames):
+		# A JSON file can only be rewritten as a whole
+		self.save(config)
+
+class SQLiteStore():
+	"""Settings and users as rows in sync_config.db.
+
+	Every top-level key is a row in settings and every user a row in users, both holding
+	JSON. Changing one user writes one row instead of the whole roster.
+	"""
+
+	path = CONFIG_DB
+
+	def __init__(self):
+		self._lock = threading.Lock()
+
+	def _connect(self):
+		os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+		db = sqlite3.connect(self.path)
+		db.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+		db.execute("CREATE TABLE IF NOT EXISTS users (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+		return db
+
+	def exists(self):
+		return os.path.exists(self.path)
+
+	def load(self):
+		with self._lock:
+			db = self._connect()
+			try:
+				config = {key: json.loads(value) for key, value in db.execute("SELECT key, value FROM settings")}
+				config["users"] = {name: json.loads(value) for name, value in db.execute("SELECT name, value FROM users ORDER BY rowid")}
+			finally:
+				db.close()
+		return config
+
+	def save(self, config):
+		self._write(config, settings=True, usernames=None)
+
+	def save_settings(self, config):
+		self._write(config, settings=True, usernames=())
+
+	def save_users(self, config, usernames):
+		self._write(config, settings=False, usernames=usernames)
+
+	def _write(self, config, settings, usernames):
+		# usernames=None rewrites every user, users missing from config are deleted
+		users = config.get("users", {})
+		with self._lock:
+			db = self._connect()
+			try:
+				with db:
+					if settings:
+						db.execute("DELETE FROM settings")
+						db.executemany("INSERT INTO settings (key, value) VALUES (?, ?)",
+							[(key, json.dumps(value)) for key, value in config.items() if key != "users"])
+					if usernames is None:
+						db.execute("DELETE FROM users")
+						usernames = list(users)
+					for name in usernames:
+						if name in users:
+							db.execute("INSERT INTO users (name, value) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = excluded.value",
+								(name, json.dumps(users[name])))
+						else:
+							db.execute("DELETE FROM users WHERE name = ?", (name,))
+			finally:
+				db.close()
+
+def open_store():
+	if os.path.exists(CONFIG_DB) or os.environ.get("P2PSHARE_STORAGE") == "sqlite":
+		return SQLiteStore()
+	return JSONStore()
+
+store = open_store()
 
 def load_config():
+	global config_created
 	os.makedirs(CONFIG_DIR, exist_ok=True)
-	if os.path.exists(CONFIG_FILE):
-		with open(CONFIG_FILE, 'r') as f:
-			config = json.load(f)
+	if store.exists():
+		return store.load()
+	if isinstance(store, SQLiteStore) and os.path.exists(CONFIG_FILE):
+		# Switching to SQLite, the JSON file is imported once and left in place as a backup
+		config = JSONStore().load()
+		store.save(config)
 		return config
-	else:
-		empty_config = {
-			"api_url": "",
-			"api_key": "",
-			"this_device_id": "",
-			"users": {
-				"Bob": {"device_id": "", "api_url": "", "api_key": ""}			
-    		}
-		}
-		with open(CONFIG_FILE, 'w') as f:
-			json.dump(empty_config, f, indent=4)
-		
-		messagebox.showinfo(
-			"No existing config found. A new empty config file has been created.\n\n"
-			"Please fill in your Syncthing API details in the Settings tab."
-		)
-  
-		return empty_config
-
-def save_config(config):
-    try:
-        os.makedirs(CONFIG_DIR, exist_ok=True)
-        with open(CONFIG_FILE, 'w') as f:
-            json.dump(config, f, indent=4)
-        return True
-    except Exception as e:
-        messagebox.showerror("Config Error", f"Error saving configuration: {e}")
-        return False
-
-CONFIG = load_config()
\ No newline at end of file
+
+	config = empty_config()
+	store.save(config)
+	config_created = True
+	return config
+
+# Top-level keys changed for this run only (cli.py --server), key -> value saves keep writing
+_unsaved = {}
+_MISSING = object()
+
+def set_unsaved(key, value):
+	"""Change CONFIG[key] until the process exits, saves keep writing the value it had before."""
+	_unsaved.setdefault(key, CONFIG.get(key, _MISSING))
+	CONFIG[key] = value
+
+def saved_view(config):
+	# config as it should be written, without the changes made by set_unsaved()
+	if not _unsaved:
+		return config
+	view = dict(config)
+	for key, value in _unsaved.items():
+		if value is _MISSING:
+			view.pop(key, None)
+		else:
+			view[key] = value
+	return view
+
+# Changes waiting for the debounced save
+_dirty = {"settings": False, "users": set()}
+_save_lock = threading.Lock()
+# Only one thread writes the store at a time
+_write_lock = threading.Lock()
+_save_timer = None
+# Error from the last background save, None when it worked
+last_save_error = None
+
+def schedule_save(username=None):
+	"""Save CONFIG shortly, together with any other change made in the meantime.
+
+	Pass username when only that user changed, the SQLite store then writes just that row.
+	Errors are kept in last_save_error, flush_saves() writes straight away and returns them.
+	"""
+	global _save_timer
+	with _save_lock:
+		if username is None:
+			_dirty["settings"] = True
+		else:
+			_dirty["users"].add(username)
+		if _save_timer is None:
+			_save_timer = threading.Timer(SAVE_DELAY, flush_saves)
+			_save_timer.daemon = True
+			_save_timer.start()
+
+def flush_saves():
+	# Writes pending changes now and returns the error or None, also runs at exit so nothing scheduled is lost
+	global _save_timer, last_save_error
+	with _save_lock:
+		if _save_timer is not None:
+			_save_timer.cancel()
+			_save_timer = None
+		settings = _dirty["settings"]
+		usernames = set(_dirty["users"])
+		_dirty["settings"] = False
+		_dirty["users"].clear()
+	if not settings and not usernames:
+		return None
+	try:
+		with _write_lock:
+			config = saved_view(CONFIG)
+			if settings:
+				store.save_settings(config)
+			if usernames and not (settings and isinstance(store, JSONStore)):
+				store.save_users(config, usernames)
+		last_save_error = None
+	except Exception as e:
+		# Kept dirty so the next save tries again. Not only OSError/sqlite3.Error: json.dumps
+		# over a CONFIG that another thread is changing raises RuntimeError, and an exception
+		# escaping here would end the timer thread with the change lost
+		with _save_lock:
+			_dirty["settings"] = _dirty["settings"] or settings
+			_dirty["users"].update(usernames)
+		last_save_error = e
+	return last_save_error
+
+atexit.register(flush_saves)
+
+CONFIG = load_config()
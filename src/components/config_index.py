@@ -0,0 +1,87 @@
+from collections import defaultdict
+from components.paths import PathTrie
+
+class ConfigIndex():
+	"""Lookup tables for one config snapshot, built once so the Overview never rescans the config.
+
+	The owner of a folder is its first non-server device, matching get_folder_owner_id in main.py.
+	"""
+
+	def __init__(self, config, this_id, users):
+		self.config = config
+		self.this_id = this_id
+		self.users = users
+		self.user_by_device = {info["device_id"]: name for name, info in users.items() if info.get("device_id")}
+
+		self.devices = {}
+		for dev in config.get('devices', []):
+			self.devices[dev['deviceID']] = dev
+
+		self.folders = {}
+		self.folder_devices = {}
+		self.owners = {}
+		self.folders_by_device = defaultdict(set)
+		for folder in config.get('folders', []):
+			folder_id = folder['id']
+			device_ids = [d['deviceID'] for d in folder.get('devices', [])]
+			self.folders[folder_id] = folder
+			self.folder_devices[folder_id] = set(device_ids)
+			self.owners[folder_id] = next((d for d in device_ids if d != this_id), None)
+			for dev_id in device_ids:
+				self.folders_by_device[dev_id].add(folder_id)
+
+		# Filled per user on first use: user -> (my folder IDs, discoverable folder IDs)
+		self._views = {}
+		self._path_trie = None
+
+	def is_current(self, config, this_id, users):
+		# The device -> user map is rebuilt when a device ID is changed in Settings
+		user_devices = {info["device_id"]: name for name, info in users.items() if info.get("device_id")}
+		return self.config is config and self.this_id == this_id and self.user_by_device == user_devices
+
+	@property
+	def path_trie(self):
+		# Built on first use, only the Add New Folder checks need it
+		if self._path_trie is None:
+			self._path_trie = PathTrie.from_folders(self.folders.values())
+		return self._path_trie
+
+	def user_for_device(self, device_id):
+		return self.user_by_device.get(device_id)
+
+	def owner_of(self, folder_id):
+		return self.owners.get(folder_id)
+
+	def folders_for_device(self, device_id):
+		return self.folders_by_device.get(device_id, set())
+
+	def view_for_user(self, username):
+		"""Return (my folder IDs, discoverable folder IDs) for username, both in config order.
+
+		My folders are shared with the user's device. Discoverable folders are shared with
+		another configured user and are either public or owned by this user.
+		"""
+		if username in self._views:
+			return self._views[username]
+
+		user_id = self.users[username]["device_id"]
+		other_user_ids = {info["device_id"] for name, info in self.users.items() if name != username and info.get("device_id")}
+		my_folders = []
+		discoverable = []
+
+		# Ignore folders not involving this instance
+		for folder_id in self.folders:
+			folder_devices = self.folder_devices[folder_id]
+			if self.this_id not in folder_devices:
+				continue
+			if user_id in folder_devices:
+				my_folders.append(folder_id)
+				continue
+			is_private = self.folders[folder_id].get('private', False)
+			if is_private and self.owners[folder_id] != user_id:
+				continue
+			if not folder_devices.isdisjoint(other_user_ids):
+				discoverable.append(folder_id)
+
+		self._views[username] = (my_folders, discoverable)
+		return self._views[username]
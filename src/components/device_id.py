@@ -0,0 +1,44 @@
+"""Syncthing device ID checks that don't need the server.
+
+A device ID is the base32 SHA-256 of the device certificate (52 characters) split into
+four groups of 13, each followed by a Luhn mod 32 check character, and shown as eight
+dash-separated groups of 7: XXXXXXX-XXXXXXX-...  Typos are caught here instead of
+showing up as a device that never connects.
+"""
+import re
+
+ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZ234567"
+# Characters people mistype for base32 ones, Syncthing accepts the same substitutions
+_LOOKALIKES = str.maketrans({"0": "O", "1": "I", "8": "B"})
+
+class InvalidDeviceID(ValueError):
+	pass
+
+def luhn_base32(chunk):
+	factor = 1
+	total = 0
+	for char in chunk:
+		addend = factor * ALPHABET.index(char)
+		factor = 1 if factor == 2 else 2
+		total += addend // 32 + addend % 32
+	return ALPHABET[(32 - total % 32) % 32]
+
+def normalize_device_id(raw):
+	"""Return device ID raw in the canonical dashed form, raises InvalidDeviceID.
+
+	The 52 character form without check characters is accepted and gets them added.
+	"""
+	value = re.sub(r"[\s-]", "", str(raw)).upper().translate(_LOOKALIKES)
+	bad = sorted(set(c for c in value if c not in ALPHABET))
+	if bad:
+		raise InvalidDeviceID(f"invalid characters {''.join(bad)}")
+
+	if len(value) == 52:
+		value = "".join(value[i:i + 13] + luhn_base32(value[i:i + 13]) for i in range(0, 52, 13))
+	elif len(value) == 56:
+		for i in range(0, 56, 14):
+			if luhn_base32(value[i:i + 13]) != value[i + 13]:
+				raise InvalidDeviceID(f"check character {i // 14 + 1} doesn't match, the ID has a typo")
+	else:
+		raise InvalidDeviceID(f"expected 56 characters, got {len(value)}")
+	return "-".join(value[i:i + 7] for i in range(0, 56, 7))
@@ -0,0 +1,65 @@
+import threading
+from components.syncthing_api import SyncthingAPIError
+
+DEFAULT_EVENT_TYPES = [
+	"ConfigSaved",
+	"DeviceConnected",
+	"DeviceDisconnected",
+	"DevicePaused",
+	"DeviceResumed",
+	"FolderSummary",
+	"FolderCompletion",
+	"StateChanged"
+]
+
+class EventSubscriber():
+	"""Long-polls /rest/events on a daemon thread and passes each batch to on_events.
+
+	on_events is called from the subscriber thread, GUI code should hand the
+	events over to Tk (see BackgroundWorker.call_in_ui) before touching widgets.
+	"""
+
+	def __init__(self, api, on_events, event_types=None, poll_timeout=60, retry_delay=5):
+		self.api = api
+		self.on_events = on_events
+		self.event_types = event_types or DEFAULT_EVENT_TYPES
+		self.poll_timeout = poll_timeout
+		self.retry_delay = retry_delay
+		self._stop = threading.Event()
+		self._thread = None
+
+	@property
+	def running(self):
+		return self._thread is not None and self._thread.is_alive()
+
+	def start(self):
+		if self.running:
+			return
+		self._stop.clear()
+		self._thread = threading.Thread(target=self._run, name="syncthing-events", daemon=True)
+		self._thread.start()
+
+	def stop(self):
+		self._stop.set()
+
+	def _latest_event_id(self):
+		# Only events from now on matter, the current state comes from a normal refresh
+		events = self.api.get_events(since=0, event_types=self.event_types, timeout=0, limit=1)
+		return events[-1]["id"] if events else 0
+
+	def _run(self):
+		since = None
+		while not self._stop.is_set():
+			try:
+				if since is None:
+					since = self._latest_event_id()
+				events = self.api.get_events(since=since, event_types=self.event_types, timeout=self.poll_timeout)
+			except SyncthingAPIError:
+				# Syncthing may have restarted and reset its event IDs, start over once it is back
+				since = None
+				self._stop.wait(self.retry_delay)
+				continue
+
+			if events and not self._stop.is_set():
+				since = events[-1]["id"]
+				self.on_events(events)
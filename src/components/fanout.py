@@ -0,0 +1,51 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from components.worker import current_task
+
+DEFAULT_MAX_WORKERS = 8
+
+class DeviceResult():
+	def __init__(self, user, device_id, ok, error=None, elapsed=0.0, value=None):
+		self.user = user
+		self.device_id = device_id
+		self.ok = ok
+		self.error = error
+		self.elapsed = elapsed
+		# Whatever the operation returned
+		self.value = value
+
+	def __repr__(self):
+		status = "ok" if self.ok else f"failed: {self.error}"
+		return f"<DeviceResult {self.user} ({self.device_id}) {status} in {self.elapsed:.2f}s>"
+
+def fan_out(users, operation, max_workers=DEFAULT_MAX_WORKERS):
+	"""Run operation(username, user_info) for every entry in users, at most max_workers at a time.
+
+	Returns one DeviceResult per user in the order of users. An exception from operation
+	marks that device as failed without affecting the others. When called from a
+	BackgroundWorker task, devices that haven't started yet are skipped once it is cancelled.
+	"""
+	if not users:
+		return []
+	task = current_task()
+
+	def run(username, user_info):
+		device_id = user_info.get("device_id", "")
+		if task is not None and task.cancelled:
+			return DeviceResult(username, device_id, False, "Cancelled")
+		started = time.monotonic()
+		try:
+			value = operation(username, user_info)
+			return DeviceResult(username, device_id, True, elapsed=time.monotonic() - started, value=value)
+		except Exception as e:
+			return DeviceResult(username, device_id, False, str(e), time.monotonic() - started)
+
+	with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(users))), thread_name_prefix="fan-out") as pool:
+		futures = [pool.submit(run, username, user_info) for username, user_info in users.items()]
+		return [future.result() for future in futures]
+
+def summarize(results):
+	# Returns (succeeded usernames, failure lines) for a summary dialog
+	succeeded = [r.user for r in results if r.ok]
+	failed = [f"{r.user}: {r.error}" for r in results if not r.ok]
+	return succeeded, failed
@@ -0,0 +1,164 @@
+"""Sync progress per folder, from /rest/db/status and /rest/db/completion.
+
+FolderStatusTracker keeps the last status and completion of every folder it was asked
+about. fetch() only asks Syncthing again for entries that are older than the TTL or were
+marked stale by an event, and sends those requests in parallel. Events that carry the
+new numbers (FolderSummary, FolderCompletion) update the cache without a request.
+
+From successive samples it works out throughput (bytes per second the device still
+needs, going down) and flags a folder as stalled when it needs data but made no
+progress for stall_after seconds. poll_interval() is short while anything is syncing
+and long when everything is idle.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+from components.syncthing_api import SyncthingAPIError
+
+DEFAULT_TTL = 5
+DEFAULT_STALL_AFTER = 120
+FAST_POLL = 2
+SLOW_POLL = 30
+BUSY_STATES = ("syncing", "sync-preparing", "scanning", "scan-waiting", "sync-waiting")
+
+class FolderProgress():
+	def __init__(self, folder_id):
+		self.folder_id = folder_id
+		self.status = None
+		self.completion = None
+		self.fetched_at = 0.0
+		self.stale = True
+		self.error = None
+		# Last (time, needBytes) where needBytes changed, for throughput and stall detection
+		self.last_change = None
+		self.throughput = 0.0
+
+	@property
+	def state(self):
+		return (self.status or {}).get("state", "")
+
+	@property
+	def need_bytes(self):
+		if self.completion is not None:
+			return self.completion.get("needBytes", 0)
+		return (self.status or {}).get("needBytes", 0)
+
+	@property
+	def percent(self):
+		if self.completion is not None:
+			return self.completion.get("completion", 0.0)
+		status = self.status or {}
+		global_bytes = status.get("globalBytes", 0)
+		return 100.0 if not global_bytes else 100.0 * status.get("inSyncBytes", 0) / global_bytes
+
+	@property
+	def busy(self):
+		return self.state in BUSY_STATES or self.need_bytes > 0
+
+	def stalled(self, stall_after, now=None):
+		if not self.need_bytes or self.last_change is None:
+			return False
+		return (now or time.monotonic()) - self.last_change[0] > stall_after
+
+	def _track(self, now):
+		# Called after every new sample, throughput is the drop in needBytes per second
+		need = self.need_bytes
+		if self.last_change is None:
+			self.last_change = (now, need)
+			return
+		changed_at, previous = self.last_change
+		if need != previous:
+			elapsed = now - changed_at
+			self.throughput = max(0.0, (previous - need) / elapsed) if elapsed > 0 else 0.0
+			self.last_change = (now, need)
+		elif not need:
+			self.throughput = 0.0
+
+class FolderStatusTracker():
+	def __init__(self, api, device_id=None, max_workers=8, ttl=DEFAULT_TTL, stall_after=DEFAULT_STALL_AFTER):
+		self.api = api
+		# Completion is reported for this device (the active user's), None for just local status
+		self.device_id = device_id
+		self.ttl = ttl
+		self.stall_after = stall_after
+		self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="folder-status")
+		self._lock = threading.Lock()
+		self._folders = {}
+
+	def set_device(self, device_id):
+		# A different user's device, the completion numbers no longer apply
+		with self._lock:
+			if device_id != self.device_id:
+				self.device_id = device_id
+				self._folders.clear()
+
+	def _entry(self, folder_id):
+		entry = self._folders.get(folder_id)
+		if entry is None:
+			entry = self._folders[folder_id] = FolderProgress(folder_id)
+		return entry
+
+	def mark_stale(self, folder_id=None):
+		with self._lock:
+			entries = self._folders.values() if folder_id is None else [self._entry(folder_id)]
+			for entry in entries:
+				entry.stale = True
+
+	def update_status(self, folder_id, status):
+		# FolderSummary events carry the same document as /rest/db/status
+		with self._lock:
+			entry = self._entry(folder_id)
+			entry.status = status
+			entry._track(time.monotonic())
+
+	def update_completion(self, folder_id, device_id, completion):
+		# FolderCompletion events carry the same numbers as /rest/db/completion
+		with self._lock:
+			if device_id != self.device_id:
+				return
+			entry = self._entry(folder_id)
+			entry.completion = completion
+			entry._track(time.monotonic())
+
+	def _fetch_one(self, folder_id, device_id):
+		status = self.api.get_folder_status(folder_id)
+		completion = self.api.get_completion(folder_id, device_id) if device_id else None
+		return status, completion
+
+	def fetch(self, folder_ids):
+		"""Refresh folder_ids where needed and return {folder_id: FolderProgress} for all of them."""
+		now = time.monotonic()
+		with self._lock:
+			device_id = self.device_id
+			due = [f for f in folder_ids if self._entry(f).stale or now - self._entry(f).fetched_at >= self.ttl]
+
+		futures = {folder_id: self._executor.submit(self._fetch_one, folder_id, device_id) for folder_id in due}
+		for folder_id, future in futures.items():
+			try:
+				status, completion = future.result()
+				error = None
+			except SyncthingAPIError as e:
+				status, completion, error = None, None, str(e)
+			with self._lock:
+				if device_id != self.device_id:
+					break
+				entry = self._entry(folder_id)
+				entry.error = error
+				if error is None:
+					entry.status = status
+					entry.completion = completion
+					entry._track(time.monotonic())
+				entry.fetched_at = time.monotonic()
+				entry.stale = False
+
+		with self._lock:
+			return {folder_id: self._entry(folder_id) for folder_id in folder_ids}
+
+	def poll_interval(self, folder_ids):
+		with self._lock:
+			entries = [self._folders[f] for f in folder_ids if f in self._folders]
+		return FAST_POLL if any(e.busy or e.stale for e in entries) else SLOW_POLL
+
+	def total_throughput(self):
+		with self._lock:
+			return sum(e.throughput for e in self._folders.values())
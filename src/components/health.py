@@ -0,0 +1,129 @@
+"""Reachability of every Syncthing endpoint, with a circuit breaker per endpoint.
+
+SyncthingAPI reports each request here. After failure_threshold connection failures or
+timeouts in a row the endpoint is opened: requests to it fail straight away instead of
+waiting out the timeout again. A daemon thread probes open endpoints every
+probe_interval seconds and closes the circuit as soon as one answers. Any HTTP answer,
+even an error status, counts as reachable.
+"""
+import threading
+import time
+import requests
+
+CLOSED = "closed"
+OPEN = "open"
+
+DEFAULT_FAILURE_THRESHOLD = 3
+DEFAULT_PROBE_INTERVAL = 15
+PROBE_TIMEOUT = 3
+
+class EndpointHealth():
+	def __init__(self, api_url, api_key):
+		self.api_url = api_url
+		self.api_key = api_key
+		self.state = CLOSED
+		self.failures = 0
+		self.opened_at = None
+		self.last_error = None
+		self.last_success = None
+
+class HealthTracker():
+	def __init__(self, failure_threshold=DEFAULT_FAILURE_THRESHOLD, probe_interval=DEFAULT_PROBE_INTERVAL):
+		self.failure_threshold = failure_threshold
+		self.probe_interval = probe_interval
+		self._endpoints = {}
+		self._lock = threading.Lock()
+		self._wake = threading.Event()
+		self._thread = None
+		# Called with the api_url from the probe or request thread whenever a circuit opens or closes
+		self.listeners = []
+
+	def configure(self, config):
+		self.failure_threshold = config.get("circuit_failure_threshold", DEFAULT_FAILURE_THRESHOLD)
+		self.probe_interval = config.get("circuit_probe_interval", DEFAULT_PROBE_INTERVAL)
+
+	def _entry(self, api_url, api_key):
+		key = api_url.rstrip('/')
+		entry = self._endpoints.get(key)
+		if entry is None:
+			entry = self._endpoints[key] = EndpointHealth(key, api_key)
+		entry.api_key = api_key
+		return entry
+
+	def is_open(self, api_url):
+		entry = self._endpoints.get(api_url.rstrip('/'))
+		return entry is not None and entry.state == OPEN
+
+	def state(self, api_url):
+		# Returns the EndpointHealth for api_url, or None if nothing was sent there yet
+		return self._endpoints.get(api_url.rstrip('/'))
+
+	def record_success(self, api_url, api_key):
+		with self._lock:
+			entry = self._entry(api_url, api_key)
+			reopened = entry.state == OPEN
+			entry.state = CLOSED
+			entry.failures = 0
+			entry.opened_at = None
+			entry.last_success = time.time()
+		if reopened:
+			self._notify(entry.api_url)
+
+	def record_failure(self, api_url, api_key, error):
+		with self._lock:
+			entry = self._entry(api_url, api_key)
+			entry.failures += 1
+			entry.last_error = str(error)
+			opened = entry.state == CLOSED and entry.failures >= self.failure_threshold
+			if opened:
+				entry.state = OPEN
+				entry.opened_at = time.time()
+		if opened:
+			self._ensure_prober()
+			self._notify(entry.api_url)
+
+	def open_error_message(self, api_url):
+		entry = self.state(api_url)
+		if entry is None:
+			return ""
+		since = time.strftime("%H:%M:%S", time.localtime(entry.opened_at))
+		return f"{api_url} has been unreachable since {since} ({entry.last_error}), retrying in the background."
+
+	def probe_now(self):
+		self._wake.set()
+
+	def _notify(self, api_url):
+		for listener in list(self.listeners):
+			listener(api_url)
+
+	def _ensure_prober(self):
+		with self._lock:
+			if self._thread is None:
+				self._thread = threading.Thread(target=self._probe_loop, name="health-probe", daemon=True)
+				self._thread.start()
+
+	def _probe_loop(self):
+		while True:
+			self._wake.wait(self.probe_interval)
+			self._wake.clear()
+			with self._lock:
+				open_endpoints = [(e.api_url, e.api_key) for e in self._endpoints.values() if e.state == OPEN]
+				if not open_endpoints:
+					# Cleared under the lock, so an endpoint opening now starts a new prober
+					self._thread = None
+					return
+			for api_url, api_key in open_endpoints:
+				self._probe(api_url, api_key)
+
+	def _probe(self, api_url, api_key):
+		# A plain request without the pooled session's retries, one quick try per round
+		try:
+			requests.get(f"{api_url}/system/ping", headers={"X-API-Key": api_key}, timeout=PROBE_TIMEOUT)
+		except Exception as e:
+			with self._lock:
+				self._entry(api_url, api_key).last_error = str(e)
+			return
+		self.record_success(api_url, api_key)
+
+# Shared by every client in the process
+health = HealthTracker()
@@ -0,0 +1,71 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_RETRIES = 3
+# Connect attempts are retried at most this often, whatever "retries" says
+MAX_CONNECT_RETRIES = 1
+DEFAULT_BACKOFF = 0.5
+
+# One session per (api_url, api_key) so the central server and every user device keep their connections warm
+_sessions = {}
+_lock = threading.Lock()
+
+def _make_session(api_key, pool_size, retries, backoff):
+	session = requests.Session()
+	session.headers.update({
+		'X-API-Key': api_key,
+		'Accept': 'application/json',
+		# Syncthing compresses responses for clients that ask, requests decodes them while reading
+		'Accept-Encoding': 'gzip',
+		'Connection': 'keep-alive'
+	})
+	# Only idempotent requests are retried, a failed POST is reported straight away.
+	# A read that timed out isn't retried and a connect only once, a device that hangs
+	# would otherwise cost (retries + 1) timeouts per call. Outages are left to health.py
+	retry = Retry(
+		total=retries,
+		connect=min(retries, MAX_CONNECT_RETRIES),
+		read=False,
+		status=retries,
+		backoff_factor=backoff,
+		status_forcelist=(502, 503, 504),
+		allowed_methods=frozenset(["GET", "HEAD", "OPTIONS"]),
+		raise_on_status=False
+	)
+	adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+	session.mount("http://", adapter)
+	session.mount("https://", adapter)
+	return session
+
+def get_session(api_url, api_key, pool_size=None, retries=None, backoff=None):
+	key = (api_url.rstrip('/'), api_key)
+	with _lock:
+		session = _sessions.get(key)
+		if session is None:
+			session = _make_session(
+				api_key,
+				pool_size or DEFAULT_POOL_SIZE,
+				DEFAULT_RETRIES if retries is None else retries,
+				DEFAULT_BACKOFF if backoff is None else backoff
+			)
+			_sessions[key] = session
+		return session
+
+def session_for(config, api_url=None, api_key=None):
+	# Pool settings are optional keys in sync_config.json
+	return get_session(
+		api_url if api_url is not None else config["api_url"],
+		api_key if api_key is not None else config["api_key"],
+		pool_size=config.get("pool_size"),
+		retries=config.get("retries"),
+		backoff=config.get("retry_backoff")
+	)
+
+def close_all():
+	with _lock:
+		for session in _sessions.values():
+			session.close()
+		_sessions.clear()
@@ -0,0 +1,135 @@
+"""Several central Syncthing servers ("hubs") in one sync_config.json.
+
+Hubs are listed under "servers", each with its own api_url, api_key and this_device_id:
+
+	"servers": {
+		"eu": {"api_url": "http://eu-hub:8384/rest", "api_key": "...", "this_device_id": ""},
+		"us": {"api_url": "http://us-hub:8384/rest", "api_key": "...", "this_device_id": ""}
+	},
+	"active_server": "eu"
+
+The top-level api_url/api_key/this_device_id always describe the active hub, so the
+shared api client in operations.py and everything built on it follows switch_hub().
+A config without "servers" is a single hub called "default". Each hub gets its own
+client, and with it its own pooled session and config cache (both keyed by api_url).
+"""
+from components.config import CONFIG, schedule_save, set_unsaved
+from components.syncthing_api import SyncthingAPI
+from components.fanout import fan_out
+
+DEFAULT_HUB = "default"
+HUB_KEYS = ("api_url", "api_key", "this_device_id")
+
+# hub name -> SyncthingAPI bound to that hub's endpoint
+_clients = {}
+
+class HubError(Exception):
+	pass
+
+def hubs():
+	# hub name -> copy of its settings, the active hub reflects any edits made in Settings.
+	# Called from fan_out threads, so CONFIG is only read here
+	servers = CONFIG.get("servers")
+	if not servers:
+		return {DEFAULT_HUB: {key: CONFIG.get(key, "") for key in HUB_KEYS}}
+	merged = {name: dict(settings) for name, settings in servers.items()}
+	merged[active_hub()] = dict(servers.get(active_hub(), {}), **{key: CONFIG.get(key, "") for key in HUB_KEYS})
+	return merged
+
+def sync_active_hub():
+	"""Copy the top-level settings into the active hub's entry under "servers"."""
+	servers = CONFIG.get("servers")
+	if servers:
+		servers[active_hub()] = hubs()[active_hub()]
+
+def active_hub():
+	servers = CONFIG.get("servers")
+	if not servers:
+		return DEFAULT_HUB
+	name = CONFIG.get("active_server")
+	return name if name in servers else next(iter(servers))
+
+def hub_client(name):
+	settings = hubs().get(name)
+	if settings is None:
+		raise HubError(f"Unknown server '{name}'. Configured servers: {', '.join(hubs())}")
+	client = _clients.get(name)
+	if client is None or (client.api_url, client.api_key) != (settings["api_url"], settings["api_key"]):
+		client = _clients[name] = SyncthingAPI(CONFIG, api_url=settings["api_url"], api_key=settings["api_key"])
+	return client
+
+def switch_hub(name, persist=True):
+	"""Make name the active hub, the settings of the previous one are kept under "servers".
+
+	Without persist the switch only lasts for this process (cli.py --server), other saves
+	keep writing the hub that was active before.
+	"""
+	servers = hubs()
+	if name not in servers:
+		raise HubError(f"Unknown server '{name}'. Configured servers: {', '.join(servers)}")
+	if name == active_hub():
+		return
+	sync_active_hub()
+	values = {key: servers[name].get(key, "") for key in HUB_KEYS}
+	values["active_server"] = name
+	for key, value in values.items():
+		if persist:
+			CONFIG[key] = value
+		else:
+			set_unsaved(key, value)
+	if persist:
+		schedule_save()
+
+def fetch_hub_overviews(names=None, use_cache=True):
+	"""Fetch (config, status, connections) from every hub in parallel.
+
+	Returns one DeviceResult per hub with the overview as its value, a hub that can't
+	be reached only fails its own result. Each hub fetches its three calls in parallel too.
+	"""
+	servers = hubs()
+	selected = {name: servers[name] for name in (names or servers)}
+
+	def fetch(name, settings):
+		return hub_client(name).get_overview(use_cache)
+
+	return fan_out(selected, fetch, max_workers=len(selected) or 1)
+
+def remember_device_ids(results):
+	"""Store each hub's own device ID from fetch_hub_overviews() results.
+
+	Call it from one thread (the GUI's or the script's), not from the fetch threads.
+	"""
+	changed = False
+	servers = CONFIG.get("servers") or {}
+	for result in results:
+		if not result.ok:
+			continue
+		device_id = result.value[1].get('myID', '')
+		if result.user == active_hub():
+			if device_id and not CONFIG.get("this_device_id"):
+				CONFIG["this_device_id"] = device_id
+				sync_active_hub()
+				changed = True
+		elif result.user in servers and device_id and not servers[result.user].get("this_device_id"):
+			servers[result.user]["this_device_id"] = device_id
+			changed = True
+	if changed:
+		schedule_save()
+
+def hub_summary(result):
+	# One line of numbers for the hub table, from a fetch_hub_overviews() result
+	if not result.ok:
+		return {"hub": result.user, "ok": False, "error": result.error}
+	config, status, connections = result.value
+	this_id = status.get('myID', '')
+	devices = [d for d in config.get('devices', []) if d['deviceID'] != this_id]
+	connected = sum(1 for d in devices if connections.get('connections', {}).get(d['deviceID'], {}).get('connected', False))
+	return {
+		"hub": result.user,
+		"ok": True,
+		"device_id": this_id,
+		"uptime": status.get('uptime', 0),
+		"devices": len(devices),
+		"connected": connected,
+		"folders": len(config.get('folders', []))
+	}
@@ -0,0 +1,144 @@
+"""Incremental JSON parsing for large Syncthing responses.
+
+The body is read in chunks and decoded one value at a time, so the full response text
+is never held in memory next to the parsed document. extract() keeps only the
+top-level keys it is asked for (other values are skipped, arrays one item at a time) and
+iter_array() yields the items of a top-level array one by one. Arrays are decoded item
+by item in both, so the buffer only ever holds about one folder or device.
+
+This is slower per byte than json.loads, so whole documents that are kept anyway (the
+cached config) still go through json.loads. Use these when only part of a response is
+needed.
+"""
+import codecs
+import json
+import re
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_NUMBER_CHARS = "0123456789+-.eE"
+
+def _key_sharing_decoder():
+	# json.loads shares one string per distinct key across the document, decoding item by
+	# item doesn't, so thousands of folders would each hold their own "deviceID" strings
+	keys = {}
+	return json.JSONDecoder(object_pairs_hook=lambda pairs: {keys.setdefault(k, k): v for k, v in pairs})
+
+class _Reader():
+	def __init__(self, chunks, share_keys=False):
+		self._chunks = iter(chunks)
+		self._decoder = _key_sharing_decoder() if share_keys else _decoder
+		self._utf8 = codecs.getincrementaldecoder("utf-8")()
+		self.text = ""
+		self.pos = 0
+		self.eof = False
+
+	def fill(self, min_length=0):
+		# Drops what was consumed and appends chunks until the buffer holds min_length characters
+		self.text = self.text[self.pos:]
+		self.pos = 0
+		while not self.eof:
+			chunk = next(self._chunks, None)
+			if chunk is None:
+				self.eof = True
+				self.text += self._utf8.decode(b"", final=True)
+				break
+			self.text += self._utf8.decode(chunk) if isinstance(chunk, bytes) else chunk
+			if len(self.text) > min_length:
+				break
+		return len(self.text) > min_length or bool(self.text)
+
+	def peek(self):
+		while True:
+			self.pos = _WHITESPACE.match(self.text, self.pos).end()
+			if self.pos < len(self.text):
+				return self.text[self.pos]
+			if self.eof or not self.fill():
+				return ""
+
+	def take(self, expected):
+		char = self.peek()
+		if char not in expected:
+			raise ValueError(f"expected {' or '.join(expected)} but found {char!r}")
+		self.pos += 1
+		return char
+
+	def decode(self, decoder=None):
+		"""Decode one complete value starting at the current position."""
+		decoder = decoder or self._decoder
+		self.peek()
+		while True:
+			try:
+				value, end = decoder.raw_decode(self.text, self.pos)
+				# A number cut off by the end of the chunk ("12" of "12.5") looks complete too
+				is_number = isinstance(value, (int, float)) and not isinstance(value, bool)
+				if not is_number or self.eof or (end < len(self.text) and self.text[end] not in _NUMBER_CHARS):
+					self.pos = end
+					return value
+			except json.JSONDecodeError:
+				if self.eof:
+					raise
+			# At least double what is buffered, so a large value isn't re-parsed once per chunk
+			self.fill(2 * (len(self.text) - self.pos))
+
+	def decode_value(self):
+		# Arrays item by item, everything else in one go
+		if self.peek() != "[":
+			return self.decode()
+		self.take("[")
+		items = []
+		if self.peek() == "]":
+			self.pos += 1
+			return items
+		while True:
+			items.append(self.decode())
+			if self.take(",]") == "]":
+				return items
+
+	def skip(self):
+		"""Move past one value, arrays item by item so only one item exists at a time."""
+		# Skipped values are dropped straight away, so their keys aren't worth sharing
+		if self.peek() != "[":
+			self.decode(_decoder)
+			return
+		self.take("[")
+		if self.peek() == "]":
+			self.pos += 1
+			return
+		while True:
+			self.decode(_decoder)
+			if self.take(",]") == "]":
+				return
+
+def extract(chunks, keys=None):
+	"""Parse a JSON object from chunks (bytes or str) and return {key: value}.
+
+	Only top-level keys in keys are kept, None keeps all of them. Keys that are missing
+	from the document are missing from the result.
+	"""
+	reader = _Reader(chunks, share_keys=True)
+	wanted = None if keys is None else set(keys)
+	result = {}
+	reader.take("{")
+	if reader.peek() == "}":
+		return result
+	while True:
+		key = reader.decode()
+		reader.take(":")
+		if wanted is None or key in wanted:
+			result[key] = reader.decode_value()
+		else:
+			reader.skip()
+		if reader.take(",}") == "}":
+			return result
+
+def iter_array(chunks):
+	"""Yield the items of a top-level JSON array from chunks one at a time."""
+	reader = _Reader(chunks)
+	reader.take("[")
+	if reader.peek() == "]":
+		return
+	while True:
+		yield reader.decode()
+		if reader.take(",]") == "]":
+			return
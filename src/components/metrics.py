@@ -0,0 +1,176 @@
+"""In-process timing and traffic counters for the Syncthing calls and the refresh hot path.
+
+SyncthingAPI records every request here, per method and endpoint (with folder and device
+IDs replaced by {id}). The GUI times named sections like the refresh classification and
+widget rebuild with timed(). snapshot() returns everything as plain data, to_json() and
+to_prometheus() turn it into a text dump.
+"""
+from contextlib import contextmanager
+import json
+import threading
+import time
+
+# Upper bounds in seconds, the last bucket catches everything slower
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+def endpoint_template(path):
+	# /config/folders/abcd-1234 -> /config/folders/{id}, so every folder shares one series
+	parts = path.split("?")[0].rstrip("/").split("/")
+	if len(parts) > 3 and parts[1] == "config" and parts[2] in ("folders", "devices"):
+		parts[3] = "{id}"
+	return "/".join(parts)
+
+class Histogram():
+	def __init__(self, buckets=LATENCY_BUCKETS):
+		self.buckets = buckets
+		self.counts = [0] * len(buckets)
+		self.count = 0
+		self.total = 0.0
+		self.max = 0.0
+
+	def observe(self, value):
+		self.count += 1
+		self.total += value
+		self.max = max(self.max, value)
+		for i, bound in enumerate(self.buckets):
+			if value <= bound:
+				self.counts[i] += 1
+				break
+
+	def quantile(self, q):
+		# Upper bound of the bucket holding the q-th observation, the max for the open bucket
+		if not self.count:
+			return 0.0
+		rank = q * self.count
+		seen = 0
+		for bound, count in zip(self.buckets, self.counts):
+			seen += count
+			if seen >= rank:
+				return min(bound, self.max)
+		return self.max
+
+	def as_dict(self):
+		return {
+			"count": self.count,
+			"sum": self.total,
+			"max": self.max,
+			"avg": self.total / self.count if self.count else 0.0,
+			"p50": self.quantile(0.5),
+			"p95": self.quantile(0.95),
+			"buckets": {("+Inf" if bound == float("inf") else str(bound)): count for bound, count in zip(self.buckets, self.counts)}
+		}
+
+class EndpointStats():
+	def __init__(self):
+		self.latency = Histogram()
+		self.bytes_sent = 0
+		self.bytes_received = 0
+		self.errors = 0
+		self.timeouts = 0
+
+class Metrics():
+	def __init__(self):
+		self._lock = threading.Lock()
+		self.reset()
+
+	def reset(self):
+		with self._lock:
+			# (method, endpoint template) -> EndpointStats
+			self.endpoints = {}
+			# section name -> Histogram
+			self.sections = {}
+			self.started_at = time.time()
+
+	def record_request(self, method, path, elapsed, bytes_sent=0, bytes_received=0, error=False, timeout=False):
+		key = (method, endpoint_template(path))
+		with self._lock:
+			stats = self.endpoints.get(key)
+			if stats is None:
+				stats = self.endpoints[key] = EndpointStats()
+			stats.latency.observe(elapsed)
+			stats.bytes_sent += bytes_sent
+			stats.bytes_received += bytes_received
+			stats.errors += bool(error)
+			stats.timeouts += bool(timeout)
+
+	def record_bytes(self, method, path, bytes_received):
+		# For streamed responses, whose body is read after record_request()
+		key = (method, endpoint_template(path))
+		with self._lock:
+			stats = self.endpoints.get(key)
+			if stats is None:
+				stats = self.endpoints[key] = EndpointStats()
+			stats.bytes_received += bytes_received
+
+	def record_section(self, name, elapsed):
+		with self._lock:
+			histogram = self.sections.get(name)
+			if histogram is None:
+				histogram = self.sections[name] = Histogram()
+			histogram.observe(elapsed)
+
+	@contextmanager
+	def timed(self, name):
+		started = time.perf_counter()
+		try:
+			yield
+		finally:
+			self.record_section(name, time.perf_counter() - started)
+
+	def snapshot(self):
+		with self._lock:
+			endpoints = []
+			for (method, endpoint), stats in sorted(self.endpoints.items(), key=lambda item: (item[0][1], item[0][0])):
+				endpoints.append(dict(
+					stats.latency.as_dict(),
+					method=method,
+					endpoint=endpoint,
+					bytes_sent=stats.bytes_sent,
+					bytes_received=stats.bytes_received,
+					errors=stats.errors,
+					timeouts=stats.timeouts
+				))
+			sections = [dict(histogram.as_dict(), name=name) for name, histogram in sorted(self.sections.items())]
+		return {"since": self.started_at, "endpoints": endpoints, "sections": sections}
+
+	def to_json(self):
+		return json.dumps(self.snapshot(), indent=2)
+
+	def to_prometheus(self):
+		"""Return the Prometheus text exposition format, e.g. for a node exporter textfile."""
+		snapshot = self.snapshot()
+		lines = []
+
+		def histogram(name, labels, data):
+			cumulative = 0
+			for bound, count in data["buckets"].items():
+				cumulative += count
+				lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+			lines.append(f"{name}_sum{{{labels}}} {data['sum']}")
+			lines.append(f"{name}_count{{{labels}}} {data['count']}")
+
+		lines.append("# HELP p2pshare_request_duration_seconds Syncthing API request latency.")
+		lines.append("# TYPE p2pshare_request_duration_seconds histogram")
+		for e in snapshot["endpoints"]:
+			histogram("p2pshare_request_duration_seconds", f'method="{e["method"]}",endpoint="{e["endpoint"]}"', e)
+
+		counters = (
+			("p2pshare_request_bytes_sent_total", "Request body bytes sent.", "bytes_sent"),
+			("p2pshare_request_bytes_received_total", "Response body bytes received, compressed size when gzipped.", "bytes_received"),
+			("p2pshare_request_errors_total", "Requests that failed or returned an error status.", "errors"),
+			("p2pshare_request_timeouts_total", "Requests that timed out.", "timeouts")
+		)
+		for name, help_text, field in counters:
+			lines.append(f"# HELP {name} {help_text}")
+			lines.append(f"# TYPE {name} counter")
+			for e in snapshot["endpoints"]:
+				lines.append(f'{name}{{method="{e["method"]}",endpoint="{e["endpoint"]}"}} {e[field]}')
+
+		lines.append("# HELP p2pshare_section_duration_seconds Time spent in instrumented code sections.")
+		lines.append("# TYPE p2pshare_section_duration_seconds histogram")
+		for s in snapshot["sections"]:
+			histogram("p2pshare_section_duration_seconds", f'section="{s["name"]}"', s)
+		return "\n".join(lines) + "\n"
+
+# Shared by the whole process
+metrics = Metrics()
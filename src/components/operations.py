@@ -0,0 +1,319 @@
+"""Folder and device operations shared by the GUI (main.py) and the command line (cli.py).
+
+Nothing here touches Tk. Failures are raised as OperationError or SyncthingAPIError,
+so every function can run on a worker thread or in a script.
+"""
+from components.config import CONFIG, schedule_save
+from components.syncthing_api import SyncthingAPI, SyncthingAPIError
+from components.worker import raise_if_cancelled
+from components.fanout import fan_out, summarize
+from components.health import health
+from components.pending import queue as pending_queue
+from components.paths import PathTrie, SAME, INSIDE
+from components.device_id import normalize_device_id, InvalidDeviceID
+import uuid
+
+api = SyncthingAPI(CONFIG)
+health.configure(CONFIG)
+
+class OperationError(Exception):
+	def __init__(self, title, message, level="error"):
+		super().__init__(message)
+		self.title = title
+		self.message = message
+		self.level = level
+
+class DeviceUnreachable(OperationError):
+	# The user's device didn't answer at all, as opposed to rejecting the change
+	pass
+
+def is_unreachable(error):
+	# Only connection errors, timeouts and open circuits, a bad URL or an invalid response
+	# would never drain from the pending queue
+	return isinstance(error, SyncthingAPIError) and error.unreachable
+
+def ensure_this_device_id():
+	# The GUI fills this in on refresh, scripts ask the server directly
+	if not CONFIG.get("this_device_id"):
+		CONFIG["this_device_id"] = api.get_status().get('myID', '')
+		schedule_save()
+	if not CONFIG["this_device_id"]:
+		raise OperationError("Error", "Could not determine the Device ID of this Syncthing instance.")
+	return CONFIG["this_device_id"]
+
+def get_user(username):
+	if username not in CONFIG["users"]:
+		raise OperationError("Error", f"Unknown user '{username}'. Configured users: {', '.join(CONFIG['users'])}")
+	return CONFIG["users"][username]
+
+def get_folder_owner_id(folder, server_id):
+	devices = folder.get('devices', [])
+	for device in devices:
+		if device['deviceID'] != server_id:
+			# First non-server device is the owner
+			return device['deviceID']
+	return None
+
+def sync_folders(selected, active_user):
+	"""Share all selected folders with active_user in one pass.
+
+	The central folder list is read once and only the changed folders are sent back in a
+	single update, and the user's device gets one update too, instead of a round trip per folder.
+	"""
+	this_id = CONFIG["this_device_id"]
+	user_info = CONFIG["users"][active_user]
+	active_user_id = user_info["device_id"]
+
+	if not active_user_id:
+		raise OperationError("Error", f"Device ID for {active_user} is not set.")
+
+	folders_by_id = {f['id']: f for f in api.get_folders()}
+
+	failed_syncs = []
+	to_push = []
+	changed_folders = []
+
+	for folder_id, folder_label in selected:
+		raise_if_cancelled()
+		folder_to_sync = folders_by_id.get(folder_id)
+		if not folder_to_sync:
+			failed_syncs.append(f"{folder_label}: Folder not found.")
+			continue
+
+		# For private folders, strict check: only owner can access
+		if folder_to_sync.get('private', False) and get_folder_owner_id(folder_to_sync, this_id) != active_user_id:
+			failed_syncs.append(f"{folder_label}: The folder is private and only accessible to its owner.")
+			continue
+
+		# Update central config if user isn't in it
+		device_ids = {d['deviceID'] for d in folder_to_sync.get('devices', [])}
+		if active_user_id not in device_ids:
+			folder_to_sync['devices'].append({"deviceID": active_user_id})
+			changed_folders.append(folder_to_sync)
+
+		to_push.append((folder_label, build_folder_for_user(folder_to_sync, this_id, active_user_id)))
+
+	if changed_folders:
+		api.put_folders(changed_folders)
+
+	successful_syncs = []
+	if to_push:
+		# Send everything to the users own Syncthing in one update
+		try:
+			push_folders_to_user([folder for _, folder in to_push], user_info["api_url"], user_info["api_key"])
+			successful_syncs = [label for label, _ in to_push]
+		except DeviceUnreachable:
+			# Kept on disk and sent once the device is back, the server side is already done
+			for label, folder in to_push:
+				pending_queue.add_folder(active_user, folder)
+			successful_syncs = [f"{label} (queued until {active_user}'s device is online)" for label, _ in to_push]
+		except OperationError as e:
+			failed_syncs.extend(f"{label}: {e}" for label, _ in to_push)
+	return successful_syncs, failed_syncs
+
+def user_api(user_info, timeout=None):
+	# Client for a user's own Syncthing, shares the pooled session for that endpoint
+	return SyncthingAPI(CONFIG, api_url=user_info["api_url"], api_key=user_info["api_key"], timeout=timeout)
+
+def push_folders_to_user(folders, user_api_url, user_api_key, timeout=None):
+	remote = SyncthingAPI(CONFIG, api_url=user_api_url, api_key=user_api_key, timeout=timeout)
+
+	# Get the server device ID
+	central_device_id = CONFIG.get("this_device_id")
+	if not central_device_id:
+		raise OperationError("Error", "Central device ID (this_device_id) not available.")
+
+	try:
+		# Only the users folder IDs and the central device entry are fetched, not the whole config
+		existing_ids = set(remote.get_folder_ids())
+		central_device = remote.get_device(central_device_id)
+	except SyncthingAPIError as e:
+		error_type = DeviceUnreachable if is_unreachable(e) else OperationError
+		raise error_type("API Error", f"Could not fetch config from remote device: {e}")
+
+	new_folders = []
+	for folder in folders:
+		if folder['id'] in existing_ids:
+			continue
+		user_folder = folder.copy()
+		user_folder["devices"] = [
+			{"deviceID": central_device_id},
+			{"deviceID": folder["devices"][1]["deviceID"]} 
+		]
+		new_folders.append(user_folder)
+		existing_ids.add(folder['id'])
+
+	try:
+		# Make sure the central device is in the users devices list
+		if central_device is None:
+			remote.add_device({
+				"deviceID": central_device_id,
+				"name": "CentralServer",
+				"addresses": ["dynamic"],
+				"compression": "metadata",
+				"introducer": False
+			})
+		if new_folders:
+			remote.put_folders(new_folders)
+		return True
+	except SyncthingAPIError as e:
+		error_type = DeviceUnreachable if is_unreachable(e) else OperationError
+		raise error_type("API Error", f"Failed to update remote config: {e}")
+
+def build_folder_for_user(folder, this_id, active_user_id):
+	# Build full folder block to send to user
+	return {
+		"id": folder["id"],
+		"label": folder.get("label", folder["id"]),
+		"path": folder["path"],   
+		"type": folder.get("type", "sendreceive"),
+		"rescanIntervalS": folder.get("rescanIntervalS", 60),
+		"fsWatcherEnabled": folder.get("fsWatcherEnabled", True),
+		"private": folder.get("private", False),  
+		"devices": [
+			{"deviceID": this_id},
+			{"deviceID": active_user_id}
+		]
+	}
+
+def push_folder_to_users(folder, usernames, timeout=None):
+	"""Push folder to the devices of every user in usernames in parallel.
+
+	Each device gets its own copy shared between the server and that device. At most
+	"fanout_workers" devices are contacted at a time and each request is bounded by
+	timeout ("device_timeout" in the config by default). Returns one DeviceResult per user.
+	"""
+	this_id = CONFIG["this_device_id"]
+	timeout = timeout or CONFIG.get("device_timeout")
+
+	def push(username, user_info):
+		if not user_info.get("device_id"):
+			raise OperationError("Error", f"Device ID for {username} is not set.")
+		if not (user_info.get("api_url") and user_info.get("api_key")):
+			raise OperationError("Error", f"{username}'s API details are not configured.")
+		user_folder = build_folder_for_user(folder, this_id, user_info["device_id"])
+		try:
+			push_folders_to_user([user_folder], user_info["api_url"], user_info["api_key"], timeout)
+		except DeviceUnreachable:
+			pending_queue.add_folder(username, user_folder)
+			return "queued"
+
+	users = {username: CONFIG["users"][username] for username in usernames}
+	return fan_out(users, push, max_workers=CONFIG.get("fanout_workers", 8))
+
+def add_device_to_config(device_id, name):
+	# Typos are caught by the check characters before asking the server
+	try:
+		device_id = normalize_device_id(device_id)
+	except InvalidDeviceID as e:
+		raise OperationError("Invalid Device ID", f"'{device_id}' is not a valid Device ID: {e}.")
+
+	# Check if device already exists
+	if api.get_device(device_id) is not None:
+		raise OperationError("Already Exists", f"Device ID '{device_id}' already exists.", level="warning")
+
+	new_device = {
+		"deviceID": device_id,
+		"name": name,
+		"addresses": ["dynamic"],  
+		"compression": "metadata",
+		"introducer": False 
+	}
+
+	api.add_device(new_device)
+	return name
+
+def describe_overlaps(overlaps, folders_by_id):
+	lines = []
+	for other_id, relation in overlaps:
+		other = folders_by_id.get(other_id, {})
+		where = "is inside" if relation == INSIDE else "contains"
+		lines.append(f"This path {where} '{other.get('label', other_id)}' ({other.get('path', '')})")
+	return lines
+
+def add_folder_for_user(folder_id, label, path, is_private, active_user, extra_users=(), allow_overlap=False):
+	folder_type = "sendreceive"
+	active_user_id = CONFIG["users"][active_user]["device_id"]
+	this_id = CONFIG["this_device_id"]
+	extra_user_ids = [CONFIG["users"][u]["device_id"] for u in extra_users]
+
+	# Only read here, so the cached list is used without copying it
+	folders_by_id = {f['id']: f for f in api.get_folders(shared=True)}
+	if folder_id in folders_by_id:
+		raise OperationError("Already Exists", f"Folder ID '{folder_id}' already exists.", level="warning")
+	overlaps = PathTrie.from_folders(folders_by_id.values()).overlaps(path)
+	same = [other_id for other_id, relation in overlaps if relation == SAME]
+	if same:
+		raise OperationError("Already Exists", f"Folder Path '{path}' is already used by folder '{folders_by_id[same[0]].get('label', same[0])}'.", level="warning")
+	# Nested folders get scanned twice by Syncthing, only added when the caller confirmed it
+	if overlaps and not allow_overlap:
+		raise OperationError("Overlapping Folder", "\n".join(describe_overlaps(overlaps, folders_by_id)), level="warning")
+
+	new_folder = {
+		"id": folder_id,
+		"label": label,
+		"path": path,
+		"type": folder_type,
+		"rescanIntervalS": 60,
+		"fsWatcherEnabled": True,
+		"devices": [
+			{"deviceID": this_id},
+			{"deviceID": active_user_id}
+		] + [{"deviceID": device_id} for device_id in extra_user_ids],
+		"private": is_private  
+	}
+
+	api.add_folder(new_folder)
+
+	# Push the folder to every users Syncthing at once
+	targets = [active_user] + list(extra_users)
+	results = push_folder_to_users(new_folder, targets)
+	succeeded, failed = summarize(results)
+	queued = [r.user for r in results if r.ok and r.value == "queued"]
+	succeeded = [u for u in succeeded if u not in queued]
+	if queued:
+		failed = failed + [f"{username}: offline, queued until the device is back" for username in queued]
+	if failed and not succeeded and len(queued) == len(failed):
+		return ("info", "Queued", f"Folder '{label}' added to central config. It will be sent to {', '.join(queued)} once their device is online.")
+	if failed:
+		return ("warning", "Partial Success", "Folder added to central config, but failed to sync with:\n" + "\n".join(failed)
+			+ "\n\nRun \"Reconcile All\" (or cli.py reconcile) to retry.")
+	privacy_status = "private " if is_private else ""
+	return ("info", "Success", f"{privacy_status.capitalize()}Folder '{label}' added and synced to {', '.join(succeeded)}'s device{'s' if len(succeeded) > 1 else ''}.")
+
+def drain_pending(username):
+	"""Send everything queued for username's device, returns the number of changes sent.
+
+	Adds go out in one update, removals one by one. Whatever fails stays queued.
+	"""
+	entries = pending_queue.pending(username).get(username, [])
+	user_info = CONFIG["users"].get(username)
+	if not entries or not user_info or not (user_info.get("api_url") and user_info.get("api_key")):
+		return 0
+
+	adds = [(folder_id, entry) for folder_id, entry in entries if entry["action"] == "add"]
+	removes = [(folder_id, entry) for folder_id, entry in entries if entry["action"] == "remove"]
+	done = []
+	try:
+		if adds:
+			push_folders_to_user([entry["folder"] for _, entry in adds], user_info["api_url"], user_info["api_key"], CONFIG.get("device_timeout"))
+			done.extend(adds)
+		client = user_api(user_info, timeout=CONFIG.get("device_timeout"))
+		for folder_id, entry in removes:
+			client.delete_folder(folder_id)
+			done.append((folder_id, entry))
+	except (OperationError, SyncthingAPIError):
+		pass
+	finally:
+		if done:
+			pending_queue.complete(username, done)
+	return len(done)
+
+def drain_all_pending():
+	# Tries every user with queued changes in parallel, returns {username: changes sent}
+	users = {u: CONFIG["users"][u] for u in pending_queue.pending() if u in CONFIG["users"]}
+	results = fan_out(users, lambda username, info: drain_pending(username), max_workers=CONFIG.get("fanout_workers", 8))
+	return {r.user: r.value for r in results if r.ok and r.value}
+
+def generate_folder_id():
+	return uuid.uuid4().hex[:10]
@@ -0,0 +1,164 @@
+"""Folder path overlap checks and a background folder size scanner.
+
+PathTrie holds every configured folder path split into its components, so finding a
+folder at, above or below a new path takes one walk down the trie instead of comparing
+against every folder. Nested folders make Syncthing scan the same files twice.
+
+FolderSizeScanner counts bytes and files under a path with os.scandir on a background
+thread and caches the result, so large folders can be flagged before they are shared.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+import time
+
+SAME = "same"
+INSIDE = "inside"      # the new path is inside an existing folder
+CONTAINS = "contains"  # an existing folder is inside the new path
+
+DEFAULT_LARGE_FOLDER_BYTES = 50 * 1024 ** 3
+DEFAULT_LARGE_FOLDER_FILES = 100000
+DEFAULT_SCAN_TTL = 300
+
+def path_parts(path):
+	# Normalised components, case-insensitive where the platform is
+	path = os.path.normcase(os.path.normpath(os.path.expanduser(path))).replace("\\", "/")
+	return (["/"] if path.startswith("/") else []) + [part for part in path.split("/") if part]
+
+class PathTrie():
+	def __init__(self):
+		self.root = {}
+
+	@classmethod
+	def from_folders(cls, folders):
+		trie = cls()
+		for folder in folders:
+			if folder.get('path'):
+				trie.add(folder['path'], folder['id'])
+		return trie
+
+	def add(self, path, folder_id):
+		node = self.root
+		for part in path_parts(path):
+			node = node.setdefault(part, {})
+		node.setdefault(None, set()).add(folder_id)
+
+	def overlaps(self, path):
+		"""Return [(folder_id, relation)] for every folder at, above or below path.
+
+		relation is SAME, INSIDE (path is inside that folder) or CONTAINS (that folder is
+		inside path). Walking down costs one step per path component, only folders below
+		path need a look at the subtree.
+		"""
+		found = []
+		node = self.root
+		for part in path_parts(path):
+			found.extend((folder_id, INSIDE) for folder_id in node.get(None, ()))
+			node = node.get(part)
+			if node is None:
+				return found
+		found.extend((folder_id, SAME) for folder_id in node.get(None, ()))
+
+		stack = [child for key, child in node.items() if key is not None]
+		while stack:
+			child = stack.pop()
+			for key, value in child.items():
+				if key is None:
+					found.extend((folder_id, CONTAINS) for folder_id in value)
+				else:
+					stack.append(value)
+		return found
+
+class FolderSize():
+	def __init__(self, path, total_bytes, files, errors, scanned_at):
+		self.path = path
+		self.bytes = total_bytes
+		self.files = files
+		# Entries that couldn't be read, so the numbers are a lower bound
+		self.errors = errors
+		self.scanned_at = scanned_at
+
+	def describe(self):
+		size = self.bytes
+		for unit in ("B", "KB", "MB", "GB", "TB"):
+			if size < 1024 or unit == "TB":
+				break
+			size /= 1024
+		return f"{size:.1f} {unit} in {self.files:,} files" + (f" ({self.errors} unreadable)" if self.errors else "")
+
+def scan_folder(path):
+	# Walks the tree with os.scandir without following symlinks, unreadable entries are counted and skipped
+	total_bytes = 0
+	files = 0
+	errors = 0
+	stack = [path]
+	while stack:
+		current = stack.pop()
+		try:
+			with os.scandir(current) as entries:
+				for entry in entries:
+					try:
+						if entry.is_dir(follow_symlinks=False):
+							stack.append(entry.path)
+						elif entry.is_file(follow_symlinks=False):
+							total_bytes += entry.stat(follow_symlinks=False).st_size
+							files += 1
+					except OSError:
+						errors += 1
+		except OSError:
+			errors += 1
+	return FolderSize(path, total_bytes, files, errors, time.time())
+
+class FolderSizeScanner():
+	def __init__(self, ttl=DEFAULT_SCAN_TTL, large_bytes=DEFAULT_LARGE_FOLDER_BYTES, large_files=DEFAULT_LARGE_FOLDER_FILES, max_workers=2):
+		self.ttl = ttl
+		self.large_bytes = large_bytes
+		self.large_files = large_files
+		self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="folder-scan")
+		self._lock = threading.Lock()
+		self._cache = {}
+		# Scans in progress, so asking twice for the same path shares one walk
+		self._running = {}
+
+	@classmethod
+	def from_config(cls, config):
+		return cls(
+			config.get("folder_scan_ttl", DEFAULT_SCAN_TTL),
+			config.get("large_folder_bytes", DEFAULT_LARGE_FOLDER_BYTES),
+			config.get("large_folder_files", DEFAULT_LARGE_FOLDER_FILES)
+		)
+
+	def cached(self, path):
+		# The last result for path if it is younger than the TTL, otherwise None
+		key = os.path.normpath(path)
+		with self._lock:
+			result = self._cache.get(key)
+		if result is not None and time.time() - result.scanned_at < self.ttl:
+			return result
+		return None
+
+	def submit(self, path):
+		"""Start scanning path in the background, returns a Future with its FolderSize."""
+		key = os.path.normpath(path)
+		with self._lock:
+			future = self._running.get(key)
+			if future is None:
+				future = self._running[key] = self._executor.submit(self._scan, key)
+			return future
+
+	def scan(self, path):
+		# Blocking version for worker tasks and scripts, answered from the cache when fresh
+		return self.cached(path) or self.submit(path).result()
+
+	def _scan(self, key):
+		try:
+			result = scan_folder(key)
+			with self._lock:
+				self._cache[key] = result
+			return result
+		finally:
+			with self._lock:
+				self._running.pop(key, None)
+
+	def is_large(self, result):
+		return result.bytes >= self.large_bytes or result.files >= self.large_files
@@ -0,0 +1,94 @@
+"""Folder changes waiting for a user's device to come back online.
+
+Stored in pending_operations.json next to sync_config.json, so nothing is lost when
+the app is closed. There is at most one entry per user and folder, a newer change
+replaces an older one: add after remove keeps just the add, and remove after add
+cancels both (the device never got the folder) unless that add replaced a remove, then
+the remove is queued again. operations.drain_pending() sends them.
+"""
+import json
+import os
+import threading
+import time
+from components.config import CONFIG_DIR, write_json
+
+PENDING_FILE = os.path.join(CONFIG_DIR, "pending_operations.json")
+
+class PendingQueue():
+	def __init__(self, path=PENDING_FILE):
+		self.path = path
+		self._lock = threading.Lock()
+		# username -> {folder_id: {"action": "add" | "remove", "folder": {...} | None, "queued_at": ...}},
+		# adds that replaced a remove also have "replaced_remove": True
+		self._ops = self._load()
+
+	def _load(self):
+		try:
+			with open(self.path, 'r') as f:
+				return json.load(f).get("users", {})
+		except FileNotFoundError:
+			return {}
+		except (OSError, ValueError):
+			# A broken file shouldn't stop the app, the next change rewrites it
+			return {}
+
+	def _save(self):
+		write_json(self.path, {"users": self._ops})
+
+	def add_folder(self, username, folder):
+		with self._lock:
+			ops = self._ops.setdefault(username, {})
+			previous = ops.get(folder['id'], {})
+			entry = {"action": "add", "folder": folder, "queued_at": time.time()}
+			# The device may still have the folder the replaced remove was meant for
+			if previous.get("action") == "remove" or previous.get("replaced_remove"):
+				entry["replaced_remove"] = True
+			ops[folder['id']] = entry
+			self._save()
+
+	def remove_folder(self, username, folder_id):
+		with self._lock:
+			ops = self._ops.setdefault(username, {})
+			previous = ops.get(folder_id, {})
+			if previous.get("action") == "add" and not previous.get("replaced_remove"):
+				del ops[folder_id]
+			else:
+				ops[folder_id] = {"action": "remove", "folder": None, "queued_at": time.time()}
+			if not ops:
+				del self._ops[username]
+			self._save()
+
+	def pending(self, username=None):
+		# username -> list of (folder_id, entry), copies so callers can iterate while others queue
+		with self._lock:
+			users = [username] if username is not None else list(self._ops)
+			return {u: list(self._ops[u].items()) for u in users if self._ops.get(u)}
+
+	def count(self, username):
+		with self._lock:
+			return len(self._ops.get(username, {}))
+
+	def complete(self, username, done):
+		"""Drop entries that were sent, done is a list of (folder_id, entry) from pending().
+
+		An entry that was replaced by a newer change in the meantime stays queued.
+		"""
+		with self._lock:
+			ops = self._ops.get(username, {})
+			for folder_id, entry in done:
+				if ops.get(folder_id, {}).get("queued_at") == entry["queued_at"]:
+					del ops[folder_id]
+			if username in self._ops and not ops:
+				del self._ops[username]
+			self._save()
+
+	def clear(self, username=None):
+		with self._lock:
+			if username is None:
+				self._ops.clear()
+			else:
+				self._ops.pop(username, None)
+			self._save()
+
+# Shared by the GUI and cli.py
+queue = PendingQueue()
@@ -0,0 +1,258 @@
+"""Desired-state reconciler for the server and every configured user's device.
+
+The server config is the source of truth. A user's device should have every folder
+that the server shares with that user's device, shared back with the server, and no
+folder shared with the server that the server no longer shares with it. compute_plan()
+works out the smallest set of changes per node, apply_plan() sends them.
+"""
+import time
+from components.config import CONFIG
+from components.syncthing_api import SyncthingAPIError
+from components.fanout import fan_out
+from components.operations import api, build_folder_for_user, ensure_this_device_id, user_api
+from components import async_api
+
+# Label for the central server in descriptions, its changes are kept apart from the users'
+SERVER_LABEL = "server"
+RETRY_ATTEMPTS = 3
+RETRY_DELAY = 1.0
+
+# Event loop thread for "async_fanout", started on first use
+_async_loop = None
+
+class Change():
+	def __init__(self, action, kind, object_id, payload=None, reason=""):
+		# action is "add", "update" or "remove", kind is "folder" or "device"
+		self.action = action
+		self.kind = kind
+		self.object_id = object_id
+		self.payload = payload
+		self.reason = reason
+
+	def __repr__(self):
+		return f"<Change {self.action} {self.kind} {self.object_id}>"
+
+	def describe(self):
+		return f"{self.action} {self.kind} {self.object_id}" + (f" ({self.reason})" if self.reason else "")
+
+class Plan():
+	def __init__(self):
+		# Changes on the central server, separate so a user called "server" stays a user
+		self.server_changes = []
+		# username -> list of Change
+		self.changes = {}
+		# username -> why it was left out
+		self.skipped = {}
+
+	def add(self, username, change):
+		self.changes.setdefault(username, []).append(change)
+
+	def add_server(self, change):
+		self.server_changes.append(change)
+
+	@property
+	def empty(self):
+		return not self.server_changes and not any(self.changes.values())
+
+	def describe(self):
+		lines = []
+		if self.server_changes:
+			lines.append(f"{SERVER_LABEL}:")
+			lines.extend(f"  {change.describe()}" for change in self.server_changes)
+		for username, changes in self.changes.items():
+			if changes:
+				lines.append(f"{username}:")
+				lines.extend(f"  {change.describe()}" for change in changes)
+		for username, reason in self.skipped.items():
+			lines.append(f"{username}: skipped, {reason}")
+		return lines
+
+def central_device_entry(this_id):
+	return {
+		"deviceID": this_id,
+		"name": "CentralServer",
+		"addresses": ["dynamic"],
+		"compression": "metadata",
+		"introducer": False
+	}
+
+def compute_plan(server_config, this_id, users, user_states):
+	"""Work out the changes needed on every node.
+
+	user_states maps username -> {"folders": [...], "devices": [...]} as read from that
+	user's device. Users missing from user_states are only checked on the server side.
+	"""
+	plan = Plan()
+	server_devices = {d['deviceID'] for d in server_config.get('devices', [])}
+
+	for username, info in users.items():
+		user_id = info.get("device_id")
+		if not user_id:
+			plan.skipped[username] = "no device ID set"
+			continue
+
+		# The server can only share with devices it knows about
+		if user_id not in server_devices:
+			plan.add_server(Change("add", "device", user_id, {
+				"deviceID": user_id,
+				"name": username,
+				"addresses": ["dynamic"],
+				"compression": "metadata",
+				"introducer": False
+			}, f"{username}'s device"))
+			server_devices.add(user_id)
+
+		state = user_states.get(username)
+		if state is None:
+			plan.skipped.setdefault(username, "API details not configured")
+			continue
+
+		if not any(d['deviceID'] == this_id for d in state.get('devices', [])):
+			plan.add(username, Change("add", "device", this_id, central_device_entry(this_id), "central server"))
+
+		wanted = {}
+		for folder in server_config.get('folders', []):
+			device_ids = {d['deviceID'] for d in folder.get('devices', [])}
+			if this_id in device_ids and user_id in device_ids:
+				wanted[folder['id']] = folder
+
+		user_folders = {f['id']: f for f in state.get('folders', [])}
+		for folder_id, folder in wanted.items():
+			existing = user_folders.get(folder_id)
+			if existing is None:
+				plan.add(username, Change("add", "folder", folder_id, build_folder_for_user(folder, this_id, user_id), folder.get('label', folder_id)))
+			elif not any(d['deviceID'] == this_id for d in existing.get('devices', [])):
+				# Keep the user's own settings (path etc.), only share it back with the server
+				updated = dict(existing)
+				updated['devices'] = existing.get('devices', []) + [{"deviceID": this_id}]
+				plan.add(username, Change("update", "folder", folder_id, updated, "not shared with the server"))
+
+		for folder_id, folder in user_folders.items():
+			shared_with_server = any(d['deviceID'] == this_id for d in folder.get('devices', []))
+			if shared_with_server and folder_id not in wanted:
+				plan.add(username, Change("remove", "folder", folder_id, reason="no longer shared on the server"))
+
+	return plan
+
+def with_retries(fn, attempts=RETRY_ATTEMPTS, delay=RETRY_DELAY):
+	# Every request the reconciler sends is idempotent (PUT/DELETE), so repeating one is safe
+	for attempt in range(attempts):
+		try:
+			return fn()
+		except SyncthingAPIError as e:
+			client_error = e.status_code is not None and 400 <= e.status_code < 500 and e.status_code != 429
+			if client_error or attempt == attempts - 1:
+				raise
+			time.sleep(delay * (2 ** attempt))
+
+def apply_changes(client, changes):
+	# One PUT for all folder adds/updates, one for devices, and a DELETE per removed folder
+	devices = [c.payload for c in changes if c.kind == "device" and c.action in ("add", "update")]
+	folders = [c.payload for c in changes if c.kind == "folder" and c.action in ("add", "update")]
+	removed = [c.object_id for c in changes if c.kind == "folder" and c.action == "remove"]
+
+	if devices:
+		with_retries(lambda: client.put_devices(devices))
+	if folders:
+		with_retries(lambda: client.put_folders(folders))
+	for folder_id in removed:
+		with_retries(lambda: client.delete_folder(folder_id))
+	return len(changes)
+
+def user_client(info):
+	return user_api(info, timeout=CONFIG.get("device_timeout"))
+
+def read_state(usernames=None):
+	"""Read the server config and every selected user's folders and devices concurrently.
+
+	Returns (server_config, this_id, user_states, read_errors).
+	"""
+	this_id = ensure_this_device_id()
+	usernames = list(CONFIG["users"]) if usernames is None else usernames
+	reachable = {u: CONFIG["users"][u] for u in usernames
+		if CONFIG["users"][u].get("device_id") and CONFIG["users"][u].get("api_url") and CONFIG["users"][u].get("api_key")}
+
+	def read(username, info):
+		# One streamed config read for both sections, the rest of the user's config is skipped
+		sections = user_client(info).get_config_sections("folders", "devices")
+		return {"folders": sections.get("folders", []), "devices": sections.get("devices", [])}
+
+	server_config = api.get_config(use_cache=False)
+	user_states = {}
+	read_errors = {}
+	if CONFIG.get("async_fanout", False) and async_api.aiohttp is not None:
+		# One event loop instead of a thread per device, for setups with hundreds of users
+		global _async_loop
+		if _async_loop is None:
+			_async_loop = async_api.AsyncLoopThread(CONFIG)
+		results = _async_loop.run(async_api.read_user_configs(CONFIG, reachable, _async_loop.pool))
+	else:
+		results = fan_out(reachable, read, max_workers=CONFIG.get("fanout_workers", 8))
+	for result in results:
+		if result.ok:
+			user_states[result.user] = result.value
+		else:
+			read_errors[result.user] = result.error
+	return server_config, this_id, user_states, read_errors
+
+def plan_reconcile(usernames=None):
+	server_config, this_id, user_states, read_errors = read_state(usernames)
+	users = {u: CONFIG["users"][u] for u in (list(CONFIG["users"]) if usernames is None else usernames)}
+	plan = compute_plan(server_config, this_id, users, user_states)
+	for username, error in read_errors.items():
+		plan.skipped[username] = f"could not read config: {error}"
+	return plan
+
+class ApplyReport():
+	def __init__(self):
+		# Changes applied to the server, or why they failed
+		self.server_applied = 0
+		self.server_error = None
+		# username -> number of changes applied
+		self.applied = {}
+		# username -> error message
+		self.failed = {}
+
+	@property
+	def any_applied(self):
+		return bool(self.server_applied or self.applied)
+
+	@property
+	def any_failed(self):
+		return self.server_error is not None or bool(self.failed)
+
+	def describe_applied(self):
+		counts = ([(SERVER_LABEL, self.server_applied)] if self.server_applied else []) + list(self.applied.items())
+		return [f"{node}: {count} change{'s' if count != 1 else ''} applied" for node, count in counts]
+
+	def describe_failed(self):
+		errors = ([(SERVER_LABEL, self.server_error)] if self.server_error is not None else []) + list(self.failed.items())
+		return [f"{node}: failed, {error}" for node, error in errors]
+
+def apply_plan(plan):
+	"""Apply a plan, the server first and then every user's device in parallel.
+
+	Returns an ApplyReport. Running the reconciler again retries whatever failed.
+	"""
+	report = ApplyReport()
+	if plan.server_changes:
+		try:
+			report.server_applied = apply_changes(api, plan.server_changes)
+		except SyncthingAPIError as e:
+			report.server_error = str(e)
+
+	users = {u: CONFIG["users"][u] for u, changes in plan.changes.items() if changes}
+	results = fan_out(users, lambda username, info: apply_changes(user_client(info), plan.changes[username]),
+		max_workers=CONFIG.get("fanout_workers", 8))
+	for result in results:
+		if result.ok:
+			report.applied[result.user] = result.value
+		else:
+			report.failed[result.user] = result.error
+	return report
+
+def reconcile(usernames=None, dry_run=False):
+	plan = plan_reconcile(usernames)
+	if dry_run or plan.empty:
+		return plan, ApplyReport()
+	return plan, apply_plan(plan)
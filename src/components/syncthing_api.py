@@ -1,64 +1,396 @@
-from tkinter import messagebox
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+import copy
+import gzip
+import threading
+import time
 import requests
+import urllib3
 import json
+from components.http_pool import session_for
+from components import json_stream
+from components.metrics import metrics
+from components.health import health
+
+# One small pool per endpoint to run the overview GETs side by side. Per endpoint, so the
+# overviews of several hubs fetched at once don't queue behind each other
+_executors = {}
+_executors_lock = threading.Lock()
+
+DEFAULT_TIMEOUT = 10
+DEFAULT_WRITE_TIMEOUT = 15
+DEFAULT_CONFIG_CACHE_TTL = 10
+# Large responses are parsed while they download, this many bytes at a time
+STREAM_CHUNK_SIZE = 64 * 1024
+# With "gzip_requests", bodies at least this large are sent compressed
+GZIP_MIN_BYTES = 1024
+
+# Last /system/config per endpoint: {"config": ..., "fetched_at": ..., "event_id": ...}
+_config_cache = {}
+_cache_lock = threading.Lock()
+
+class SyncthingAPIError(Exception):
+	# unreachable is set when the endpoint didn't answer at all (timeout, refused
+	# connection, open circuit), as opposed to answering with an error
+	def __init__(self, message, status_code=None, unreachable=False):
+		super().__init__(message)
+		self.status_code = status_code
+		self.unreachable = unreachable
+
+def _executor_for(api_url, role="overview", max_workers=3):
+	# Threads are only started when a task needs one, idle endpoints cost nothing
+	key = (api_url, role)
+	with _executors_lock:
+		executor = _executors.get(key)
+		if executor is None:
+			executor = _executors[key] = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"syncthing-{role}")
+		return executor
+
+def _is_timeout(error):
+	# The pool's retries can hand a timeout back as ConnectionError(MaxRetryError(reason=ReadTimeoutError))
+	if isinstance(error, requests.exceptions.Timeout):
+		return True
+	reason = getattr(error.args[0], "reason", None) if error.args else None
+	return isinstance(reason, urllib3.exceptions.TimeoutError)
+
+def _wire_bytes(response):
+	# Body size as it came over the wire (compressed when gzipped). Reads the body, .json() would right after
+	response.content
+	return response.raw.tell()
+
+def encode_body(data, config):
+	"""Serialize a request body without whitespace, returns (body bytes, headers).
+
+	Syncthing doesn't document compressed request bodies, so gzip is only used with
+	"gzip_requests" enabled, e.g. for an endpoint behind a proxy that accepts them.
+	"""
+	body = json.dumps(data, separators=(",", ":")).encode()
+	headers = {"Content-Type": "application/json"}
+	if config.get("gzip_requests", False) and len(body) >= GZIP_MIN_BYTES:
+		body = gzip.compress(body, compresslevel=5)
+		headers["Content-Encoding"] = "gzip"
+	return body, headers
 
 class SyncthingAPI():
-	def __init__(self, config):
+	# api_url/api_key default to the central server in config, pass them to talk to a user's device.
+	# timeout overrides the per-request defaults, e.g. to bound how long one device may take.
+	def __init__(self, config, api_url=None, api_key=None, timeout=None):
 		self.config = config
+		self._api_url = api_url
+		self._api_key = api_key
+		self.timeout = timeout
+
+	@property
+	def api_url(self):
+		return self._api_url if self._api_url is not None else self.config["api_url"]
+
+	@property
+	def api_key(self):
+		return self._api_key if self._api_key is not None else self.config["api_key"]
+
+	@property
+	def session(self):
+		# Looked up per call so changes to api_url/api_key in Settings pick the right pool
+		return session_for(self.config, self.api_url, self.api_key)
 
-	def handle_api_error(self, response, action="perform action"):
+	def check_response(self, response, action="perform action"):
 		try:
-			response.raise_for_status()  
-			return True 
+			response.raise_for_status()
 		except requests.exceptions.RequestException as e:
-			error_message = f"Error when trying to {action}: {e}"
 			try:
 				error_details = response.json().get('error', response.text)
 				error_message = f"Failed to {action}. API Error: {error_details} (Status: {response.status_code})"
-			except (json.JSONDecodeError, AttributeError):
+			except (json.JSONDecodeError, AttributeError, ValueError):
 				error_message = f"Failed to {action}. Error: {e} (Status: {response.status_code})"
-			messagebox.showerror("API Error", error_message)
-			return False 
+			raise SyncthingAPIError(error_message, response.status_code)
 
-	def get_config(self):
+	def _request(self, method, path, action, timeout=None, stream=False, **kwargs):
+		# With stream the body is left unread, see _get_streamed
+		if timeout is None:
+			timeout = self.timeout or (DEFAULT_TIMEOUT if method == "GET" else DEFAULT_WRITE_TIMEOUT)
+		if "json" in kwargs:
+			kwargs["data"], kwargs["headers"] = encode_body(kwargs.pop("json"), self.config)
+		# An endpoint that keeps failing is skipped until the background probe reaches it again
+		if health.is_open(self.api_url):
+			raise SyncthingAPIError(f"Skipped trying to {action}: {health.open_error_message(self.api_url)}", unreachable=True)
+		started = time.perf_counter()
 		try:
-			r = requests.get(f'{self.config["api_url"]}/system/config', headers={'X-API-Key': self.config["api_key"]}, timeout=10)
-			if self.handle_api_error(r, "fetch config"):
-				return r.json()
-		except requests.exceptions.Timeout:
-			messagebox.showerror("API Error", "Connection timed out while fetching config.")
+			r = self.session.request(method, f'{self.api_url}{path}', timeout=timeout, stream=stream, **kwargs)
+		except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+			timed_out = _is_timeout(e)
+			metrics.record_request(method, path, time.perf_counter() - started, error=True, timeout=timed_out)
+			health.record_failure(self.api_url, self.api_key, e)
+			if timed_out:
+				raise SyncthingAPIError(f"Connection timed out while trying to {action}.", unreachable=True)
+			raise SyncthingAPIError(f"An unexpected error occurred trying to {action}: {e}", unreachable=True)
 		except Exception as e:
-			messagebox.showerror("API Error", f"An unexpected error occurred fetching config: {e}")
-		return None  
+			metrics.record_request(method, path, time.perf_counter() - started, error=True)
+			raise SyncthingAPIError(f"An unexpected error occurred trying to {action}: {e}")
+		finally:
+			# Anything that isn't a GET may have changed the config on that endpoint
+			if method != "GET":
+				self.invalidate_config()
+		health.record_success(self.api_url, self.api_key)
+		# Streamed bodies are counted by _get_streamed once they are read
+		response_bytes = 0 if stream else _wire_bytes(r)
+		metrics.record_request(method, path, time.perf_counter() - started, len(r.request.body or b""), response_bytes, error=r.status_code >= 400)
+		try:
+			self.check_response(r, action)
+		except SyncthingAPIError:
+			r.close()
+			raise
+		return r
 
-	def post_config(self, config_data):
+	def _get_json(self, path, action, timeout=None):
+		return self._request("GET", path, action, timeout=timeout).json()
+
+	def _get_streamed(self, path, action, parse):
+		"""GET path and hand the (already gunzipped) body chunks to parse while they arrive.
+
+		Used when only part of a config document is needed, which can be megabytes with
+		thousands of folders.
+		"""
+		r = self._request("GET", path, action, stream=True)
 		try:
-			response = requests.post(f'{self.config["api_url"]}/system/config', headers={'X-API-Key': self.config["api_key"]}, json=config_data, timeout=15)
-			return self.handle_api_error(response, "update config")
-		except requests.exceptions.Timeout:
-			messagebox.showerror("API Error", "Connection timed out while updating config.")
-		except Exception as e:
-			messagebox.showerror("API Error", f"An unexpected error occurred updating config: {e}")
-		return False 
+			return parse(r.iter_content(chunk_size=STREAM_CHUNK_SIZE))
+		except requests.exceptions.RequestException as e:
+			raise SyncthingAPIError(f"An unexpected error occurred trying to {action}: {e}")
+		except ValueError as e:
+			raise SyncthingAPIError(f"Failed to {action}. Invalid JSON in response: {e}")
+		finally:
+			metrics.record_bytes("GET", path, r.raw.tell())
+			r.close()
 
-	def get_status(self):
+	def _get_json_or_none(self, path, action):
+		# Syncthing answers 404 for an unknown folder or device ID
 		try:
-			r = requests.get(f'{self.config["api_url"]}/system/status', headers={'X-API-Key': self.config["api_key"]}, timeout=10)
-			if self.handle_api_error(r, "fetch status"):
-				return r.json()
-		except requests.exceptions.Timeout:
-			messagebox.showerror("API Error", "Connection timed out while fetching status.")
-		except Exception as e:
-			messagebox.showerror("API Error", f"An unexpected error occurred fetching status: {e}")
+			return self._get_json(path, action)
+		except SyncthingAPIError as e:
+			if e.status_code == 404:
+				return None
+			raise
+
+	# Config cache, one entry per endpoint
+	@property
+	def config_cache_ttl(self):
+		return self.config.get("config_cache_ttl", DEFAULT_CONFIG_CACHE_TTL)
+
+	def invalidate_config(self):
+		with _cache_lock:
+			_config_cache.pop(self.api_url, None)
+
+	def _cached_config(self):
+		# Returns the cached config if it is younger than the TTL, without any network traffic
+		with _cache_lock:
+			entry = _config_cache.get(self.api_url)
+		if entry and time.monotonic() - entry["fetched_at"] < self.config_cache_ttl:
+			return entry["config"]
 		return None
 
+	def _latest_config_event_id(self):
+		# The first request with this mask also starts Syncthing's ConfigSaved subscription
+		events = self.get_events(since=0, event_types=["ConfigSaved"], timeout=0, limit=1)
+		return events[-1]["id"] if events else 0
+
+	def _revalidate_config(self, entry):
+		"""Check an expired cache entry against Syncthing instead of downloading the config again.
+
+		The "version" field in the config is the schema version and doesn't change when the
+		config is saved, so ConfigSaved events are used instead. Their data is the new config.
+		"""
+		if entry.get("event_id") is None:
+			return None
+		try:
+			events = self.get_events(since=entry["event_id"], event_types=["ConfigSaved"], timeout=0)
+		except SyncthingAPIError:
+			return None
+		if events:
+			return self._store_config(events[-1]["data"], events[-1]["id"])
+		with _cache_lock:
+			entry["fetched_at"] = time.monotonic()
+		return entry["config"]
+
+	def _store_config(self, config, event_id):
+		with _cache_lock:
+			_config_cache[self.api_url] = {"config": config, "fetched_at": time.monotonic(), "event_id": event_id}
+		return config
+
+	def update_cached_config(self, config, event_id):
+		# Used by the event subscriber, a ConfigSaved event carries the whole new config
+		return self._store_config(config, event_id)
+
+	# All calls raise SyncthingAPIError instead of showing a dialog, so they are safe to run off the Tk thread
+	def get_config(self, use_cache=True):
+		"""Return the full config, served from the cache while it is fresh.
+
+		The returned document is shared with the cache, copy it before changing it.
+		"""
+		if use_cache and self.config_cache_ttl > 0:
+			cached = self._cached_config()
+			if cached is not None:
+				return cached
+			with _cache_lock:
+				entry = _config_cache.get(self.api_url)
+			if entry is not None:
+				config = self._revalidate_config(entry)
+				if config is not None:
+					return config
+
+		# The event ID is looked up next to the config GET so a fetch stays one round trip. It is
+		# sent first: an ID older than the config is the safe side, the next revalidation then
+		# only downloads a save that is already cached
+		event_future = _executor_for(self.api_url, "config-event").submit(self._latest_config_event_id)
+		# Parsed in one go, json.loads is faster than streaming and the whole document is cached anyway
+		config = self._get_json('/system/config', "fetch config")
+		try:
+			event_id = event_future.result()
+		except SyncthingAPIError:
+			event_id = None
+		return self._store_config(config, event_id)
+
+	def get_config_sections(self, *keys):
+		"""Return {key: value} for just these top-level config keys, e.g. "folders" and "devices".
+
+		Other sections are skipped while the config downloads instead of being parsed. A
+		fresh cached config is used as is, so treat the values as read-only.
+		"""
+		cached = self._cached_config()
+		if cached is not None:
+			return {key: cached[key] for key in keys if key in cached}
+		return self._get_streamed('/system/config', "fetch config", lambda chunks: json_stream.extract(chunks, keys))
+
+	def post_config(self, config_data):
+		# Serialized once, straight into the compact (and optionally gzipped) request body
+		self._request("POST", '/system/config', "update config", json=config_data)
+		return True
+
+	def get_status(self):
+		return self._get_json('/system/status', "fetch status")
+
 	def get_connections(self):
+		return self._get_json('/system/connections', "fetch connections")
+
+	def get_events(self, since=0, event_types=None, timeout=60, limit=None):
+		# Long-polls until events newer than since arrive or timeout seconds pass, timeout=0 returns straight away
+		params = {"since": since, "timeout": timeout}
+		if event_types:
+			params["events"] = ",".join(event_types)
+		if limit:
+			params["limit"] = limit
+		return self._request("GET", '/events', "fetch events", timeout=timeout + 10, params=params).json()
+
+	def get_folder_status(self, folder_id):
+		# Local state of a folder: state, needBytes, inSyncBytes, globalBytes and so on
+		return self._request("GET", '/db/status', f"fetch status of folder {folder_id}", params={"folder": folder_id}).json()
+
+	def get_completion(self, folder_id=None, device_id=None):
+		# How far device_id is with folder_id, either may be left out to aggregate over all of them
+		params = {}
+		if folder_id:
+			params["folder"] = folder_id
+		if device_id:
+			params["device"] = device_id
+		return self._request("GET", '/db/completion', "fetch completion", params=params).json()
+
+	def get_overview(self, use_cache=True):
+		"""Fetch config, status and connections, returns (config, status, connections).
+
+		With "parallel_fetch" enabled (the default) the three requests run at the same time,
+		so this takes as long as the slowest call rather than the sum of all three.
+		"""
+		calls = [lambda: self.get_config(use_cache), self.get_status, self.get_connections]
+		if not self.config.get("parallel_fetch", True):
+			return tuple(call() for call in calls)
+
+		executor = _executor_for(self.api_url)
+		futures = [executor.submit(call) for call in calls]
+		results = []
+		errors = []
+		for future in futures:
+			try:
+				results.append(future.result())
+			except SyncthingAPIError as e:
+				errors.append(str(e))
+
+		if errors:
+			raise SyncthingAPIError("\n\n".join(errors))
+		return tuple(results)
+
+	# Per-object config endpoints, each mutation only sends the folder or device that changed
+	# Reads are answered from a fresh cached config when there is one, copies are returned so callers can edit them.
+	# shared=True skips the copy for callers that only read, the list is then the cached one.
+	def get_folders(self, shared=False):
+		cached = self._cached_config()
+		if cached is not None:
+			folders = cached.get('folders', [])
+			return folders if shared else copy.deepcopy(folders)
+		return self._get_json('/config/folders', "fetch folders")
+
+	def get_folder_ids(self):
+		# Only the IDs, each folder is dropped as soon as it is parsed
+		cached = self._cached_config()
+		if cached is not None:
+			return [f['id'] for f in cached.get('folders', [])]
+		return self._get_streamed('/config/folders', "fetch folders", lambda chunks: [f['id'] for f in json_stream.iter_array(chunks)])
+
+	def get_folder(self, folder_id):
+		cached = self._cached_config()
+		if cached is not None:
+			return copy.deepcopy(next((f for f in cached.get('folders', []) if f['id'] == folder_id), None))
+		return self._get_json_or_none(f'/config/folders/{quote(folder_id, safe="")}', f"fetch folder {folder_id}")
+
+	def add_folder(self, folder):
+		# POST adds the folder, or replaces one with the same ID
+		self._request("POST", '/config/folders', f"add folder {folder['id']}", json=folder)
+		return True
+
+	def put_folders(self, folders):
+		# Adds or replaces every folder in the list in a single config change, others are left alone
+		self._request("PUT", '/config/folders', "update folders", json=folders)
+		return True
+
+	def patch_folder(self, folder_id, changes):
+		self._request("PATCH", f'/config/folders/{quote(folder_id, safe="")}', f"update folder {folder_id}", json=changes)
+		return True
+
+	def delete_folder(self, folder_id):
 		try:
-			r = requests.get(f'{self.config["api_url"]}/system/connections', headers={'X-API-Key': self.config["api_key"]}, timeout=10)
-			if self.handle_api_error(r, "fetch connections"):
-				return r.json()
-		except requests.exceptions.Timeout:
-			messagebox.showerror("API Error", "Connection timed out while fetching connections.")
-		except Exception as e:
-			messagebox.showerror("API Error", f"An unexpected error occurred fetching connections: {e}")
-		return None
+			self._request("DELETE", f'/config/folders/{quote(folder_id, safe="")}', f"remove folder {folder_id}")
+		except SyncthingAPIError as e:
+			if e.status_code != 404:
+				raise
+		return True
+
+	def get_devices(self, shared=False):
+		cached = self._cached_config()
+		if cached is not None:
+			devices = cached.get('devices', [])
+			return devices if shared else copy.deepcopy(devices)
+		return self._get_json('/config/devices', "fetch devices")
+
+	def get_device(self, device_id):
+		cached = self._cached_config()
+		if cached is not None:
+			return copy.deepcopy(next((d for d in cached.get('devices', []) if d['deviceID'] == device_id), None))
+		return self._get_json_or_none(f'/config/devices/{quote(device_id, safe="")}', f"fetch device {device_id}")
+
+	def put_devices(self, devices):
+		# Adds or replaces every device in the list in a single config change
+		self._request("PUT", '/config/devices', "update devices", json=devices)
+		return True
+
+	def add_device(self, device):
+		self._request("POST", '/config/devices', f"add device {device['deviceID']}", json=device)
+		return True
+
+	def patch_device(self, device_id, changes):
+		self._request("PATCH", f'/config/devices/{quote(device_id, safe="")}', f"update device {device_id}", json=changes)
+		return True
+
+	def delete_device(self, device_id):
+		try:
+			self._request("DELETE", f'/config/devices/{quote(device_id, safe="")}', f"remove device {device_id}")
+		except SyncthingAPIError as e:
+			if e.status_code != 404:
+				raise
+		return True
@@ -0,0 +1,134 @@
+import tkinter as tk
+from tkinter import ttk
+
+CHECKED = "☑"
+UNCHECKED = "☐"
+PLACEHOLDER_KEY = "__placeholder__"
+
+class DiffedTreeview():
+	"""A ttk.Treeview with one row per key that only touches rows which changed.
+
+	Rows are plain Treeview items instead of a widget each, so thousands of them stay cheap.
+	set_rows() compares the new rows with the previous ones and only inserts, deletes, moves
+	or rewrites what differs. With checkable=True the check state lives in self.checked and
+	survives refreshes for rows that are still there.
+	"""
+
+	def __init__(self, parent, columns, checkable=False, height=8, selectmode="browse"):
+		self.frame = ttk.Frame(parent)
+		self.checkable = checkable
+		self.tree = ttk.Treeview(
+			self.frame,
+			columns=[name for name, _, _ in columns],
+			show="tree headings" if checkable else "headings",
+			height=height,
+			selectmode=selectmode
+		)
+		if checkable:
+			self.tree.column("#0", width=30, minwidth=30, stretch=False)
+		for name, heading, width in columns:
+			self.tree.heading(name, text=heading, anchor="w")
+			self.tree.column(name, width=width, anchor="w")
+		self.tree.tag_configure("placeholder", foreground="gray")
+
+		scrollbar = ttk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self.tree.yview)
+		self.tree.configure(yscrollcommand=scrollbar.set)
+		scrollbar.pack(side=tk.RIGHT, fill="y")
+		self.tree.pack(side=tk.LEFT, fill="both", expand=True)
+
+		self.checked = set()
+		self._rows = {}
+		self._order = []
+
+		if checkable:
+			self.tree.bind("<Button-1>", self._on_click)
+			self.tree.bind("<space>", self._on_space)
+
+	def pack(self, **kwargs):
+		self.frame.pack(**kwargs)
+
+	def tag_configure(self, tag, **kwargs):
+		self.tree.tag_configure(tag, **kwargs)
+
+	def set_rows(self, rows, placeholder=None):
+		"""Show rows, a list of (key, values) or (key, values, tags), in that order.
+
+		placeholder is shown in gray when there are no rows.
+		"""
+		rows = [(row[0], tuple(row[1]), tuple(row[2]) if len(row) > 2 else ()) for row in rows]
+		if not rows and placeholder:
+			rows = [(PLACEHOLDER_KEY, (placeholder,), ("placeholder",))]
+		new_rows = {key: (values, tags) for key, values, tags in rows}
+		new_order = [key for key, _, _ in rows]
+
+		gone = [key for key in self._order if key not in new_rows]
+		if gone:
+			self.tree.delete(*gone)
+			self.checked.difference_update(gone)
+
+		# Moves are only needed if rows that stay have changed order
+		kept_before = [key for key in self._order if key in new_rows]
+		kept_after = [key for key in new_order if key in self._rows]
+		reorder = kept_before != kept_after
+
+		for position, (key, values, tags) in enumerate(rows):
+			if key not in self._rows:
+				self.tree.insert("", position, iid=key, text=self._check_text(key), values=values, tags=tags)
+				continue
+			if self._rows[key] != (values, tags):
+				self.tree.item(key, values=values, tags=tags)
+			if reorder:
+				self.tree.move(key, "", position)
+
+		self._rows = new_rows
+		self._order = new_order
+
+	def update_row(self, key, values, tags=None):
+		# Rewrites a single row in place, unknown keys are ignored
+		if key not in self._rows:
+			return
+		old_values, old_tags = self._rows[key]
+		tags = old_tags if tags is None else tuple(tags)
+		if (tuple(values), tags) != (old_values, old_tags):
+			self._rows[key] = (tuple(values), tags)
+			self.tree.item(key, values=tuple(values), tags=tags)
+
+	def keys(self):
+		return [key for key in self._order if key != PLACEHOLDER_KEY]
+
+	def selected_keys(self):
+		return [key for key in self.tree.selection() if key != PLACEHOLDER_KEY]
+
+	def checked_keys(self):
+		return [key for key in self._order if key in self.checked]
+
+	def set_checked(self, key, checked):
+		if key not in self._rows or key == PLACEHOLDER_KEY:
+			return
+		if checked:
+			self.checked.add(key)
+		else:
+			self.checked.discard(key)
+		self.tree.item(key, text=self._check_text(key))
+
+	def clear_checked(self):
+		for key in list(self.checked):
+			self.set_checked(key, False)
+
+	def _check_text(self, key):
+		if not self.checkable or key == PLACEHOLDER_KEY:
+			return ""
+		return CHECKED if key in self.checked else UNCHECKED
+
+	def _on_click(self, event):
+		# Clicking the check box column toggles the row, clicks elsewhere just select it
+		if self.tree.identify_column(event.x) != "#0":
+			return
+		key = self.tree.identify_row(event.y)
+		if key:
+			self.set_checked(key, key not in self.checked)
+
+	def _on_space(self, event):
+		for key in self.selected_keys():
+			self.set_checked(key, key not in self.checked)
+		return "break"
@@ -0,0 +1,252 @@
+"""Unsync many folders from many users in one pass, with a journal for the half that fails.
+
+Unsyncing has two halves: the server stops sharing the folders with the users' devices,
+then each device drops the folders. unsync_many() does the server half as one config
+change, then the device halves for all users at the same time. Each step is written to
+unsync_journal.json before and after it runs, so a device that failed (or an app that
+was closed in between) leaves a record instead of a silent mismatch. A failed device
+half is retried, and when it still fails either the server half is rolled back for
+that user or the job stays in the journal for retry_jobs()/rollback_job().
+
+Devices that can't be reached at all get their removals queued in the pending queue,
+as a single unsync does.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from components.config import CONFIG, CONFIG_DIR, write_json
+from components.syncthing_api import SyncthingAPIError
+from components.fanout import fan_out
+from components.pending import queue as pending_queue
+from components.operations import api, get_user, user_api, is_unreachable, OperationError
+from components.reconcile import with_retries
+
+JOURNAL_FILE = os.path.join(CONFIG_DIR, "unsync_journal.json")
+
+class UnsyncJournal():
+	def __init__(self, path=JOURNAL_FILE):
+		self.path = path
+		self._lock = threading.Lock()
+		# job ID -> {"created": ..., "server_done": bool,
+		#            "folders": {folder_id: device entries before the job},
+		#            "users": {username: {"device_id": ..., "folders": [IDs still on the device], "error": ""}}}
+		self._jobs = self._load()
+
+	def _load(self):
+		try:
+			with open(self.path, 'r') as f:
+				return json.load(f).get("jobs", {})
+		except FileNotFoundError:
+			return {}
+		except (OSError, ValueError):
+			# A broken file shouldn't stop the app, the next job rewrites it
+			return {}
+
+	def _save(self):
+		write_json(self.path, {"jobs": self._jobs})
+
+	def begin(self, folders_before, users):
+		job_id = uuid.uuid4().hex[:12]
+		with self._lock:
+			self._jobs[job_id] = {"created": time.time(), "server_done": False, "folders": folders_before, "users": users}
+			self._save()
+		return job_id
+
+	def job(self, job_id):
+		# A copy, so callers can read it while device threads update the journal
+		with self._lock:
+			return json.loads(json.dumps(self._jobs[job_id])) if job_id in self._jobs else None
+
+	def jobs(self):
+		with self._lock:
+			return list(self._jobs)
+
+	def server_done(self, job_id):
+		with self._lock:
+			self._jobs[job_id]["server_done"] = True
+			self._save()
+
+	def user_failed(self, job_id, username, remaining, error):
+		with self._lock:
+			entry = self._jobs[job_id]["users"][username]
+			entry["folders"] = remaining
+			entry["error"] = error
+			self._save()
+
+	def user_done(self, job_id, username):
+		# The job is dropped once every user is done
+		with self._lock:
+			job = self._jobs.get(job_id)
+			if job is None:
+				return
+			job["users"].pop(username, None)
+			if not job["users"]:
+				del self._jobs[job_id]
+			self._save()
+
+	def discard(self, job_id):
+		with self._lock:
+			if self._jobs.pop(job_id, None) is not None:
+				self._save()
+
+# Shared by the GUI and cli.py
+journal = UnsyncJournal()
+
+class UnsyncReport():
+	def __init__(self):
+		# username -> number of folders, per outcome
+		self.removed = {}
+		self.queued = {}
+		self.manual = {}
+		self.rolled_back = {}
+		# username -> error, for device halves left in the journal
+		self.failed = {}
+
+	@property
+	def level(self):
+		return "warning" if self.failed or self.rolled_back else "info"
+
+	def describe(self):
+		lines = [f"{u}: removed {n} folder(s)" for u, n in self.removed.items()]
+		lines += [f"{u}: device offline, {n} removal(s) queued" for u, n in self.queued.items()]
+		lines += [f"{u}: API details not configured, remove {n} folder(s) on the device manually" for u, n in self.manual.items()]
+		lines += [f"{u}: device update failed, server change rolled back" for u in self.rolled_back]
+		lines += [f"{u}: device update failed, {error} (kept in the journal for retry)" for u, error in self.failed.items()]
+		return lines
+
+def unsync_many(folder_ids, usernames, rollback=True):
+	"""Stop sharing folder_ids with every user in usernames and remove them from their devices.
+
+	The server gets one config change for all folders. With rollback, a device that still
+	fails after retries gets its folders shared with it on the server again, otherwise
+	the job stays in the journal. Returns an UnsyncReport.
+	"""
+	users = {username: get_user(username) for username in usernames}
+	remove_ids = {info["device_id"] for info in users.values() if info.get("device_id")}
+	folders = {f['id']: f for f in api.get_folders(shared=True)}
+	missing = [f for f in folder_ids if f not in folders]
+	if missing:
+		raise OperationError("Error", f"Folder(s) not found in configuration: {', '.join(missing)}")
+
+	changed = []
+	before = {}
+	user_folders = {username: {"device_id": info["device_id"], "folders": [], "error": ""} for username, info in users.items()}
+	for folder_id in folder_ids:
+		devices = folders[folder_id].get('devices', [])
+		device_ids = {d['deviceID'] for d in devices}
+		for username, info in users.items():
+			if info["device_id"] in device_ids:
+				user_folders[username]["folders"].append(folder_id)
+		kept = [d for d in devices if d['deviceID'] not in remove_ids]
+		if len(kept) != len(devices):
+			before[folder_id] = devices
+			changed.append(dict(folders[folder_id], devices=kept))
+
+	user_folders = {u: entry for u, entry in user_folders.items() if entry["folders"]}
+	if not changed:
+		return UnsyncReport()
+
+	job_id = journal.begin(before, user_folders)
+	try:
+		with_retries(lambda: api.put_folders(changed))
+	except SyncthingAPIError as e:
+		# Nothing changed anywhere yet
+		journal.discard(job_id)
+		raise OperationError("Error", f"Failed to update central server configuration.\n\n{e}")
+	journal.server_done(job_id)
+	return finish_job(job_id, rollback)
+
+def finish_job(job_id, rollback=False):
+	# Device halves of a job, all users at once
+	report = UnsyncReport()
+	job = journal.job(job_id)
+	if job is None:
+		return report
+	targets = {username: CONFIG["users"].get(username, {}) for username in job["users"]}
+
+	def remove(username, info):
+		remaining = list(job["users"][username]["folders"])
+		if not (info.get("api_url") and info.get("api_key")):
+			journal.user_done(job_id, username)
+			report.manual[username] = len(remaining)
+			return
+		client = user_api(info)
+		try:
+			while remaining:
+				with_retries(lambda: client.delete_folder(remaining[0]))
+				remaining.pop(0)
+		except SyncthingAPIError as e:
+			if is_unreachable(e):
+				for folder_id in remaining:
+					pending_queue.remove_folder(username, folder_id)
+				journal.user_done(job_id, username)
+				report.queued[username] = len(remaining)
+				return
+			journal.user_failed(job_id, username, remaining, str(e))
+			raise
+		journal.user_done(job_id, username)
+		report.removed[username] = len(job["users"][username]["folders"])
+
+	for result in fan_out(targets, remove):
+		if result.ok:
+			continue
+		error = result.error
+		if rollback:
+			try:
+				rollback_user(job_id, result.user)
+				report.rolled_back[result.user] = error
+				continue
+			except SyncthingAPIError as e:
+				error = f"{error}, rollback failed too: {e}"
+		report.failed[result.user] = error
+	return report
+
+def rollback_user(job_id, username):
+	"""Share the folders still on username's device with it on the server again."""
+	job = journal.job(job_id)
+	entry = job and job["users"].get(username)
+	if not entry:
+		return
+	current = {f['id']: f for f in api.get_folders(shared=True)}
+	restored = []
+	for folder_id in entry["folders"]:
+		folder = current.get(folder_id)
+		if folder is None:
+			continue
+		devices = folder.get('devices', [])
+		if any(d['deviceID'] == entry["device_id"] for d in devices):
+			continue
+		original = next((d for d in job["folders"].get(folder_id, []) if d['deviceID'] == entry["device_id"]), {"deviceID": entry["device_id"]})
+		restored.append(dict(folder, devices=devices + [original]))
+	if restored:
+		with_retries(lambda: api.put_folders(restored))
+	journal.user_done(job_id, username)
+
+def rollback_job(job_id):
+	for username in list((journal.job(job_id) or {}).get("users", {})):
+		rollback_user(job_id, username)
+	journal.discard(job_id)
+
+def retry_jobs(rollback=False):
+	"""Finish every job left in the journal, returns {job_id: UnsyncReport}.
+
+	A job whose server half never finished (the app was closed in between) has it sent
+	again first, removing a device from a folder twice changes nothing.
+	"""
+	reports = {}
+	for job_id in journal.jobs():
+		job = journal.job(job_id)
+		if job is None:
+			continue
+		if not job["server_done"]:
+			remove_ids = {entry["device_id"] for entry in job["users"].values()}
+			current = {f['id']: f for f in api.get_folders(shared=True)}
+			changed = [dict(current[f], devices=[d for d in current[f].get('devices', []) if d['deviceID'] not in remove_ids])
+				for f in job["folders"] if f in current]
+			if changed:
+				with_retries(lambda: api.put_folders(changed))
+			journal.server_done(job_id)
+		reports[job_id] = finish_job(job_id, rollback)
+	return reports
@@ -0,0 +1,123 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+_local = threading.local()
+
+class Cancelled(Exception):
+	pass
+
+class Task():
+	def __init__(self, label, key=None):
+		self.label = label
+		self.key = key
+		self.future = None
+		self._cancel_event = threading.Event()
+
+	@property
+	def cancelled(self):
+		return self._cancel_event.is_set()
+
+	def cancel(self):
+		# A queued task never starts, a running one finishes but its callbacks are dropped
+		self._cancel_event.set()
+		if self.future is not None:
+			self.future.cancel()
+
+def current_task():
+	return getattr(_local, "task", None)
+
+def raise_if_cancelled():
+	# Long jobs call this between steps so Cancel stops them early
+	task = current_task()
+	if task is not None and task.cancelled:
+		raise Cancelled()
+
+class BackgroundWorker():
+	"""Runs network calls on a thread pool and hands the results back to Tk.
+
+	Worker threads never touch widgets, they put callbacks on a queue which
+	is drained on the main thread with root.after.
+	"""
+
+	def __init__(self, root, max_workers=4, poll_ms=50, on_error=None, on_busy_changed=None):
+		self.root = root
+		self.poll_ms = poll_ms
+		self.on_error = on_error
+		self.on_busy_changed = on_busy_changed
+		self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ui-worker")
+		self._callbacks = queue.Queue()
+		self._tasks = []
+		self.root.after(self.poll_ms, self._drain)
+
+	@property
+	def tasks(self):
+		return list(self._tasks)
+
+	def submit(self, label, fn, *args, on_success=None, on_error=None, key=None, **kwargs):
+		# Submitting with the key of a task that is still running supersedes it
+		if key is not None:
+			for task in self._tasks:
+				if task.key == key:
+					task.cancel()
+
+		task = Task(label, key)
+		self._tasks.append(task)
+		task.future = self._executor.submit(self._run, task, fn, args, kwargs, on_success, on_error or self.on_error)
+		self._busy_changed()
+		return task
+
+	def call_in_ui(self, fn, *args):
+		self._callbacks.put((None, fn, args))
+
+	def cancel_all(self):
+		for task in self._tasks:
+			task.cancel()
+
+	def _run(self, task, fn, args, kwargs, on_success, on_error):
+		_local.task = task
+		try:
+			if task.cancelled:
+				raise Cancelled()
+			result = fn(*args, **kwargs)
+		except Cancelled:
+			self._callbacks.put((task, None, ()))
+		except Exception as e:
+			self._callbacks.put((task, on_error, (e,)))
+		else:
+			self._callbacks.put((task, on_success, (result,)))
+		finally:
+			_local.task = None
+
+	def _drain(self):
+		try:
+			self._process_callbacks()
+		finally:
+			self.root.after(self.poll_ms, self._drain)
+
+	def _process_callbacks(self):
+		changed = False
+		try:
+			while True:
+				task, callback, args = self._callbacks.get_nowait()
+				if task is not None:
+					if task in self._tasks:
+						self._tasks.remove(task)
+						changed = True
+					if task.cancelled:
+						continue
+				if callback is not None:
+					callback(*args)
+		except queue.Empty:
+			pass
+		finally:
+			# Tasks cancelled before they started never reach the queue
+			for task in [t for t in self._tasks if t.future.cancelled()]:
+				self._tasks.remove(task)
+				changed = True
+			if changed:
+				self._busy_changed()
+
+	def _busy_changed(self):
+		if self.on_busy_changed is not None:
+			self.on_busy_changed(self.tasks)
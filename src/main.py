@@ -1,18 +1,57 @@
-from components.config import CONFIG
-from components.syncthing_api import SyncthingAPI
-api = SyncthingAPI(CONFIG)
+from components.config import CONFIG, config_created, schedule_save, flush_saves
+from components.syncthing_api import SyncthingAPIError
+from components.worker import BackgroundWorker
+from components.events import EventSubscriber
+from components.config_index import ConfigIndex
+from components.tree_view import DiffedTreeview
+from components.metrics import metrics
+from components.hubs import hubs, active_hub, switch_hub, sync_active_hub, fetch_hub_overviews, remember_device_ids, hub_summary
+from components.health import health
+from components.pending import queue as pending_queue
+from components.folder_status import FolderStatusTracker
+from components.paths import FolderSizeScanner, SAME
+from components.bulk_import import read_rows, plan_import, send_devices, add_users
+from components.unsync import unsync_many, retry_jobs, journal as unsync_journal
+from components.operations import (
+    api, OperationError, sync_folders, add_device_to_config,
+    add_folder_for_user, generate_folder_id, drain_pending, drain_all_pending, describe_overlaps
+)
+from components.reconcile import plan_reconcile, apply_plan
 
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import requests
 import os
-import uuid
 
-discoverable_folders_vars = []
-def refresh_data():
-    global CONFIG
-    seen_folder_ids = set()
+def show_operation_error(e):
+    # Default error handler for background tasks, always runs on the Tk thread
+    if isinstance(e, OperationError):
+        show = messagebox.showwarning if e.level == "warning" else messagebox.showerror
+        show(e.title, e.message)
+    elif isinstance(e, SyncthingAPIError):
+        messagebox.showerror("API Error", str(e))
+    else:
+        messagebox.showerror("Error", f"An unexpected error occurred: {e}")
 
+def update_busy_indicator(tasks):
+    if tasks:
+        status_label.config(text="Working: " + ", ".join(t.label for t in tasks) + "...")
+        progress_bar.start(10)
+        cancel_button.state(["!disabled"])
+    else:
+        status_label.config(text="Ready")
+        progress_bar.stop()
+        cancel_button.state(["disabled"])
+
+# Last (config, status, connections) shown in the Overview, kept up to date by Syncthing events
+last_overview = None
+# Lookup tables for the config in last_overview, rebuilt only when a new config arrives
+config_index = None
+# Latest FolderSummary state per folder ID
+folder_states = {}
+SERVER_ROW_KEY = "__server__"
+
+def refresh_data(force=False):
+    # force skips the config cache, used by the Refresh buttons
     # Missing server API key
     if not CONFIG["api_key"] or CONFIG["api_key"] == 'YOUR_SYNCTHING_API_KEY':
         messagebox.showwarning("Configuration Needed", "Please set the Syncthing API Key in the Settings tab.")
@@ -20,153 +59,306 @@ def refresh_data():
     # If missing device IDs
     missing_ids = [user for user, info in CONFIG["users"].items() if not info.get("device_id")]
     if missing_ids:
-        messagebox.showwarning(f"Please set device IDs for: {', '.join(missing_ids)} in the Settings tab.")
+        messagebox.showwarning("Configuration Needed", f"Please set device IDs for: {', '.join(missing_ids)} in the Settings tab.")
         return
 
-    config = api.get_config()
-    status = api.get_status()
-    connections = api.get_connections()
+    # A newer refresh supersedes one that is still in flight
+    if len(hubs()) > 1:
+        worker.submit("Refreshing all servers", fetch_hub_overviews, None, not force, on_success=render_hubs, on_error=refresh_failed, key="refresh")
+    else:
+        worker.submit("Refreshing", api.get_overview, not force, on_success=render_overview, on_error=refresh_failed, key="refresh")
+
+def refresh_failed(e):
+    messagebox.showerror("Error", f"Failed to load data from Syncthing. Check connection and API key.\n\n{e}")
+
+def render_hubs(results):
+    # Every hub gets a summary row, the Overview below shows the active one
+    remember_device_ids(results)
+    rows = []
+    for result in results:
+        summary = hub_summary(result)
+        url = hubs()[result.user].get("api_url", "")
+        if summary["ok"]:
+            values = (summary["hub"], url, "Online", summary["devices"], summary["connected"], summary["folders"])
+        else:
+            values = (summary["hub"], url, "Unreachable", "", "", "")
+        rows.append((summary["hub"], values, ("active",) if summary["hub"] == active_hub() else ()))
+    hub_view.set_rows(rows)
 
-    if config is None or status is None or connections is None:
-        messagebox.showerror("Error", "Failed to load data from Syncthing. Check connection and API key.")
+    active = next(r for r in results if r.user == active_hub())
+    if active.ok:
+        render_overview(active.value)
+    else:
+        refresh_failed(active.error)
+
+def select_hub(event=None):
+    global event_subscriber, last_overview, config_index
+    name = hub_var.get()
+    if name == active_hub():
         return
+    switch_hub(name)
+
+    # The old subscriber drops whatever it still receives, the new one follows the new hub
+    event_subscriber.stop()
+    event_subscriber = EventSubscriber(api, lambda events: worker.call_in_ui(apply_events, events))
+    last_overview = None
+    config_index = None
+    folder_states.clear()
+
+    api_url_entry.delete(0, tk.END)
+    api_url_entry.insert(0, CONFIG["api_url"])
+    api_key_entry.delete(0, tk.END)
+    api_key_entry.insert(0, CONFIG["api_key"])
+    refresh_data()
+
+def get_config_index(config):
+    global config_index
+    if config_index is None or not config_index.is_current(config, CONFIG["this_device_id"], CONFIG["users"]):
+        config_index = ConfigIndex(config, CONFIG["this_device_id"], CONFIG["users"])
+    return config_index
+
+def render_overview(overview):
+    global last_overview
+    config, status, connections = overview
 
     if not CONFIG["this_device_id"]:
         CONFIG["this_device_id"] = status.get('myID', '')
         if not CONFIG["this_device_id"]:
             messagebox.showerror("Error", "Could not determine the Device ID of this Syncthing instance.")
             return  
+        schedule_save()
+
+    last_overview = (config, status, connections)
+    render_view()
+
+    # Keep the view live from now on
+    if CONFIG.get("live_updates", True) and not event_subscriber.running:
+        event_subscriber.start()
 
+def render_view():
+    # Partition of last_overview for the active user, no requests, so it also runs on every user switch
+    config, status, connections = last_overview
     this_id = CONFIG["this_device_id"]
     active_user = current_user.get()
-    users = CONFIG["users"]
-    active_user_id = users[active_user]["device_id"]
-    other_users = {k: v for k, v in users.items() if k != active_user}
-    other_user_ids = [u["device_id"] for u in other_users.values()]
-
-    devices = config.get('devices', [])
-    folders = config.get('folders', [])
-
-    # Clear UI Elements
-    device_listbox.delete(0, tk.END)
-    my_folders_listbox.delete(0, tk.END)
-    for widget in discoverable_folders_frame.winfo_children():
-        widget.destroy()
-
-    # Populate Device List
-    connection_details = connections.get('connections', {})
-    device_listbox.insert(tk.END, f"Server: ({this_id}) - You are viewing as: {active_user}")
-    device_listbox.itemconfig(tk.END, {'bg':'lightblue'})
-
-    for dev in devices:
-        dev_id = dev['deviceID']
-        if dev_id == this_id: continue  
-
-        name = dev.get('name', 'Unknown Name')
-        status_text = "Connected" if connection_details.get(dev_id, {}).get('connected', False) else "Disconnected"
-        user_tag = ""
-        for username, info in CONFIG["users"].items():
-            if dev_id == info["device_id"]:
-                user_tag = f" ({username}'s Device)"
-                break
-
-        device_listbox.insert(tk.END, f"{name}{user_tag} ({dev_id}) - {status_text}")
-
-    # Populate Folder Lists
-    my_folders_list = []
-    discoverable_folders_list = []
-
-    for folder in folders:
-        folder_id = folder['id']
-        label = folder['label']
-        path = folder['path']
-        folder_devices = {d['deviceID'] for d in folder.get('devices', [])} 
-        
-        # Check if this folder is private
-        is_private = folder.get('private', False)
-        privacy_tag = " [PRIVATE]" if is_private else ""
-
-        # Ignore folders not involving this instance
-        if this_id not in folder_devices:
-            continue
 
-        is_shared_with_active = active_user_id in folder_devices
-        display_text = f"{label}{privacy_tag} ({folder_id}) → {path}"
-
-        if is_shared_with_active:
-            my_folders_list.append(display_text)
-        elif (not is_private) or (is_private and folder_owned_by_active_user(folder, active_user_id, this_id)):
-            if folder_id not in seen_folder_ids:
-                # Check if it's shared with any other user
-                if any(uid in folder_devices for uid in other_user_ids):
-                    # For private folders, make sure active user is the owner
-                    owner_id = get_folder_owner_id(folder, this_id)
-                    if not is_private or (is_private and owner_id == active_user_id):
-                        discoverable_folders_list.append({"text": display_text, "id": folder_id, "label": label})
-                        seen_folder_ids.add(folder_id)
-
-    my_folders_listbox.insert(tk.END, *my_folders_list)
-    if not my_folders_list:
-        my_folders_listbox.insert(tk.END, f"No folders currently shared with {active_user}.")
-        my_folders_listbox.itemconfig(tk.END, {'fg':'gray'})
+    with metrics.timed("refresh_classify"):
+        index = get_config_index(config)
+        device_rows = [(SERVER_ROW_KEY, ("Server", f"You are viewing as: {active_user}", this_id, ""), ("server",))]
+        for dev_id, dev in index.devices.items():
+            if dev_id == this_id: continue  
+            device_rows.append((dev_id, device_row_values(dev, connections)))
+        my_folder_ids, discoverable_ids = index.view_for_user(active_user)
+        my_folder_rows = [(folder_id, folder_row_values(index.folders[folder_id])) for folder_id in my_folder_ids]
+        discoverable_rows = [(folder_id, folder_row_values(index.folders[folder_id])[:3]) for folder_id in discoverable_ids]
+
+    # Only rows that differ from what is on screen are touched
+    with metrics.timed("widget_rebuild"):
+        device_view.set_rows(device_rows)
+        my_folders_view.set_rows(my_folder_rows, placeholder=f"No folders currently shared with {active_user}.")
+        discoverable_view.set_rows(discoverable_rows, placeholder=f"No folders to discover for {active_user}.")
+
+def switch_user():
+    # Only the active user changed, the snapshot kept current by events already has everything
+    if last_overview is None:
+        refresh_data()
+        return
+    render_view()
+    poll_folder_status_soon()
+
+def folder_row_values(folder):
+    privacy_tag = " [PRIVATE]" if folder.get('private', False) else ""
+    return (f"{folder['label']}{privacy_tag}", folder['id'], folder['path'], folder_states.get(folder['id']) or "")
+
+def device_row_values(dev, connections):
+    dev_id = dev['deviceID']
+    name = dev.get('name', 'Unknown Name')
+    connection = connections.get('connections', {}).get(dev_id, {})
+    if connection.get('paused', False):
+        status_text = "Paused"
     else:
-        discoverable_folders_vars.clear()
-        for folder_info in discoverable_folders_list:
-            var = tk.BooleanVar()
-            cb = ttk.Checkbutton(discoverable_folders_frame, text=folder_info["text"], variable=var)
-            cb.pack(anchor="w", padx=5, pady=2)
-            discoverable_folders_vars.append((var, folder_info["id"], folder_info["label"]))
-    ttk.Button(discoverable_folders_frame, text="Sync Folders", command=sync_selected_folders).pack(pady=10)
-
-def folder_owned_by_active_user(folder, active_user_id, server_id):
-    folder_devices = {d['deviceID'] for d in folder.get('devices', [])}
-    if len(folder_devices) == 2 and server_id in folder_devices and active_user_id in folder_devices:
-        return True
-    
-    # Check if active user is the original owner (the first non-server device)
-    devices = folder.get('devices', [])
-    for device in devices:
-        if device['deviceID'] != server_id:
-            # First non-server device is the owner
-            return device['deviceID'] == active_user_id
-    
-    return False
+        status_text = "Connected" if connection.get('connected', False) else "Disconnected"
+    username = get_config_index(last_overview[0]).user_for_device(dev_id)
+    # A user's device can be connected to the server while its own API can't be reached
+    user_api_url = CONFIG["users"][username].get("api_url") if username else None
+    if user_api_url and health.is_open(user_api_url):
+        status_text += " (API unreachable)"
+    queued = pending_queue.count(username) if username else 0
+    if queued:
+        status_text += f" ({queued} queued)"
+    return (name, f"{username}'s Device" if username else "", dev_id, status_text)
+
+def update_device_health(api_url):
+    # A circuit opened or closed, rewrite the rows of the devices behind that API
+    for username, info in CONFIG["users"].items():
+        if info.get("api_url", "").rstrip('/') == api_url:
+            update_device_row(username)
+            if not health.is_open(api_url):
+                send_pending(username)
+
+def update_device_row(username):
+    if last_overview is None:
+        return
+    config, status, connections = last_overview
+    index = get_config_index(config)
+    device_id = CONFIG["users"][username].get("device_id")
+    if device_id in index.devices:
+        device_view.update_row(device_id, device_row_values(index.devices[device_id], connections))
+
+def send_pending(username):
+    # Changes queued while the device was offline go out as soon as it is back
+    if pending_queue.count(username):
+        worker.submit(f"Sending queued changes to {username}", drain_pending, username,
+            on_success=lambda sent: update_device_row(username), on_error=lambda e: update_device_row(username), key=f"pending-{username}")
+
+def apply_events(events):
+    """Apply a batch of Syncthing events to the Overview, runs on the Tk thread.
+
+    Connection and folder state changes only rewrite the affected row. A ConfigSaved
+    event carries the new config, so the view is rebuilt from it without a refetch.
+    """
+    if last_overview is None:
+        return
+    config, status, connections = last_overview
+    config_changed = False
+    folder_status_changed = False
+    changed_devices = set()
+    changed_folders = set()
+
+    for event in events:
+        event_type = event.get("type")
+        data = event.get("data") or {}
+        if event_type == "ConfigSaved":
+            config = api.update_cached_config(data, event["id"])
+            config_changed = True
+        elif event_type in ("DeviceConnected", "DeviceDisconnected"):
+            dev_id = data.get("id")
+            connections.setdefault('connections', {}).setdefault(dev_id, {})['connected'] = event_type == "DeviceConnected"
+            changed_devices.add(dev_id)
+            username = get_config_index(config).user_for_device(dev_id)
+            if username and event_type == "DeviceConnected":
+                send_pending(username)
+        elif event_type in ("DevicePaused", "DeviceResumed"):
+            dev_id = data.get("device")
+            connections.setdefault('connections', {}).setdefault(dev_id, {})['paused'] = event_type == "DevicePaused"
+            changed_devices.add(dev_id)
+        elif event_type == "FolderSummary":
+            folder_id = data.get("folder")
+            folder_states[folder_id] = data.get("summary", {}).get("state")
+            folder_tracker.update_status(folder_id, data.get("summary", {}))
+            changed_folders.add(folder_id)
+            folder_status_changed = True
+        elif event_type == "FolderCompletion":
+            folder_tracker.update_completion(data.get("folder"), data.get("device"), data)
+            folder_status_changed = True
+        elif event_type == "StateChanged":
+            folder_id = data.get("folder")
+            folder_states[folder_id] = data.get("to")
+            folder_tracker.mark_stale(folder_id)
+            changed_folders.add(folder_id)
+            folder_status_changed = True
+
+    if folder_status_changed:
+        poll_folder_status_soon()
+
+    if config_changed:
+        render_overview((config, status, connections))
+        return
 
-def get_folder_owner_id(folder, server_id):
-    devices = folder.get('devices', [])
-    for device in devices:
-        if device['deviceID'] != server_id:
-            # First non-server device is the owner
-            return device['deviceID']
-    return None
+    with metrics.timed("event_rows_update"):
+        index = get_config_index(config)
+        for dev_id in changed_devices:
+            if dev_id in index.devices:
+                device_view.update_row(dev_id, device_row_values(index.devices[dev_id], connections))
+        for folder_id in changed_folders:
+            if folder_id in index.folders:
+                my_folders_view.update_row(folder_id, folder_row_values(index.folders[folder_id]))
+
+### Sync Status tab
+folder_status_job = None
+
+def status_folder_ids():
+    if last_overview is None:
+        return []
+    return get_config_index(last_overview[0]).view_for_user(current_user.get())[0]
+
+def poll_folder_status():
+    # Every FAST_POLL seconds while something syncs, SLOW_POLL when idle, events bring it forward
+    global folder_status_job
+    folder_ids = status_folder_ids()
+    if folder_ids and notebook.select() == str(status_tab):
+        folder_tracker.set_device(CONFIG["users"][current_user.get()].get("device_id"))
+        worker.submit("Checking sync progress", folder_tracker.fetch, folder_ids,
+            on_success=render_folder_status, on_error=lambda e: None, key="folder-status")
+    folder_status_job = root.after(folder_tracker.poll_interval(folder_ids) * 1000, poll_folder_status)
+
+def poll_folder_status_soon():
+    global folder_status_job
+    if folder_status_job is not None:
+        root.after_cancel(folder_status_job)
+    folder_status_job = root.after(200, poll_folder_status)
+
+def render_folder_status(progress):
+    folders = get_config_index(last_overview[0]).folders if last_overview else {}
+    rows = []
+    for folder_id, entry in progress.items():
+        label = folders.get(folder_id, {}).get('label', folder_id)
+        if entry.error:
+            rows.append((folder_id, (label, "Error", "", "", "", entry.error), ("stalled",)))
+            continue
+        if entry.stalled(folder_tracker.stall_after):
+            note, tags = "Stalled", ("stalled",)
+        else:
+            note, tags = ("Syncing" if entry.busy else "Up to date"), ()
+        rows.append((folder_id, (
+            label, entry.state, f"{entry.percent:.1f}%", f"{entry.need_bytes / 1048576:.1f}",
+            f"{entry.throughput / 1024:.1f}", note
+        ), tags))
+    folder_status_view.set_rows(rows, placeholder=f"No folders shared with {current_user.get()}.")
+    throughput_label.config(text=f"Total to {current_user.get()}'s device: {folder_tracker.total_throughput() / 1048576:.2f} MB/s")
 
 def sync_selected_folders():
-    selected = [(fid, label) for var, fid, label in discoverable_folders_vars if var.get()]
+    folders = get_config_index(last_overview[0]).folders if last_overview else {}
+    selected = [(fid, folders[fid]['label']) for fid in discoverable_view.checked_keys() if fid in folders]
     if not selected:
         messagebox.showinfo("Nothing Selected", "Please select at least one folder to sync.")
         return
 
+    # Large folders are flagged from sizes counted earlier, walking 50 folders first would hold up the dialog for minutes
+    large_folders = []
+    uncounted = 0
+    for fid, label in selected:
+        path = folders[fid].get('path', '')
+        if not path or not os.path.isdir(path):
+            continue
+        result = folder_scanner.cached(path)
+        if result is None:
+            uncounted += 1
+        elif folder_scanner.is_large(result):
+            large_folders.append((label, result))
+    confirm_sync(selected, large_folders, uncounted)
+
+def confirm_sync(selected, large_folders, uncounted=0):
     # If multiple folders selected, show a single confirmation dialog
+    active_user = current_user.get()
     folder_names = ", ".join([label for _, label in selected])
     if len(selected) > 1:
-        confirm_message = f"Start syncing the following folders for {current_user.get()}?\n\n{folder_names}"
+        confirm_message = f"Start syncing the following folders for {active_user}?\n\n{folder_names}"
     else:
-        confirm_message = f"Start syncing the folder '{folder_names}' for {current_user.get()}?"
+        confirm_message = f"Start syncing the folder '{folder_names}' for {active_user}?"
+    if large_folders:
+        confirm_message += "\n\nLarge folders:\n" + "\n".join(f"{label}: {result.describe()}" for label, result in large_folders)
+    if uncounted:
+        confirm_message += f"\n\nThe size of {uncounted} folder{'s' if uncounted > 1 else ''} hasn't been counted."
 
     if not messagebox.askyesno("Confirm Sync", confirm_message):
         return
 
-    successful_syncs = []
-    failed_syncs = []
+    worker.submit(f"Syncing {len(selected)} folder{'s' if len(selected) > 1 else ''}", sync_folders, selected, active_user, on_success=sync_folders_done)
+
+def sync_folders_done(result):
+    successful_syncs, failed_syncs = result
+    discoverable_view.clear_checked()
 
-    # Process all selected folders
-    for folder_id, folder_label in selected:
-        result = sync_discovered_folder(folder_id, folder_label, skip_confirmation=True, skip_success_message=True)
-        if result:
-            successful_syncs.append(folder_label)
-        else:
-            failed_syncs.append(folder_label)
-    
     # Refresh once after all syncs are done
     refresh_data()
     
@@ -180,186 +372,44 @@ def sync_selected_folders():
         messagebox.showerror("Sync Failed", f"Failed to sync folder{'s' if len(failed_syncs) > 1 else ''}:\n" + "\n".join(failed_syncs))
         
 def unsync_folder():
-    selected_index = my_folders_listbox.curselection()
-    if not selected_index:
-        messagebox.showinfo("No Selection", "Please select a folder to unsync.")
-        return
-    
-    selected_text = my_folders_listbox.get(selected_index)
-    # Extract folder ID from the display text (Format: "Label (ID) → Path")
-    import re
-    match = re.search(r'\(([^)]+)\)', selected_text)
-    if not match:
-        messagebox.showerror("Error", "Could not identify folder ID.")
-        return
-    
-    folder_id = match.group(1)
-    active_user = current_user.get()
-    user_info = CONFIG["users"][active_user]
-    active_user_id = user_info["device_id"]
-    user_api_url = user_info["api_url"]
-    user_api_key = user_info["api_key"]
-    
-    if not messagebox.askyesno("Confirm Unsync", f"Are you sure you want to stop syncing the folder '{selected_text}'?\n\nThis will remove it from {active_user}'s device configuration but won't delete any files."):
-        return
-    
-    config = api.get_config()
-    if config is None:
-        return
-    
-    folder_found = False
-    for folder in config.get('folders', []):
-        if folder['id'] == folder_id:
-            folder_found = True
-            # Remove the active users device ID from devices list
-            folder['devices'] = [d for d in folder.get('devices', []) if d['deviceID'] != active_user_id]
-            break
-    
-    if not folder_found:
-        messagebox.showerror("Error", f"Folder with ID '{folder_id}' not found in configuration.")
-        return
-    
-    # Post updated config to central server
-    if not api.post_config(config):
-        messagebox.showerror("Error", "Failed to update central server configuration.")
+    # Rows are keyed by folder ID
+    selected = my_folders_view.selected_keys()
+    if not selected:
+        messagebox.showinfo("No Selection", "Please select the folders to unsync.")
         return
-    
-    if user_api_url and user_api_key:
-        try:
-            # Fetch users config
-            r = requests.get(f"{user_api_url}/system/config", headers={'X-API-Key': user_api_key}, timeout=10)
-            r.raise_for_status()
-            user_config = r.json()
-            
-            # Remove folder from user's config
-            user_config['folders'] = [f for f in user_config.get('folders', []) if f['id'] != folder_id]
-            
-            # Update users config
-            r = requests.post(f"{user_api_url}/system/config", headers={'X-API-Key': user_api_key}, json=user_config, timeout=10)
-            r.raise_for_status()
-            
-            messagebox.showinfo("Success", f"Folder successfully unsynced from {active_user}'s device.")
-        except Exception as e:
-            messagebox.showwarning("Partial Success", 
-                f"Folder was removed from central server, but failed to update {active_user}'s device configuration: {str(e)}\n\n"
-                f"You may need to manually remove the folder from {active_user}'s Syncthing configuration.")
-    else:
-        messagebox.showinfo("Success", 
-            f"Folder was removed from central server configuration.\n\n"
-            f"Note: {active_user}'s API details are not configured, so you may need to manually remove the folder from their Syncthing configuration.")
-    refresh_data()
-
-def push_folder_to_user(folder, user_api_url, user_api_key):
-    try:
-        # Fetch users full config
-        r = requests.get(f"{user_api_url}/system/config", headers={'X-API-Key': user_api_key}, timeout=10)
-        r.raise_for_status()
-        user_config = r.json()
-    except Exception as e:
-        messagebox.showerror("API Error", f"Could not fetch config from remote device: {e}")
-        return False
-
-    # Get the server device ID
-    central_device_id = CONFIG.get("this_device_id")
-    if not central_device_id:
-        messagebox.showerror("Error", "Central device ID (this_device_id) not available.")
-        return False
-
-    # Make sure the central device is in the users devices list
-    if not any(dev["deviceID"] == central_device_id for dev in user_config.get("devices", [])):
-        user_config["devices"].append({
-            "deviceID": central_device_id,
-            "name": "CentralServer",
-            "addresses": ["dynamic"],
-            "compression": "metadata",
-            "introducer": False
-        })
-
-    if any(f['id'] == folder['id'] for f in user_config.get('folders', [])):
-        return True
-
-    user_folder = folder.copy()
-    user_folder["devices"] = [
-        {"deviceID": central_device_id},
-        {"deviceID": folder["devices"][1]["deviceID"]} 
-    ]
-    user_config["folders"].append(user_folder)
-
-    try:
-        r = requests.post(f"{user_api_url}/system/config", headers={'X-API-Key': user_api_key}, json=user_config, timeout=10)
-        r.raise_for_status()
-        return True
-    except Exception as e:
-        messagebox.showerror("API Error", f"Failed to update remote config: {e}")
-        return False
-
-### Add current users ID to the sharing list
-def sync_discovered_folder(folder_id, folder_label, skip_confirmation=False, skip_success_message=False):
-    active_user = current_user.get()
-    this_id = CONFIG["this_device_id"]
-    user_info = CONFIG["users"][active_user]
-    active_user_id = user_info["device_id"]
-    user_api_url = user_info["api_url"]
-    user_api_key = user_info["api_key"]
-
-    if not active_user_id:
-        messagebox.showerror("Error", f"Device ID for {active_user} is not set.")
-        return False
 
-    config = api.get_config()
-    if config is None:
-        return False
-
-    folder_to_sync = next((f for f in config['folders'] if f['id'] == folder_id), None)
-    if not folder_to_sync:
-        messagebox.showerror("Error", f"Folder {folder_label} not found.")
-        return False
-    
-    # Check if folder is private
-    is_private = folder_to_sync.get('private', False)
-    
-    # Determine folder owner
-    folder_owner_id = get_folder_owner_id(folder_to_sync, this_id)
-    
-    # For private folders, strict check: only owner can access
-    if is_private and folder_owner_id != active_user_id:
-        messagebox.showerror("Access Denied", 
-            f"The folder '{folder_label}' is private and only accessible to its owner.")
-        return False
-
-    # Only show confirmation if not skipped (for batch processing)
-    if not skip_confirmation and not messagebox.askyesno("Confirm Sync", f"Start syncing the folder '{folder_label}' for {active_user}?"):
-        return False
-
-    # Update central config if user isn't in it
-    device_ids = {d['deviceID'] for d in folder_to_sync.get('devices', [])}
-    if active_user_id not in device_ids:
-        folder_to_sync['devices'].append({"deviceID": active_user_id})
-        if not api.post_config(config):
-            return False
-
-    # Build full folder block to send to user
-    folder_for_user = {
-        "id": folder_to_sync["id"],
-        "label": folder_to_sync.get("label", folder_to_sync["id"]),
-        "path": folder_to_sync["path"],   
-        "type": folder_to_sync.get("type", "sendreceive"),
-        "rescanIntervalS": folder_to_sync.get("rescanIntervalS", 60),
-        "fsWatcherEnabled": folder_to_sync.get("fsWatcherEnabled", True),
-        "private": is_private,  
-        "devices": [
-            {"deviceID": this_id},
-            {"deviceID": active_user_id}
-        ]
-    }
-
-    # Send to the users own Syncthing
-    success = push_folder_to_user(folder_for_user, user_api_url, user_api_key)
-    if success and not skip_success_message:
-        messagebox.showinfo("Success", f"Folder '{folder_label}' is now syncing on {active_user}'s device.")
-        refresh_data()
-        
-    return success
+    # One dialog for all selected folders, every ticked user loses all of them
+    dialog = tk.Toplevel(root)
+    dialog.title("Confirm Unsync")
+    dialog.transient(root)
+    dialog.grab_set()
+    labels = [f"{my_folders_view.tree.item(f, 'values')[0]} ({f})" for f in selected]
+    shown = labels[:15] + ([f"... and {len(labels) - 15} more"] if len(labels) > 15 else [])
+    tk.Label(dialog, text=f"Stop syncing {len(selected)} folder(s):\n\n" + "\n".join(shown) + "\n\nwith these users:", justify=tk.LEFT).pack(padx=15, pady=10, anchor="w")
+    user_vars = {}
+    for username in CONFIG["users"]:
+        user_vars[username] = tk.BooleanVar(value=username == current_user.get())
+        ttk.Checkbutton(dialog, text=username, variable=user_vars[username]).pack(anchor="w", padx=25)
+    tk.Label(dialog, text="They are removed from the users' device configurations, no files are deleted.", wraplength=350).pack(padx=15, pady=10)
+
+    def confirm():
+        usernames = [u for u, var in user_vars.items() if var.get()]
+        if not usernames:
+            messagebox.showwarning("No Users", "Tick at least one user.", parent=dialog)
+            return
+        dialog.destroy()
+        worker.submit(f"Unsyncing {len(selected)} folder(s)", unsync_many, selected, usernames, on_success=unsync_folder_done)
+
+    buttons = ttk.Frame(dialog)
+    buttons.pack(pady=(0, 10))
+    ttk.Button(buttons, text="Unsync", command=confirm).pack(side=tk.LEFT, padx=5)
+    ttk.Button(buttons, text="Cancel", command=dialog.destroy).pack(side=tk.LEFT, padx=5)
+
+def unsync_folder_done(report):
+    lines = report.describe() or ["None of the selected users had these folders."]
+    show = messagebox.showwarning if report.level == "warning" else messagebox.showinfo
+    show("Unsync Finished", "\n".join(lines))
+    refresh_data()
 
 ### Add device to config
 def add_device():
@@ -370,42 +420,69 @@ def add_device():
         messagebox.showwarning("Missing Info", "Device ID and Name are required.")
         return
 
-    config = api.get_config()
-    if config is None: return
-
-    # Check if device already exists
-    if any(d['deviceID'] == device_id for d in config.get('devices', [])):
-        messagebox.showwarning("Already Exists", f"Device ID '{device_id}' already exists.")
-        return
-
-    new_device = {
-        "deviceID": device_id,
-        "name": name,
-        "addresses": ["dynamic"],  
-        "compression": "metadata",
-        "introducer": False 
-    }
+    worker.submit(f"Adding device {name}", add_device_to_config, device_id, name, on_success=add_device_done)
 
-    config['devices'].append(new_device)
+def add_device_done(name):
+    messagebox.showinfo("Success", f"Device '{name}' added successfully. Remember to approve it on the other device if necessary.")
+    refresh_data()
+    device_id_entry.delete(0, tk.END)
+    device_name_entry.delete(0, tk.END)
 
-    if api.post_config(config):
-        messagebox.showinfo("Success", f"Device '{name}' added successfully. Remember to approve it on the other device if necessary.")
-        refresh_data()
-        device_id_entry.delete(0, tk.END)
-        device_name_entry.delete(0, tk.END)
+def import_devices():
+    path = filedialog.askopenfilename(filetypes=[("Device lists", "*.csv *.json"), ("All files", "*.*")])
+    if not path:
+        return
+    register_users = import_users_var.get()
+    # The usernames are copied here, the worker shouldn't iterate CONFIG["users"]
+    usernames = list(CONFIG["users"])
+    worker.submit("Checking device list", lambda: plan_import(read_rows(path), api.get_devices(shared=True), usernames, register_users), on_success=confirm_import)
+
+def confirm_import(plan):
+    lines = plan.describe()
+    if plan.empty:
+        messagebox.showwarning("Nothing to Import", "\n".join(lines[:30]) or "The file lists no devices.")
+        return
+    summary = f"Add {len(plan.devices)} device(s)" + (f" and {len(plan.users)} user(s)" if plan.users else "") + "?"
+    shown = lines[:30] + ([f"... and {len(lines) - 30} more"] if len(lines) > 30 else [])
+    if messagebox.askyesno("Confirm Import", summary + "\n\n" + "\n".join(shown)):
+        worker.submit(f"Importing {len(plan.devices)} devices", send_devices, plan, on_success=import_done)
+
+def import_done(plan):
+    message = f"Added {len(plan.devices)} device(s). Remember to approve them on the other devices if necessary."
+    if plan.users:
+        # Added here on the Tk thread, the worker only sent the devices
+        add_users(plan)
+        add_user_widgets(plan.users)
+        message += f"\n\nAdded {len(plan.users)} user(s)."
+        worker.submit("Saving users", flush_saves, on_success=import_saved)
+    messagebox.showinfo("Import Finished", message)
+    refresh_data(force=True)
+
+def import_saved(error):
+    if error is not None:
+        messagebox.showerror("Error", f"Failed to save the imported users: {error}")
+
+def add_user_widgets(usernames):
+    # New users get the same widgets the ones loaded at startup have: Current View, Also share with and Settings
+    for username in usernames:
+        ttk.Radiobutton(user_frame, text=username, variable=current_user, value=username, command=switch_user).pack(side=tk.LEFT, padx=5)
+        share_with_vars[username] = tk.BooleanVar(value=False)
+        ttk.Checkbutton(share_frame, text=username, variable=share_with_vars[username]).pack(side=tk.LEFT, padx=5)
+        row = len(user_entries)
+        tk.Label(user_id_frame, text=f"{username}'s Device ID").grid(row=row, column=0, padx=5, pady=5, sticky="w")
+        entry = tk.Entry(user_id_frame, width=60)
+        entry.insert(0, CONFIG["users"][username]["device_id"])
+        entry.grid(row=row, column=1, padx=5, pady=5)
+        user_entries[username] = entry
 
 def add_folder():
     folder_id = generate_folder_id()
     label = folder_label_entry.get().strip()
     path = folder_path_entry.get().strip()
-    folder_type = "sendreceive"
     is_private = private_folder_var.get() 
 
     active_user = current_user.get()
-    user_info = CONFIG["users"][active_user]
-    active_user_id = user_info["device_id"]
-    user_api_url = user_info["api_url"]
-    user_api_key = user_info["api_key"]
+    active_user_id = CONFIG["users"][active_user]["device_id"]
     this_id = CONFIG["this_device_id"]
 
     if not label or not path:
@@ -430,88 +507,206 @@ def add_folder():
         else:
             return
 
-    config = api.get_config()
-    if config is None: return
+    # Private folders stay with their owner
+    extra_users = [] if is_private else [u for u, var in share_with_vars.items() if var.get() and u != active_user]
+    missing_ids = [u for u in extra_users if not CONFIG["users"][u]["device_id"]]
+    if missing_ids:
+        messagebox.showerror("Error", f"Cannot add folder: Device ID is not set in Settings for: {', '.join(missing_ids)}")
+        return
 
-    for f in config.get('folders', []):
-        if f['id'] == folder_id:
-            messagebox.showwarning("Already Exists", f"Folder ID '{folder_id}' already exists.")
-            return
-        if f['path'] == path:
-            messagebox.showwarning("Already Exists", f"Folder Path '{path}' is already used by folder '{f['label']}'.")
+    # Nested folders are checked against the config already on screen, add_folder_for_user checks again
+    allow_overlap = False
+    if last_overview is not None:
+        index = get_config_index(last_overview[0])
+        overlaps = [(fid, relation) for fid, relation in index.path_trie.overlaps(path) if relation != SAME]
+        if overlaps:
+            lines = describe_overlaps(overlaps, index.folders)
+            if not messagebox.askyesno("Overlapping Folder", "\n".join(lines) + "\n\nSyncthing would scan these files twice. Add it anyway?"):
+                return
+            allow_overlap = True
+
+    def add():
+        worker.submit(f"Adding folder {label}", add_folder_for_user, folder_id, label, path, is_private, active_user, extra_users, allow_overlap, on_success=add_folder_done)
+
+    def confirm_size(result):
+        if folder_scanner.is_large(result) and not messagebox.askyesno("Large Folder", f"'{path}' holds {result.describe()}. Share it anyway?"):
             return
+        add()
 
-    new_folder = {
-        "id": folder_id,
-        "label": label,
-        "path": path,
-        "type": folder_type,
-        "rescanIntervalS": 60,
-        "fsWatcherEnabled": True,
-        "devices": [
-            {"deviceID": this_id},
-            {"deviceID": active_user_id}
-        ],
-        "private": is_private  
-    }
-
-    config['folders'].append(new_folder)
-    if api.post_config(config):
-        # Push the folder to the users Syncthing
-        folder_for_user = new_folder.copy()
-        if push_folder_to_user(folder_for_user, user_api_url, user_api_key):
-            privacy_status = "private " if is_private else ""
-            messagebox.showinfo("Success", f"{privacy_status.capitalize()}Folder '{label}' added and synced to {active_user}'s device.")
-        else:
-            messagebox.showwarning("Partial Success", f"Folder added to central config, but failed to sync with {active_user}.")
-        
-        refresh_data()
-        folder_label_entry.delete(0, tk.END)
-        folder_path_entry.delete(0, tk.END)
-        private_folder_var.set(False) 
+    # The count started when the path was entered is usually done by now, a full walk isn't forced on every add
+    result = folder_scanner.cached(path)
+    if result is not None:
+        confirm_size(result)
+        return
+    answer = messagebox.askyesnocancel("Folder Size Unknown", f"The files in '{path}' haven't been counted yet, which can take a while for a large folder.\n\nYes adds it now, No counts the files first.")
+    if answer:
+        add()
+    elif answer is not None:
+        # Its own key, so a count started by scan_entered_path doesn't cancel this one
+        worker.submit("Checking folder size", folder_scanner.scan, path, on_success=confirm_size, key="add-folder-scan")
+
+def add_folder_done(result):
+    level, title, message = result
+    show = messagebox.showwarning if level == "warning" else messagebox.showinfo
+    show(title, message)
+    refresh_data()
+    folder_label_entry.delete(0, tk.END)
+    folder_path_entry.delete(0, tk.END)
+    private_folder_var.set(False) 
+    for var in share_with_vars.values():
+        var.set(False)
+
+### Bring every device in line with the server config
+def reconcile_all():
+    worker.submit("Checking all devices", plan_reconcile, on_success=confirm_reconcile)
+
+def confirm_reconcile(plan):
+    lines = plan.describe()
+    if plan.empty:
+        messagebox.showinfo("Everything in Sync", "All devices already match the server configuration." + ("\n\n" + "\n".join(lines) if lines else ""))
+        return
+
+    # Long plans are cut short in the dialog
+    shown = lines[:30] + ([f"... and {len(lines) - 30} more"] if len(lines) > 30 else [])
+    if messagebox.askyesno("Confirm Reconcile", "Apply these changes?\n\n" + "\n".join(shown)):
+        worker.submit("Reconciling devices", apply_plan, plan, on_success=reconcile_done)
+
+def reconcile_done(result):
+    refresh_data()
+    lines = result.describe_applied()
+    if result.any_failed:
+        lines += ["", "Run Reconcile All again to retry:"] + result.describe_failed()
+        messagebox.showwarning("Reconcile Incomplete", "\n".join(lines))
+    else:
+        messagebox.showinfo("Reconcile Complete", "\n".join(lines))
 
 def browse_folder():
     path = filedialog.askdirectory()
     if path:
         folder_path_entry.delete(0, tk.END)
         folder_path_entry.insert(0, path)
+        scan_entered_path()
 
-def generate_folder_id():
-    return uuid.uuid4().hex[:10] 
+def scan_entered_path(event=None):
+    # Size of the chosen path, counted in the background while the rest of the form is filled in
+    path = folder_path_entry.get().strip()
+    if not path or not os.path.isdir(path):
+        folder_size_label.config(text="")
+        return
+    folder_size_label.config(text="Counting files...")
+    worker.submit("Counting files", folder_scanner.scan, path, on_success=show_path_size, on_error=lambda e: folder_size_label.config(text=""), key="scan-path")
+
+def show_path_size(result):
+    if os.path.normpath(folder_path_entry.get().strip()) != result.path:
+        return
+    warning = " - large folder, check before sharing" if folder_scanner.is_large(result) else ""
+    folder_size_label.config(text=result.describe() + warning, fg="red" if warning else "gray")
+
+### Debug tab
+def update_debug_view():
+    # Redrawn every 2 seconds while the Debug tab is open
+    if notebook.select() == str(tab5):
+        snapshot = metrics.snapshot()
+        endpoint_view.set_rows([
+            (f"{e['method']} {e['endpoint']}", (
+                f"{e['method']} {e['endpoint']}", e['count'], f"{e['avg'] * 1000:.1f}", f"{e['p95'] * 1000:.1f}",
+                f"{e['max'] * 1000:.1f}", f"{e['bytes_received'] / 1024:.1f}", e['errors'], e['timeouts']
+            )) for e in snapshot["endpoints"]
+        ], placeholder="No requests yet.")
+        section_view.set_rows([
+            (s['name'], (s['name'], s['count'], f"{s['avg'] * 1000:.1f}", f"{s['p95'] * 1000:.1f}", f"{s['max'] * 1000:.1f}"))
+            for s in snapshot["sections"]
+        ], placeholder="Nothing timed yet.")
+    root.after(2000, update_debug_view)
+
+def export_metrics(fmt):
+    extension = ".json" if fmt == "json" else ".prom"
+    path = filedialog.asksaveasfilename(defaultextension=extension, filetypes=[("Metrics", f"*{extension}"), ("All files", "*.*")])
+    if not path:
+        return
+    try:
+        with open(path, "w") as f:
+            f.write(metrics.to_json() if fmt == "json" else metrics.to_prometheus())
+    except OSError as e:
+        messagebox.showerror("Error", f"Failed to write metrics: {e}")
 
 ### Saves API & User IDs
 def save_settings():
-    global CONFIG
     new_url = api_url_entry.get().strip()
     new_key = api_key_entry.get().strip()
 
     if not new_url or not new_key:
         return
 
-    CONFIG["api_url"] = new_url
-    CONFIG["api_key"] = new_key
+    if (new_url, new_key) != (CONFIG["api_url"], CONFIG["api_key"]):
+        CONFIG["api_url"] = new_url
+        CONFIG["api_key"] = new_key
+        sync_active_hub()
+        schedule_save()
 
+    # Only users whose device ID changed are written again
     for username, entry in user_entries.items():
-        CONFIG["users"][username]["device_id"] = entry.get().strip()
+        device_id = entry.get().strip()
+        if CONFIG["users"][username]["device_id"] != device_id:
+            CONFIG["users"][username]["device_id"] = device_id
+            schedule_save(username)
+
+    worker.submit("Testing connection", api.get_status, on_success=save_settings_done)
 
-    status = api.get_status()
-    if status:
+def save_settings_done(status):
+    if CONFIG["this_device_id"] != status.get('myID', ''):
         CONFIG["this_device_id"] = status.get('myID', '')
-        refresh_data()
+        sync_active_hub()
+        schedule_save()
+    worker.submit("Saving settings", flush_saves, on_success=settings_saved)
+    refresh_data()
+
+def settings_saved(error):
+    if error is not None:
+        messagebox.showerror("Error", f"Failed to save settings: {error}")
         
 # GUI Setup
 root = tk.Tk()
 root.title("P2P Sync Manager")
 root.geometry("950x750") 
 
+# Network calls run here, results come back through root.after
+worker = BackgroundWorker(root, on_error=show_operation_error, on_busy_changed=update_busy_indicator)
+# Live updates, events arrive on the subscriber thread and are handed to Tk through the worker queue
+event_subscriber = EventSubscriber(api, lambda events: worker.call_in_ui(apply_events, events))
+# Folder sizes for Add New Folder and Sync, cached for "folder_scan_ttl" seconds
+folder_scanner = FolderSizeScanner.from_config(CONFIG)
+# Circuit changes come from request and probe threads
+health.listeners.append(lambda api_url: worker.call_in_ui(update_device_health, api_url))
+
 # User Switcher
 current_user = tk.StringVar(value="Bob")  
 user_frame = ttk.Frame(root)
 user_frame.pack(pady=5, fill="x", padx=10)
 tk.Label(user_frame, text="Current View:").pack(side=tk.LEFT, padx=5)
 for username in CONFIG["users"].keys():
-    ttk.Radiobutton(user_frame, text=username, variable=current_user, value=username, command=refresh_data).pack(side=tk.LEFT, padx=5)
-ttk.Button(user_frame, text="🔄 Refresh View", command=refresh_data).pack(side=tk.RIGHT, padx=5)
+    ttk.Radiobutton(user_frame, text=username, variable=current_user, value=username, command=switch_user).pack(side=tk.LEFT, padx=5)
+ttk.Button(user_frame, text="🔄 Refresh View", command=lambda: refresh_data(force=True)).pack(side=tk.RIGHT, padx=5)
+ttk.Button(user_frame, text="🛠 Reconcile All", command=reconcile_all).pack(side=tk.RIGHT, padx=5)
+
+# Server switcher, only shown with more than one hub in "servers"
+hub_var = tk.StringVar(value=active_hub())
+if len(hubs()) > 1:
+    hub_combobox = ttk.Combobox(user_frame, textvariable=hub_var, values=list(hubs()), state="readonly", width=15)
+    hub_combobox.pack(side=tk.RIGHT, padx=5)
+    hub_combobox.bind("<<ComboboxSelected>>", select_hub)
+    tk.Label(user_frame, text="Server:").pack(side=tk.RIGHT)
+
+# Status bar with progress for background operations
+status_frame = ttk.Frame(root)
+status_frame.pack(side=tk.BOTTOM, fill="x", padx=10, pady=(0, 5))
+status_label = tk.Label(status_frame, text="Ready", anchor="w")
+status_label.pack(side=tk.LEFT, fill="x", expand=True)
+cancel_button = ttk.Button(status_frame, text="Cancel", command=lambda: worker.cancel_all())
+cancel_button.pack(side=tk.RIGHT, padx=5)
+cancel_button.state(["disabled"])
+progress_bar = ttk.Progressbar(status_frame, mode="indeterminate", length=150)
+progress_bar.pack(side=tk.RIGHT, padx=5)
 
 notebook = ttk.Notebook(root)
 notebook.pack(fill="both", expand=True, padx=10, pady=(0,10)) 
@@ -521,11 +716,23 @@ notebook.pack(fill="both", expand=True, padx=10, pady=(0,10))
 tab1 = ttk.Frame(notebook)
 notebook.add(tab1, text="Overview")
 
+# Servers frame, status of every hub fetched side by side
+hubs_frame = ttk.LabelFrame(tab1, text="Servers")
+hub_view = DiffedTreeview(hubs_frame, [
+    ("hub", "Server", 120), ("url", "API URL", 300), ("status", "Status", 100),
+    ("devices", "Devices", 80), ("connected", "Connected", 80), ("folders", "Folders", 80)
+], height=min(len(hubs()), 4))
+hub_view.tag_configure("active", background="lightblue")
+hub_view.pack(fill="x", expand=True, padx=5, pady=5)
+if len(hubs()) > 1:
+    hubs_frame.pack(fill="x", padx=10, pady=5)
+
 # Devices frame
 devices_frame = ttk.LabelFrame(tab1, text="Connected Devices")
 devices_frame.pack(fill="x", padx=10, pady=5)
-device_listbox = tk.Listbox(devices_frame, height=5)
-device_listbox.pack(fill="x", expand=True, padx=5, pady=5)
+device_view = DiffedTreeview(devices_frame, [("name", "Name", 180), ("user", "User", 120), ("device", "Device ID", 420), ("status", "Status", 100)], height=5)
+device_view.tag_configure("server", background="lightblue")
+device_view.pack(fill="x", expand=True, padx=5, pady=5)
 
 # Split folder view
 folders_pane = ttk.PanedWindow(tab1, orient=tk.VERTICAL)
@@ -534,18 +741,40 @@ folders_pane.pack(fill="both", expand=True, padx=10, pady=5)
 # My Folders frame
 my_folders_frame = ttk.LabelFrame(folders_pane, text="My Folders (Synced)")
 folders_pane.add(my_folders_frame, weight=1) 
-my_folders_listbox = tk.Listbox(my_folders_frame, height=8)
-my_folders_listbox.pack(fill="both", expand=True, padx=5, pady=5)
+folder_columns = [("label", "Label", 200), ("id", "Folder ID", 110), ("path", "Path", 420), ("state", "State", 90)]
+my_folders_view = DiffedTreeview(my_folders_frame, folder_columns, height=8, selectmode="extended")
+my_folders_view.pack(fill="both", expand=True, padx=5, pady=5)
 
 my_folders_buttons_frame = ttk.Frame(my_folders_frame)
 my_folders_buttons_frame.pack(fill="x", padx=5, pady=5)
-ttk.Button(my_folders_buttons_frame, text="🔄 Refresh", command=refresh_data).pack(side=tk.LEFT, padx=5)
-ttk.Button(my_folders_buttons_frame, text="❌ Unsync Selected Folder", command=unsync_folder).pack(side=tk.LEFT, padx=5)
+ttk.Button(my_folders_buttons_frame, text="🔄 Refresh", command=lambda: refresh_data(force=True)).pack(side=tk.LEFT, padx=5)
+ttk.Button(my_folders_buttons_frame, text="❌ Unsync Selected Folders", command=unsync_folder).pack(side=tk.LEFT, padx=5)
 
-# Discoverable Folders frame (needs dynamic buttons)
+# Discoverable Folders frame, tick the box column to select folders
 discoverable_folders_frame = ttk.LabelFrame(folders_pane, text="Discoverable Folders")
-discoverable_title = discoverable_folders_frame 
 folders_pane.add(discoverable_folders_frame, weight=1) 
+discoverable_view = DiffedTreeview(discoverable_folders_frame, folder_columns[:3], checkable=True, height=8, selectmode="extended")
+discoverable_view.pack(fill="both", expand=True, padx=5, pady=5)
+ttk.Button(discoverable_folders_frame, text="Sync Folders", command=sync_selected_folders).pack(pady=5)
+
+
+# Tab: Sync Status, progress of the active user's folders
+status_tab = ttk.Frame(notebook)
+notebook.add(status_tab, text="Sync Status")
+
+folder_tracker = FolderStatusTracker(api, ttl=CONFIG.get("folder_status_ttl", 5))
+folder_status_frame = ttk.LabelFrame(status_tab, text="Folder Progress")
+folder_status_frame.pack(fill="both", expand=True, padx=10, pady=5)
+folder_status_view = DiffedTreeview(folder_status_frame, [
+    ("label", "Folder", 200), ("state", "State", 100), ("completion", "Completion", 90),
+    ("need", "Needed (MB)", 90), ("rate", "KB/s", 80), ("note", "", 200)
+], height=15)
+folder_status_view.tag_configure("stalled", background="#f8d7da")
+folder_status_view.pack(fill="both", expand=True, padx=5, pady=5)
+throughput_label = tk.Label(status_tab, text="", anchor="w")
+throughput_label.pack(fill="x", padx=15, pady=(0, 5))
+notebook.bind("<<NotebookTabChanged>>", lambda event: poll_folder_status_soon())
+poll_folder_status()
 
 
 # Tab 2: Add Device
@@ -570,6 +799,12 @@ device_name_entry.pack(side=tk.LEFT, padx=5, fill=tk.X, expand=True)
 ttk.Button(tab2, text="➕ Add Device to Syncthing", command=add_device).pack(pady=20)
 tk.Label(tab2, text="Note: Add the devices here first.\nThen set their IDs in the Settings tab.", wraplength=400, justify=tk.CENTER).pack(pady=10)
 
+import_frame = ttk.LabelFrame(tab2, text="Import from File (CSV or JSON)")
+import_frame.pack(fill="x", padx=20, pady=10)
+import_users_var = tk.BooleanVar(value=False)
+ttk.Checkbutton(import_frame, text="Also add each device as a user", variable=import_users_var).pack(side=tk.LEFT, padx=5, pady=5)
+ttk.Button(import_frame, text="📥 Import Devices...", command=import_devices).pack(side=tk.RIGHT, padx=5, pady=5)
+
 
 # Tab 3: Add New Folder
 tab3 = ttk.Frame(notebook)
@@ -594,6 +829,9 @@ tk.Label(path_frame, text="Path: ").pack(side=tk.LEFT)
 folder_path_entry = tk.Entry(path_frame, width=40)
 folder_path_entry.pack(side=tk.LEFT, padx=5, fill=tk.X, expand=True)
 ttk.Button(path_frame, text="Browse...", command=browse_folder).pack(side=tk.RIGHT)
+folder_path_entry.bind("<FocusOut>", scan_entered_path)
+folder_size_label = tk.Label(tab3, text="", fg="gray")
+folder_size_label.pack(fill="x", padx=20)
 
 # Add private folder checkbox
 private_frame = ttk.Frame(tab3)
@@ -602,6 +840,15 @@ private_folder_var = tk.BooleanVar(value=False)
 private_checkbox = ttk.Checkbutton(private_frame, text="Make this folder private (only visible to this user and server)", variable=private_folder_var)
 private_checkbox.pack(side=tk.LEFT, padx=5)
 
+# Other users to share the new folder with, their devices are updated in parallel
+share_frame = ttk.Frame(tab3)
+share_frame.pack(fill="x", padx=20, pady=5)
+tk.Label(share_frame, text="Also share with:").pack(side=tk.LEFT, padx=5)
+share_with_vars = {}
+for username in CONFIG["users"].keys():
+    share_with_vars[username] = tk.BooleanVar(value=False)
+    ttk.Checkbutton(share_frame, text=username, variable=share_with_vars[username]).pack(side=tk.LEFT, padx=5)
+
 ttk.Button(tab3, text="📁 Add Folder", command=add_folder).pack(pady=20)
 tk.Label(tab3, text="This will add the folder to the server and then sync it to the user.\nPrivate folders will not be visible to other users.", wraplength=400, justify=tk.CENTER).pack(pady=10)
 
@@ -637,7 +884,43 @@ for i, (username, user) in enumerate(CONFIG["users"].items()):
 ttk.Button(tab4, text="Save Settings & Test Connection", command=save_settings).pack(pady=20)
 
 
+# Tab 5: Debug, request timings and time spent refreshing the Overview
+tab5 = ttk.Frame(notebook)
+notebook.add(tab5, text="Debug")
+
+endpoints_frame = ttk.LabelFrame(tab5, text="Syncthing API Requests (ms)")
+endpoints_frame.pack(fill="both", expand=True, padx=10, pady=5)
+endpoint_view = DiffedTreeview(endpoints_frame, [
+    ("endpoint", "Endpoint", 260), ("count", "Calls", 60), ("avg", "Avg", 70), ("p95", "p95", 70),
+    ("max", "Max", 70), ("received", "KB Received", 90), ("errors", "Errors", 60), ("timeouts", "Timeouts", 70)
+], height=10)
+endpoint_view.pack(fill="both", expand=True, padx=5, pady=5)
+
+sections_frame = ttk.LabelFrame(tab5, text="Refresh Hot Path (ms)")
+sections_frame.pack(fill="x", padx=10, pady=5)
+section_view = DiffedTreeview(sections_frame, [("name", "Section", 260), ("count", "Runs", 60), ("avg", "Avg", 70), ("p95", "p95", 70), ("max", "Max", 70)], height=4)
+section_view.pack(fill="x", padx=5, pady=5)
+
+debug_buttons_frame = ttk.Frame(tab5)
+debug_buttons_frame.pack(fill="x", padx=10, pady=5)
+ttk.Button(debug_buttons_frame, text="Reset", command=metrics.reset).pack(side=tk.LEFT, padx=5)
+ttk.Button(debug_buttons_frame, text="Export JSON...", command=lambda: export_metrics("json")).pack(side=tk.LEFT, padx=5)
+ttk.Button(debug_buttons_frame, text="Export Prometheus...", command=lambda: export_metrics("prometheus")).pack(side=tk.LEFT, padx=5)
+update_debug_view()
+
+
 if __name__ == "__main__":
+	if config_created:
+		messagebox.showinfo(
+			"Config Created",
+			"No existing config found. A new empty config file has been created.\n\n"
+			"Please fill in your Syncthing API details in the Settings tab."
+		)
 	save_settings()
 	refresh_data()	
+	if pending_queue.pending():
+		worker.submit("Sending queued changes", drain_all_pending, on_success=lambda sent: refresh_data() if sent else None)
+	# Unsyncs that were interrupted or failed on a device last time
+	if unsync_journal.jobs():
+		worker.submit("Finishing unsync jobs", retry_jobs, on_success=lambda reports: refresh_data(), on_error=lambda e: None)
 	root.mainloop()
\ No newline at end of file
@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+
+# The components import like they do from main.py, with src on the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Never touch the real data directory, the components load their config on import
+os.environ["P2PSHARE_DATA_DIR"] = tempfile.mkdtemp(prefix="p2pshare-tests-")
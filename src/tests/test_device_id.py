@@ -0,0 +1,47 @@
+import pytest
+from components.device_id import normalize_device_id, luhn_base32, InvalidDeviceID
+
+VALID = "MFZWI3D-BONSGYC-YLTMRWG-C43ENR5-QXGZDMM-FZWI3DP-BONSGYY-LTMRWAD"
+
+def without_check_chars(device_id):
+	value = device_id.replace("-", "")
+	return "".join(value[i:i + 13] for i in range(0, 56, 14))
+
+def test_valid_56_character_id():
+	assert normalize_device_id(VALID) == VALID
+	assert normalize_device_id(VALID.replace("-", "")) == VALID
+	assert normalize_device_id(f"  {VALID.lower()} ") == VALID
+
+def test_52_character_id_gets_check_characters():
+	short = without_check_chars(VALID)
+	assert len(short) == 52
+	assert normalize_device_id(short) == VALID
+
+def test_check_characters():
+	value = VALID.replace("-", "")
+	assert [luhn_base32(value[i:i + 13]) for i in range(0, 56, 14)] == [value[i + 13] for i in range(0, 56, 14)]
+
+def test_typo_in_last_group():
+	with pytest.raises(InvalidDeviceID, match="check character 4 doesn't match"):
+		normalize_device_id(VALID[:-1] + "E")
+
+def test_typo_in_first_group():
+	typo = ("A" if VALID[0] != "A" else "B") + VALID[1:]
+	with pytest.raises(InvalidDeviceID, match="check character 1 doesn't match"):
+		normalize_device_id(typo)
+
+def test_lookalike_digits_are_read_as_letters():
+	# 0, 1 and 8 aren't base32, Syncthing reads them as O, I and B
+	assert normalize_device_id(VALID.replace("B", "8")) == VALID
+
+def test_invalid_characters():
+	with pytest.raises(InvalidDeviceID, match="invalid characters"):
+		normalize_device_id(VALID[:-1] + "!")
+
+@pytest.mark.parametrize("raw", ["", VALID[:-2], VALID + "A", without_check_chars(VALID)[:-1]])
+def test_wrong_length(raw):
+	with pytest.raises(InvalidDeviceID, match="expected 56 characters"):
+		normalize_device_id(raw)
+
+def test_invalid_device_id_is_a_value_error():
+	assert issubclass(InvalidDeviceID, ValueError)
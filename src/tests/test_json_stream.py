@@ -0,0 +1,59 @@
+import json
+import pytest
+from components.json_stream import extract, iter_array
+
+def chunked(text, size):
+	data = text.encode() if isinstance(text, str) else text
+	return [data[i:i + size] for i in range(0, len(data), size)]
+
+def test_extract_matches_json_loads_at_any_chunk_size():
+	text = json.dumps({"version": 37, "folders": [{"id": "a", "devices": [{"deviceID": "X"}]}, {"id": "b", "devices": []}], "gui": {"enabled": True}, "ratio": -1.5e3})
+	for size in (1, 2, 3, 7, 64, len(text)):
+		assert extract(chunked(text, size)) == json.loads(text)
+
+def test_extract_keeps_only_requested_keys():
+	text = json.dumps({"version": 37, "folders": [{"id": "a"}], "devices": [{"deviceID": "X"}], "options": {"a": 1}})
+	assert extract(chunked(text, 5), keys=("folders", "missing")) == {"folders": [{"id": "a"}]}
+
+def test_numbers_split_across_chunks():
+	assert extract([b'{"a": 12', b'.5, "b": -', b'3e', b'2, "c": 1', b'0}']) == {"a": 12.5, "b": -3e2, "c": 10}
+	assert list(iter_array([b"[1", b"23, 4", b"5]"])) == [123, 45]
+	# A number at the very end of the input is complete
+	assert list(iter_array([b"[7", b"]"])) == [7]
+
+def test_utf8_split_across_chunks():
+	text = json.dumps({"label": "Fotos é 写真 🎞"}, ensure_ascii=False).encode()
+	for size in range(1, 5):
+		assert extract(chunked(text, size)) == {"label": "Fotos é 写真 🎞"}
+
+def test_str_chunks():
+	assert extract(['{"a"', ': [1, ', '2]}']) == {"a": [1, 2]}
+
+def test_empty_containers():
+	assert extract([b"{}"]) == {}
+	assert extract([b" { } "]) == {}
+	assert list(iter_array([b"[]"])) == []
+	assert list(iter_array([b"[", b" ", b"]"])) == []
+	assert extract([b'{"folders": [], "devices": {}, "x": [[]]}']) == {"folders": [], "devices": {}, "x": [[]]}
+	assert extract([b'{"folders": [], "devices": [1]}'], keys=("devices",)) == {"devices": [1]}
+
+@pytest.mark.parametrize("chunks", [
+	[b""],
+	[b'{"a": [1, 2'],
+	[b'{"a": "unterminated'],
+	[b'{"a": 1'],
+	[b'{"a" 1}'],
+])
+def test_extract_truncated_or_invalid_input_raises(chunks):
+	with pytest.raises(ValueError):
+		extract(chunks)
+
+def test_iter_array_truncated_input_raises():
+	items = iter_array([b'[{"id": "a"}, {"id": '])
+	assert next(items) == {"id": "a"}
+	with pytest.raises(ValueError):
+		next(items)
+
+def test_iter_array_rejects_an_object():
+	with pytest.raises(ValueError):
+		list(iter_array([b'{"a": 1}']))
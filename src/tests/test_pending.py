@@ -0,0 +1,52 @@
+from components.pending import PendingQueue
+
+FOLDER = {"id": "abcde-12345", "label": "Photos", "path": "/srv/photos"}
+
+def actions(queue, username="Bob"):
+	return {folder_id: entry["action"] for folder_id, entry in queue.pending(username).get(username, [])}
+
+def test_add_after_remove_keeps_the_add(tmp_path):
+	queue = PendingQueue(str(tmp_path / "pending.json"))
+	queue.remove_folder("Bob", FOLDER["id"])
+	queue.add_folder("Bob", FOLDER)
+	assert actions(queue) == {FOLDER["id"]: "add"}
+
+def test_remove_after_add_cancels_both(tmp_path):
+	queue = PendingQueue(str(tmp_path / "pending.json"))
+	queue.add_folder("Bob", FOLDER)
+	queue.remove_folder("Bob", FOLDER["id"])
+	assert queue.pending() == {}
+	assert queue.count("Bob") == 0
+
+def test_remove_add_remove_keeps_the_remove(tmp_path):
+	# The device had the folder before the first remove, so it still has to drop it
+	queue = PendingQueue(str(tmp_path / "pending.json"))
+	queue.remove_folder("Bob", FOLDER["id"])
+	queue.add_folder("Bob", FOLDER)
+	queue.add_folder("Bob", FOLDER)
+	queue.remove_folder("Bob", FOLDER["id"])
+	assert actions(queue) == {FOLDER["id"]: "remove"}
+
+def test_queue_survives_a_restart(tmp_path):
+	path = str(tmp_path / "pending.json")
+	queue = PendingQueue(path)
+	queue.remove_folder("Bob", FOLDER["id"])
+	queue.add_folder("Bob", FOLDER)
+	reloaded = PendingQueue(path)
+	reloaded.remove_folder("Bob", FOLDER["id"])
+	assert actions(reloaded) == {FOLDER["id"]: "remove"}
+
+def test_complete_keeps_entries_replaced_in_the_meantime(tmp_path):
+	queue = PendingQueue(str(tmp_path / "pending.json"))
+	queue.add_folder("Bob", FOLDER)
+	queue.add_folder("Bob", dict(FOLDER, id="other"))
+	sent = queue.pending("Bob")["Bob"]
+	queue.remove_folder("Bob", "other")
+	queue.remove_folder("Bob", "other")
+	queue.complete("Bob", sent)
+	assert actions(queue) == {"other": "remove"}
+
+def test_broken_file_starts_empty(tmp_path):
+	path = tmp_path / "pending.json"
+	path.write_text("{not json")
+	assert PendingQueue(str(path)).pending() == {}
@@ -0,0 +1,23 @@
+from components.reconcile import compute_plan
+
+SERVER_ID = "SERVER"
+USER_ID = "USERDEVICE"
+
+def test_a_user_called_server_stays_a_user():
+	server_config = {
+		"devices": [{"deviceID": SERVER_ID}],
+		"folders": [{"id": "f1", "label": "Photos", "path": "/srv/photos", "devices": [{"deviceID": SERVER_ID}, {"deviceID": USER_ID}]}]
+	}
+	users = {"server": {"device_id": USER_ID, "api_url": "http://device", "api_key": "key"}}
+	user_states = {"server": {"folders": [], "devices": []}}
+	plan = compute_plan(server_config, SERVER_ID, users, user_states)
+
+	assert [(c.action, c.kind, c.object_id) for c in plan.server_changes] == [("add", "device", USER_ID)]
+	assert [(c.action, c.kind, c.object_id) for c in plan.changes["server"]] == [("add", "device", SERVER_ID), ("add", "folder", "f1")]
+
+def test_nothing_to_do():
+	server_config = {"devices": [{"deviceID": SERVER_ID}, {"deviceID": USER_ID}], "folders": []}
+	users = {"Bob": {"device_id": USER_ID}}
+	plan = compute_plan(server_config, SERVER_ID, users, {"Bob": {"folders": [], "devices": [{"deviceID": SERVER_ID}]}})
+	assert plan.empty
+	assert plan.describe() == []